@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class Apiv01Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apiv01'
+
+    def ready(self):
+        from . import checks  # noqa: F401  (registers the trigger check)
+        from . import signals  # noqa: F401
+        from . import reminders  # noqa: F401  (registers its jobs)
@@ -0,0 +1,227 @@
+"""
+ASGI-native counterparts of the task and comment endpoints.
+
+DRF views are synchronous, so under ASGI every request to them is
+bounced through ``sync_to_async``. These views are plain ``async def``
+Django views that use the async ORM directly and reuse the DRF
+serializers, filters and paginators, which do no I/O of their own. The
+JSON they return matches the sync views.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, QueryDict
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import CachedJWTAuthentication, StreamJWTAuthentication
+from .filters import TaskFilter
+from .models import Task, Comment
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .rows import comment_rows, rows_enabled, task_rows
+from .search import highlight_tasks
+from .serializers import TaskSerializer, TaskSearchResultSerializer, CommentSerializer
+from .throttling import WriteThrottle
+
+
+renderer = JSONRenderer()
+fast_renderer = FastJSONRenderer()
+authentication = CachedJWTAuthentication()
+stream_authentication = StreamJWTAuthentication()
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None, renderer=renderer):
+    body = b'' if data is None else renderer.render(data)
+    return HttpResponse(body, status=status, headers=headers, content_type='application/json')
+
+
+def parse_body(request):
+    if not request.body:
+        return {}
+    if request.content_type == 'application/json':
+        return JSONParser().parse(request)
+    return QueryDict(request.body, encoding=request.encoding)
+
+
+def async_api_view(*methods, throttle_classes=(), authenticator=authentication):
+    """
+    Wrap an async view with JWT authentication (``IsAuthenticated``) by
+    ``authenticator``, ``throttle_classes`` and DRF-style error responses.
+    The view receives the authenticated user after the request.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return json_response(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                    headers={'Allow': ', '.join(methods)})
+            try:
+                result = await authenticator.aauthenticate(request)
+                if result is None:
+                    raise exceptions.NotAuthenticated()
+                request.user = result[0]
+                for throttle_class in throttle_classes:
+                    throttle = throttle_class()
+                    if not throttle.allow_request(request, None):
+                        raise exceptions.Throttled(throttle.wait())
+                return await view(request, result[0], *args, **kwargs)
+            except exceptions.APIException as exc:
+                headers = None
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    headers = {'WWW-Authenticate': authenticator.authenticate_header(request)}
+                    exc.status_code = status.HTTP_401_UNAUTHORIZED
+                elif isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+                    headers = {'Retry-After': '%d' % exc.wait}
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                return json_response(detail, status=exc.status_code, headers=headers)
+        return wrapper
+    return decorator
+
+
+async def paginate(request, queryset):
+    """Page-number or, with ``?cursor=``, keyset pagination of ``queryset``."""
+    if KeysetPagination.cursor_query_param in request.GET:
+        paginator = KeysetPagination()
+        queryset = paginator.seek(queryset, request)
+        paginator.set_page([obj async for obj in queryset[:paginator.page_size + 1]])
+        return paginator.page, lambda data: {
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': data,
+        }
+
+    page_size = api_settings.PAGE_SIZE
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        raise exceptions.NotFound('Invalid page.')
+    count = await queryset.acount()
+    if number < 1 or (number > 1 and (number - 1) * page_size >= count):
+        raise exceptions.NotFound('Invalid page.')
+    offset = (number - 1) * page_size
+    page = [obj async for obj in queryset[offset:offset + page_size]]
+
+    def link(n):
+        url = request.build_absolute_uri()
+        if n == 1:
+            return remove_query_param(url, 'page')
+        return replace_query_param(url, 'page', n)
+
+    return page, lambda data: {
+        'count': count,
+        'next': link(number + 1) if offset + page_size < count else None,
+        'previous': link(number - 1) if number > 1 else None,
+        'results': data,
+    }
+
+
+TASK_NOT_FOUND = 'No Task matches the given query.'
+
+
+async def get_owned_task(user, pk):
+    task = await Task.objects.filter(pk=pk, user_id=user.pk).afirst()
+    if task is None:
+        raise exceptions.NotFound(TASK_NOT_FOUND)
+    return task
+
+
+@async_api_view('GET')
+async def task_list(request, user):
+    filterset = TaskFilter(
+        request.GET, queryset=Task.objects.filter(user_id=user.pk).order_by('-created_at'), request=request)
+    if not filterset.is_valid():
+        raise exceptions.ValidationError(filterset.errors)
+    query = request.GET.get('q')
+    if not query and rows_enabled():
+        page, wrap = await paginate(request, task_rows.values(filterset.qs))
+        return json_response(wrap(task_rows.encode(page)), renderer=fast_renderer)
+    page, wrap = await paginate(request, filterset.qs)
+    if not query:
+        return json_response(wrap(TaskSerializer(page, many=True).data))
+    # Highlighting is a raw query, which the async ORM does not cover.
+    await sync_to_async(highlight_tasks)(page, query, user.pk)
+    return json_response(wrap(TaskSearchResultSerializer(page, many=True).data))
+
+
+@async_api_view('POST', throttle_classes=[WriteThrottle])
+async def task_create(request, user):
+    serializer = TaskSerializer(data=parse_body(request))
+    serializer.is_valid(raise_exception=True)
+    task = await Task.objects.acreate(**serializer.validated_data, user_id=user.pk)
+    return json_response(TaskSerializer(task).data, status=status.HTTP_201_CREATED)
+
+
+@async_api_view('GET')
+async def task_detail(request, user, pk):
+    if rows_enabled():
+        row = await task_rows.values(Task.objects.filter(pk=pk, user_id=user.pk)).afirst()
+        if row is None:
+            raise exceptions.NotFound(TASK_NOT_FOUND)
+        return json_response(task_rows.encode([row])[0], renderer=fast_renderer)
+    task = await get_owned_task(user, pk)
+    return json_response(TaskSerializer(task).data)
+
+
+@async_api_view('PATCH', 'PUT', throttle_classes=[WriteThrottle])
+async def task_update(request, user, pk):
+    task = await get_owned_task(user, pk)
+    serializer = TaskSerializer(task, data=parse_body(request), partial=True)
+    serializer.is_valid(raise_exception=True)
+    for attr, value in serializer.validated_data.items():
+        setattr(task, attr, value)
+    await task.asave()
+    return json_response(TaskSerializer(task).data)
+
+
+@async_api_view('DELETE', throttle_classes=[WriteThrottle])
+async def task_delete(request, user, pk):
+    deleted, _ = await Task.objects.filter(pk=pk, user_id=user.pk).adelete()
+    if not deleted:
+        raise exceptions.NotFound(TASK_NOT_FOUND)
+    return json_response(None, status=status.HTTP_204_NO_CONTENT)
+
+
+@async_api_view('GET')
+async def comment_list(request, user, task_id):
+    comments = Comment.objects.filter(
+        task_id=task_id, task__user_id=user.pk).order_by('-created_at')
+    if rows_enabled():
+        page, wrap = await paginate(request, comment_rows.values(comments))
+        return json_response(wrap(comment_rows.encode(page)), renderer=fast_renderer)
+    page, wrap = await paginate(request, comments)
+    return json_response(wrap(CommentSerializer(page, many=True).data))
+
+
+@async_api_view('POST', throttle_classes=[WriteThrottle])
+async def comment_create(request, user, task_id):
+    task = await Task.objects.filter(
+        pk=task_id, user_id=user.pk).only('pk', 'user_id').afirst()
+    if task is None:
+        raise exceptions.NotFound("Task not found.")
+    serializer = CommentSerializer(data=parse_body(request))
+    serializer.is_valid(raise_exception=True)
+    comment = await Comment.objects.acreate(
+        **serializer.validated_data, task=task, user_id=user.pk)
+    return json_response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
+
+
+class StreamsNeedASGI(exceptions.APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = 'Event streams are served by the ASGI application, todo.asgi:application.'
+
+
+@async_api_view('GET', authenticator=stream_authentication)
+async def task_events(request, user):
+    """
+    Stand-in for the event stream, which ``EventStreamRouter`` answers in
+    front of Django; a request gets here only without it, e.g. under WSGI.
+    """
+    raise StreamsNeedASGI()
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework import HTTP_HEADER_ENCODING
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserStateCache:
+    """
+    Thread-safe LRU of ``user_id -> (is_active, is_staff)`` whose entries
+    expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires, state = entry
+            if expires < now:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return state
+
+    def set(self, user_id, state):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[user_id] = (expires, state)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_state_cache = UserStateCache(
+    maxsize=getattr(settings, 'JWT_USER_STATE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'JWT_USER_STATE_CACHE_TTL', 60),
+)
+
+
+class ClaimsUser(TokenUser):
+    """
+    TokenUser whose active/staff flags come from the database (through
+    ``user_state_cache``) rather than from token claims.
+    """
+
+    def __init__(self, token, is_active, is_staff):
+        super().__init__(token)
+        self.is_active = is_active
+        self.is_staff = is_staff
+
+
+class CachedJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that builds the user from verified token claims.
+
+    Unlike ``JWTAuthentication`` it does not load the ``User`` row on every
+    request: only the active/staff flags are looked up, and those are kept
+    in a per-process LRU for ``JWT_USER_STATE_CACHE_TTL`` seconds. Views
+    must compare ownership through ``request.user.pk`` / ``user_id``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_states = {}
+
+    def get_user(self, validated_token):
+        user_id = super().get_user(validated_token).id
+        state = user_state_cache.get(user_id)
+        if state is None:
+            state = self.remember_state(user_id, self.get_state_queryset(user_id).first())
+        return self.build_user(validated_token, state)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of ``authenticate()`` for the async views."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = super().get_user(validated_token).id
+        state = user_state_cache.get(user_id)
+        if state is None:
+            state = self.remember_state(user_id, await self.aload_state(user_id))
+        return self.build_user(validated_token, state)
+
+    async def aload_state(self, user_id):
+        # Concurrent misses for one user, such as its clients all reconnecting
+        # after a restart, share one query.
+        loop = asyncio.get_running_loop()
+        pending = self.pending_states.get(user_id)
+        if pending is None or pending.get_loop() is not loop:
+            pending = loop.create_task(self.get_state_queryset(user_id).afirst())
+            self.pending_states[user_id] = pending
+            pending.add_done_callback(lambda task: self.pending_states.pop(user_id, None))
+        return await asyncio.shield(pending)
+
+    def get_state_queryset(self, user_id):
+        return User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values_list('is_active', 'is_staff')
+
+    def remember_state(self, user_id, state):
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        user_state_cache.set(user_id, state)
+        return state
+
+    def build_user(self, validated_token, state):
+        is_active, is_staff = state
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return ClaimsUser(validated_token, is_active=is_active, is_staff=is_staff)
+
+
+class StreamJWTAuthentication(CachedJWTAuthentication):
+    """
+    Also takes the access token from the ``access_token`` query parameter,
+    for the event stream: browsers' ``EventSource`` cannot send headers.
+    """
+    query_param = 'access_token'
+
+    async def aauthenticate(self, request):
+        if self.get_header(request) is not None or self.query_param not in request.GET:
+            return await super().aauthenticate(request)
+        validated_token = self.get_validated_token(request.GET[self.query_param].encode(HTTP_HEADER_ENCODING))
+        return await self.aget_user(validated_token), validated_token
+
+
+# OpenAPI security schemes, so that the schema keeps its ``jwtAuth``
+# bearer scheme (and Swagger UI its "Authorize" button).
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = 'apiv01.authentication.CachedJWTAuthentication'
+
+
+class StreamJWTScheme(SimpleJWTScheme):
+    target_class = 'apiv01.authentication.StreamJWTAuthentication'
+    name = ['jwtAuth', 'jwtQueryAuth']
+
+    def get_security_requirement(self, auto_schema):
+        # Either the header or the query parameter.
+        return [{name: []} for name in self.name]
+
+    def get_security_definition(self, auto_schema):
+        return [
+            super().get_security_definition(auto_schema),
+            {'type': 'apiKey', 'in': 'query', 'name': StreamJWTAuthentication.query_param},
+        ]
+
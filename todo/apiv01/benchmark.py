@@ -0,0 +1,365 @@
+"""
+In-process benchmark harness for the apiv01 endpoints.
+
+``seed()`` fills the database with users, tasks and comments, and
+``run()`` drives every route through Django's test client, recording
+latency percentiles, throughput and queries per request. Results are
+plain dicts so they can be written to JSON and compared between commits
+with ``compare()``. ``run_concurrent()`` drives an ASGI application with
+many simultaneous clients instead, and ``EventStreamClient`` holds a
+streaming response open.
+"""
+import asyncio
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Task, Comment
+from .pagination import KeysetPagination
+
+
+BENCH_PASSWORD = 'bench-password-123'
+
+
+def seed(users, tasks, comments, prefix='bench', batch_size=2000):
+    """
+    Create ``users`` users with ``tasks`` tasks each and ``comments``
+    comments per task, using bulk inserts. Returns the created users.
+    """
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f'{prefix}_{n}', password=password) for n in range(users)],
+        batch_size=batch_size,
+    )
+    created = list(User.objects.filter(username__startswith=f'{prefix}_').order_by('pk'))
+
+    now = timezone.now()
+    statuses = [choice for choice, _ in Task.TASK_STATUS]
+    for user in created:
+        Task.objects.bulk_create(
+            [
+                Task(
+                    title=f'Task {n}',
+                    description=f'Generated task {n} for {user.username}',
+                    status=statuses[n % len(statuses)],
+                    due_date=now + timedelta(days=(n % 60) - 30),
+                    user_id=user.pk,
+                )
+                for n in range(tasks)
+            ],
+            batch_size=batch_size,
+        )
+        if comments:
+            task_ids = Task.objects.filter(user_id=user.pk).values_list('pk', flat=True)
+            Comment.objects.bulk_create(
+                [
+                    Comment(text=f'Comment {n}', task_id=task_id, user_id=user.pk)
+                    for task_id in task_ids
+                    for n in range(comments)
+                ],
+                batch_size=batch_size,
+            )
+    Task.objects.filter(user__in=created).refresh_comment_stats()
+    return created
+
+
+class Scenario:
+    """
+    One benchmarked route. ``build(ctx, i)`` runs untimed before each
+    iteration and returns ``(path, data)``.
+    """
+
+    def __init__(self, name, method, build, auth=True):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.auth = auth
+
+
+def default_scenarios():
+    def static(path, data=None):
+        return lambda ctx, i: (path, data)
+
+    def own_task(ctx, i):
+        return ctx['tasks'][i % len(ctx['tasks'])]
+
+    def fresh_task(ctx, i):
+        return Task.objects.create(title=f'Disposable {i}', user_id=ctx['user'].pk)
+
+    def deep_cursor(ctx, i):
+        oldest = ctx['tasks'][-2]
+        return (f"{reverse('task-list')}?cursor={KeysetPagination.encode_position(oldest)}", None)
+
+    def deep_page(ctx, i):
+        pages = max(1, -(-len(ctx['tasks']) // KeysetPagination.page_size))
+        return (f"{reverse('task-list')}?page={pages}", None)
+
+    return [
+        Scenario('register', 'post', lambda ctx, i: (reverse('register'), {
+            'username': f"{ctx['prefix']}_new_{ctx['run']}_{i}",
+            'password': BENCH_PASSWORD, 'password2': BENCH_PASSWORD,
+        }), auth=False),
+        Scenario('login', 'post', lambda ctx, i: (reverse('login'), {
+            'username': ctx['user'].username, 'password': BENCH_PASSWORD,
+        }), auth=False),
+        Scenario('refresh', 'post', lambda ctx, i: (
+            reverse('token_refresh'), {'refresh': ctx['refresh']}), auth=False),
+        Scenario('task_detail', 'get', lambda ctx, i: (
+            reverse('task-detail', args=[own_task(ctx, i).pk]), None)),
+        Scenario('task_list', 'get', static(reverse('task-list'))),
+        Scenario('task_list_status', 'get', static(reverse('task-list') + '?status=pending')),
+        Scenario('task_list_status_in', 'get', static(
+            reverse('task-list') + '?status__in=pending,in_progress')),
+        Scenario('task_list_due_range', 'get', static(
+            reverse('task-list') + '?due_date__gte=2000-01-01T00:00:00Z&due_date__lte=2100-01-01T00:00:00Z')),
+        Scenario('task_list_overdue', 'get', static(reverse('task-list') + '?overdue=true')),
+        Scenario('task_list_deep_page', 'get', deep_page),
+        Scenario('task_list_deep_cursor', 'get', deep_cursor),
+        Scenario('comment_list', 'get', lambda ctx, i: (
+            reverse('comment-list', args=[own_task(ctx, i).pk]), None)),
+        Scenario('task_create', 'post', static(reverse('create-task'), {'title': 'Bench task'})),
+        Scenario('task_update', 'patch', lambda ctx, i: (
+            reverse('task-update', args=[own_task(ctx, i).pk]), {'title': f'Renamed {i}'})),
+        Scenario('comment_create', 'post', lambda ctx, i: (
+            reverse('comment-create', args=[own_task(ctx, i).pk]), {'text': f'Bench comment {i}'})),
+        Scenario('task_delete', 'delete', lambda ctx, i: (
+            reverse('task-delete', args=[fresh_task(ctx, i).pk]), None)),
+        Scenario('task_bulk_create', 'post', static(
+            reverse('task-bulk-create'), [{'title': f'Bulk {n}'} for n in range(100)])),
+        Scenario('logout', 'post', lambda ctx, i: (
+            reverse('logout'), {'refresh': str(RefreshToken.for_user(ctx['user']))})),
+    ]
+
+
+def percentile(samples, q):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[q - 1]
+
+
+def run(user, iterations=50, scenarios=None, only=None, prefix='bench'):
+    """
+    Run every scenario ``iterations`` times as ``user`` and return a dict of
+    results keyed by scenario name. Queries are counted on an untimed warmup
+    request so that query logging does not distort the timings.
+    """
+    client = APIClient()
+    login = client.post(reverse('login'), {'username': user.username, 'password': BENCH_PASSWORD})
+    if login.status_code != 200:
+        raise RuntimeError(f'Benchmark login failed: {login.status_code} {login.content!r}')
+
+    ctx = {
+        'user': user,
+        'prefix': prefix,
+        'run': time.time_ns(),
+        'refresh': login.data['refresh'],
+        'tasks': list(Task.objects.filter(user_id=user.pk).order_by('-created_at', '-pk')),
+    }
+    auth = f"Bearer {login.data['access']}"
+
+    results = {}
+    for scenario in scenarios or default_scenarios():
+        if only and scenario.name not in only:
+            continue
+
+        def request(i):
+            path, data = scenario.build(ctx, i)
+            headers = {'HTTP_AUTHORIZATION': auth} if scenario.auth else {}
+            send = getattr(client, scenario.method)
+            started = time.perf_counter()
+            response = send(path, data, format='json', **headers)
+            return time.perf_counter() - started, response
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            _, response = request(iterations)
+        queries = len(captured)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{scenario.name} failed: {response.status_code} {getattr(response, "data", "")}')
+
+        timings = []
+        bytes_out = 0
+        for i in range(iterations):
+            elapsed, response = request(i)
+            timings.append(elapsed)
+            bytes_out += len(response.content)
+
+        total = sum(timings)
+        results[scenario.name] = {
+            'iterations': iterations,
+            'p50_ms': percentile(timings, 50) * 1000,
+            'p95_ms': percentile(timings, 95) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'mean_ms': total / iterations * 1000,
+            'throughput_rps': iterations / total if total else 0.0,
+            'queries': queries,
+            'bytes': bytes_out // iterations,
+        }
+    return results
+
+
+def asgi_scope(method, path, headers=(), payload=b''):
+    path, _, query = path.partition('?')
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method.upper(),
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(payload)).encode()),
+                    *((name.lower().encode(), value.encode()) for name, value in headers)],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+async def asgi_request(app, method, path, headers=(), body=None):
+    """
+    Send one HTTP request straight to the ASGI callable ``app`` and return
+    ``(status, body)``.
+    """
+    payload = b'' if body is None else json.dumps(body).encode()
+    scope = asgi_scope(method, path, headers, payload)
+    disconnect = asyncio.get_running_loop().create_future()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': payload, 'more_body': False}
+        # Never disconnect; Django cancels this listener once it has responded.
+        return await disconnect
+
+    response = {'status': None, 'body': []}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return response['status'], b''.join(response['body'])
+
+
+class EventStreamClient:
+    """
+    An open streaming response from the ASGI callable ``app``, e.g. an
+    event stream. ``open()`` waits for the response headers; the body
+    arrives in ``chunks`` until ``close()`` disconnects the client.
+    """
+
+    def __init__(self, app, path, headers=()):
+        self.app = app
+        self.scope = asgi_scope('get', path, headers)
+        self.status = None
+        self.chunks = asyncio.Queue()
+        self.disconnected = None
+        self.task = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.disconnected = loop.create_future()
+        started = loop.create_future()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await self.disconnected
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                self.status = message['status']
+                started.set_result(None)
+            elif message.get('body'):
+                self.chunks.put_nowait(message['body'])
+
+        self.task = loop.create_task(self.app(self.scope, receive, send))
+        await asyncio.wait([started, self.task], return_when=asyncio.FIRST_COMPLETED)
+        return self
+
+    async def read(self, timeout=1):
+        return await asyncio.wait_for(self.chunks.get(), timeout)
+
+    async def close(self):
+        if not self.disconnected.done():
+            self.disconnected.set_result(None)
+        await self.task
+
+
+def run_concurrent(app, build, clients=1000, requests_per_client=5):
+    """
+    Start ``clients`` concurrent clients that each send
+    ``requests_per_client`` requests, one after another, to the ASGI
+    ``app``. ``build(client, i)`` returns ``(method, path, headers, body)``.
+    Returns latency percentiles, throughput and the number of failed
+    requests.
+    """
+    async def client(n):
+        timings, failures = [], 0
+        for i in range(requests_per_client):
+            method, path, headers, body = build(n, i)
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, headers, body)
+            timings.append(time.perf_counter() - started)
+            failures += status >= 400
+        return timings, failures
+
+    async def main():
+        started = time.perf_counter()
+        done = await asyncio.gather(*(client(n) for n in range(clients)))
+        return time.perf_counter() - started, done
+
+    wall, done = asyncio.run(main())
+    timings = [t for client_timings, _ in done for t in client_timings]
+    return {
+        'requests': len(timings),
+        'concurrency': clients,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'throughput_rps': len(timings) / wall if wall else 0.0,
+        'failures': sum(failures for _, failures in done),
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Return a list of human-readable regressions of ``current`` against
+    ``baseline``: p95 latency growing by more than ``threshold`` (a ratio)
+    or any increase in queries per request.
+    """
+    regressions = []
+    for name, before in baseline.get('results', {}).items():
+        after = current.get('results', {}).get(name)
+        if after is None:
+            continue
+        if after['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.2f}ms -> {after['p95_ms']:.2f}ms "
+                f"(+{(after['p95_ms'] / before['p95_ms'] - 1) * 100:.0f}%)")
+        if after['queries'] > before['queries']:
+            regressions.append(
+                f"{name}: queries {before['queries']} -> {after['queries']}")
+    return regressions
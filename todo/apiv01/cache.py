@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+class CacheStats:
+    """In-process hit/miss counters for the response cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+cache_stats = CacheStats()
+
+
+def generation_key(scope, ident):
+    return f'apiv01:gen:{scope}:{ident}'
+
+
+def get_generation(scope, ident):
+    """
+    Return the current generation for ``scope``/``ident``.
+
+    A missing counter is seeded from the clock rather than 1, so a counter
+    that was evicted never comes back with a value used by older entries.
+    """
+    cache = get_cache()
+    key = generation_key(scope, ident)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key, time.time_ns())
+    return generation
+
+
+def bump_generation(scope, ident):
+    """Invalidate every cached response of ``scope``/``ident`` without scanning keys."""
+    cache = get_cache()
+    key = generation_key(scope, ident)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_generations(scope, idents):
+    """
+    Invalidate many owners of ``scope`` in one cache call. Their counters
+    are dropped, and get_generation() reseeds them from the clock.
+    """
+    get_cache().delete_many([generation_key(scope, ident) for ident in idents])
+
+
+class CachedListMixin:
+    """
+    Cache serialized list pages per user in Django's cache framework.
+
+    Entries are keyed by ``cache_scope``, the generation of the object that
+    owns the list (``get_cache_owner()``) and the full request URI, which
+    covers filters, ordering, page and cursor. Writes bump the generation
+    from signal handlers, orphaning every older entry at once.
+    """
+    cache_scope = None
+
+    def get_cache_owner(self):
+        raise NotImplementedError('`get_cache_owner()` must be implemented.')
+
+    def get_cache_key(self):
+        owner = self.get_cache_owner()
+        generation = get_generation(self.cache_scope, owner)
+        uri = hashlib.md5(self.request.build_absolute_uri().encode(), usedforsecurity=False)
+        return (
+            f'apiv01:resp:{self.cache_scope}:{owner}:{generation}:'
+            f'{self.request.user.pk}:{uri.hexdigest()}'
+        )
+
+    def list(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key()
+        data = cache.get(key)
+        if data is not None:
+            cache_stats.record(hit=True)
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        cache_stats.record(hit=False)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300))
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,101 @@
+"""
+System checks for state that settings and models cannot express.
+
+``check_triggers`` is a database check that the triggers created by raw
+SQL in migrations 0009 (search), 0010 (delta sync change log) and 0011
+(task counters) exist. Nothing in the models declares them, so a
+migration that rebuilds apiv01_task or apiv01_comment on SQLite (as many
+AlterField operations do) drops them without an error, and search, sync
+and the statistics quietly go stale. ``migrate`` runs this check, and so
+does ``check --database default``.
+
+``check_blacklist_filter`` warns when the refresh token Bloom filter
+(apiv01.tokens) is on with a per-process cache, where other processes'
+logouts reach it late.
+"""
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from .cache import get_cache
+
+
+# Migration -> vendor -> names of the triggers it creates.
+TRIGGERS = {
+    '0009_task_search': {
+        'sqlite': [
+            'apiv01_task_fts_insert', 'apiv01_task_fts_update', 'apiv01_task_fts_delete',
+            'apiv01_comment_fts_insert', 'apiv01_comment_fts_update', 'apiv01_comment_fts_delete',
+        ],
+        'postgresql': ['apiv01_task_search_task', 'apiv01_task_search_comment'],
+    },
+    '0010_task_change': {
+        'sqlite': ['apiv01_taskchange_insert', 'apiv01_taskchange_update', 'apiv01_taskchange_delete'],
+        'postgresql': ['apiv01_taskchange_log'],
+    },
+    '0011_task_counter': {
+        'sqlite': ['apiv01_taskcounter_insert', 'apiv01_taskcounter_delete', 'apiv01_taskcounter_update'],
+        'postgresql': ['apiv01_taskcounter_count', 'apiv01_taskcounter_update'],
+    },
+}
+
+TRIGGERS_SQL = {
+    'sqlite': "SELECT name FROM sqlite_master WHERE type = 'trigger'",
+    'postgresql': "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal",
+}
+
+
+def database_triggers(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(TRIGGERS_SQL[connection.vendor])
+        return {name for name, in cursor.fetchall()}
+
+
+def expected_triggers(connection):
+    """The triggers of the apiv01 migrations applied to ``connection``."""
+    applied = MigrationRecorder(connection).applied_migrations()
+    return [
+        name
+        for migration, vendors in TRIGGERS.items()
+        if ('apiv01', migration) in applied
+        for name in vendors[connection.vendor]
+    ]
+
+
+@register(Tags.database)
+def check_triggers(app_configs=None, databases=None, **kwargs):
+    if app_configs is not None and not any(config.name == 'apiv01' for config in app_configs):
+        return []
+    warnings = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor not in TRIGGERS_SQL:
+            continue
+        existing = database_triggers(connection)
+        missing = [name for name in expected_triggers(connection) if name not in existing]
+        if missing:
+            warnings.append(Warning(
+                f"Database '{alias}' is missing the triggers {', '.join(missing)}.",
+                hint="A migration probably rebuilt apiv01_task or apiv01_comment; add a "
+                     "RunPython operation to it that creates them again (see migrations "
+                     "0009 to 0011).",
+                id='apiv01.W001',
+            ))
+    return warnings
+
+
+@register(Tags.caches)
+def check_blacklist_filter(app_configs=None, **kwargs):
+    shared = not isinstance(get_cache(), (LocMemCache, DummyCache))
+    if getattr(settings, 'JWT_BLACKLIST_FILTER', False) and not shared:
+        return [Warning(
+            "JWT_BLACKLIST_FILTER is on, but the cache is not shared between processes.",
+            hint="A token blacklisted by one process stays usable in the others for up to "
+                 "JWT_BLACKLIST_SYNC_INTERVAL seconds. Use the file or redis cache backend, "
+                 "or set TODO_JWT_BLACKLIST_FILTER=0.",
+            id='apiv01.W002',
+        )]
+    return []
@@ -0,0 +1,118 @@
+"""
+Content codings for response bodies.
+
+``choose_encoding()`` picks the best coding a request accepts among the
+ones this process can produce: ``gzip`` always, ``br`` with the optional
+``brotli`` package and ``zstd`` with the optional ``zstandard`` package.
+``compress()`` encodes a whole body and ``StreamCompressor`` a streamed
+one, chunk by chunk.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Levels for bodies compressed once and served many times.
+BEST_LEVELS = {'br': 11, 'zstd': 19, 'gzip': 9}
+# Levels for bodies compressed on every response: most of the size win for
+# a fraction of the CPU of the best levels.
+FAST_LEVELS = {'br': 4, 'zstd': 3, 'gzip': 6}
+
+
+def available_encodings(preference=('br', 'zstd', 'gzip')):
+    """The codings of ``preference`` this process can produce, in that order."""
+    installed = {'br': brotli is not None, 'zstd': zstandard is not None, 'gzip': True}
+    return tuple(coding for coding in preference if installed.get(coding))
+
+
+def parse_accept_encoding(header):
+    """Map each coding of an ``Accept-Encoding`` header to its quality."""
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = item.strip().split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(request, encodings=None):
+    """
+    The coding of ``encodings`` (default: all available) that ``request``
+    accepts with the highest quality, earlier ones winning ties, or
+    ``None`` for the identity coding.
+    """
+    qualities = parse_accept_encoding(request.headers.get('Accept-Encoding', ''))
+    best, best_quality = None, 0.0
+    for coding in encodings if encodings is not None else available_encodings():
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body, encoding, level=None):
+    """Encode ``body`` with ``encoding``; ``level`` defaults to the coding's best."""
+    if level is None:
+        level = BEST_LEVELS.get(encoding)
+    if encoding == 'gzip':
+        # No timestamp, so the same body always compresses to the same bytes.
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported content coding {encoding!r}.")
+
+
+class StreamCompressor:
+    """
+    Incremental ``encoding`` of a streamed body. ``compress()`` returns each
+    chunk flushed, so the client can decode what has been sent so far;
+    ``finish()`` returns the end of the stream.
+    """
+
+    def __init__(self, encoding, level=None):
+        if level is None:
+            level = BEST_LEVELS.get(encoding)
+        if encoding == 'gzip':
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._process = compressor.compress
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = compressor.flush
+        elif encoding == 'br':
+            compressor = brotli.Compressor(quality=level)
+            self._process = compressor.process
+            self._flush = compressor.flush
+            self._finish = compressor.finish
+        elif encoding == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=level).compressobj()
+            self._process = compressor.compress
+            self._flush = lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            self._finish = compressor.flush
+        else:
+            raise ValueError(f"Unsupported content coding {encoding!r}.")
+
+    def compress(self, chunk):
+        return self._process(chunk) + self._flush()
+
+    def finish(self):
+        return self._finish()
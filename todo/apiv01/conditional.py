@@ -0,0 +1,51 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Answer ``If-None-Match``/``If-Modified-Since`` on GET with a 304 before
+    the queryset is evaluated or the serializer runs.
+
+    Views implement ``get_conditional_state()`` returning a tuple of values
+    that change whenever the response would (cheap aggregates such as
+    ``max(updated_at)`` and ``count``), or ``None`` to skip the check.
+    ``get_last_modified()`` may return a datetime for ``Last-Modified``.
+    """
+
+    def get_conditional_state(self):
+        raise NotImplementedError('`get_conditional_state()` must be implemented.')
+
+    def get_last_modified(self, state):
+        return None
+
+    def get_etag(self, state):
+        digest = hashlib.md5(usedforsecurity=False)
+        digest.update(self.request.get_full_path().encode())
+        digest.update(str(self.request.user.pk).encode())
+        for value in state:
+            digest.update(b'\0')
+            digest.update(str(value).encode())
+        return quote_etag(digest.hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        state = self.get_conditional_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = self.get_etag(state)
+        last_modified = self.get_last_modified(state)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ['Authorization'])
+        return response
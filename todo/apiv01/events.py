@@ -0,0 +1,331 @@
+"""
+Server-sent events: task and comment changes pushed to connected clients.
+
+Signal handlers call ``publish()`` once the write has committed. The
+event is encoded into its SSE frame once, in the publishing thread, and
+handed to the configured backend:
+
+* ``LocalBackend`` delivers straight to the ``broker`` of this process,
+  so only clients connected to the same process see the event.
+* ``RedisBackend`` publishes every frame on one Redis pub/sub channel, and
+  a listener thread in each process feeds what it receives to its own
+  ``broker``. It needs the optional ``redis`` package.
+
+The broker keeps the open streams per user. Each stream is a
+``Subscription`` owned by the event loop that serves it; other threads
+hand frames over with ``call_soon_threadsafe()``. ``EventStreamRouter``,
+installed in front of Django in todo/asgi.py, serves the streams.
+
+Events are not replayed. A client that reconnects, or whose buffer
+overflowed (the ``resync`` event), catches up with a delta sync.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import StreamJWTAuthentication
+
+
+logger = logging.getLogger(__name__)
+
+renderer = JSONRenderer()
+
+
+def format_event(event, data):
+    """Encode one SSE frame. Rendered JSON has no raw newlines, so ``data`` fits on one line."""
+    return b'event: ' + event.encode('ascii') + b'\ndata: ' + renderer.render(data) + b'\n\n'
+
+
+READY = b'retry: 3000\n' + format_event('ready', {})
+RESYNC = format_event('resync', {})
+EXPIRED = format_event('expired', {})
+HEARTBEAT = b': heartbeat\n\n'
+
+
+class Subscription:
+    """
+    The frames waiting for one stream. Only the owning event loop touches
+    it; ``get()`` returns the queued frames, or none after ``timeout``.
+    """
+    __slots__ = ('user_id', 'loop', 'frames', 'max_frames', 'waiter', 'overflowed', 'closed')
+
+    def __init__(self, user_id, loop, max_frames):
+        self.user_id = user_id
+        self.loop = loop
+        self.frames = deque()
+        self.max_frames = max_frames
+        self.waiter = None
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, frame):
+        if len(self.frames) >= self.max_frames:
+            # A client this far behind resyncs rather than replaying the backlog.
+            self.overflowed = True
+            self.frames.clear()
+        else:
+            self.frames.append(frame)
+        self.wake()
+
+    def close(self):
+        self.closed = True
+        self.wake()
+
+    def wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def get(self, timeout):
+        if not self.frames and not self.overflowed and not self.closed:
+            self.waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, self.wake)
+            try:
+                await self.waiter
+            finally:
+                timer.cancel()
+                self.waiter = None
+        frames = list(self.frames)
+        self.frames.clear()
+        return frames
+
+
+class Broker:
+    """Thread-safe registry of the open streams of this process, per user."""
+
+    def __init__(self, max_frames=100):
+        self.max_frames = max_frames
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, loop):
+        subscription = Subscription(user_id, loop, self.max_frames)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscriptions
+
+    def count(self):
+        with self._lock:
+            return sum(map(len, self._subscriptions.values()))
+
+    def deliver(self, user_id, frame):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, frame)
+            except RuntimeError:
+                # The loop has been closed under the stream.
+                self.unsubscribe(subscription)
+
+    def reset(self):
+        with self._lock:
+            self._subscriptions.clear()
+
+
+broker = Broker(max_frames=getattr(settings, 'EVENTS_MAX_PENDING', 100))
+
+
+class LocalBackend:
+    """Deliver events to the streams of this process only."""
+
+    def start(self):
+        pass
+
+    def wants(self, user_id):
+        return broker.has_subscribers(user_id)
+
+    def publish(self, user_id, frame):
+        broker.deliver(user_id, frame)
+
+
+class RedisBackend:
+    """
+    Fan events out to every process through Redis pub/sub. Needs the
+    optional ``redis`` package.
+    """
+    channel = 'todo:events'
+
+    def __init__(self):
+        import redis
+
+        self.redis = redis
+        self.client = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name='apiv01-events', daemon=True)
+                self._listener.start()
+
+    def wants(self, user_id):
+        # Streams of other processes are not known here.
+        return True
+
+    def publish(self, user_id, frame):
+        self.client.publish(self.channel, b'%d:%s' % (user_id, frame))
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    user_id, frame = message['data'].split(b':', 1)
+                    broker.deliver(int(user_id), frame)
+            except self.redis.RedisError:
+                logger.exception("Lost the Redis events channel, reconnecting")
+                time.sleep(1)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.EVENTS_BACKEND)()
+    return _backend
+
+
+def publish(user_id, event, build):
+    """
+    Send ``event`` to ``user_id``'s streams, with the data returned by
+    ``build()``. Nothing is built when no stream can receive it.
+    """
+    backend = get_backend()
+    if not backend.wants(user_id):
+        return
+    try:
+        backend.publish(user_id, format_event(event, build()))
+    except Exception:
+        # The write has committed already; a lost event must not fail it.
+        logger.exception("Could not publish %s to user %s", event, user_id)
+
+
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+class EventStreamRouter:
+    """
+    ASGI application that serves the event stream at the ``task-events``
+    route itself and hands every other request to ``app``.
+
+    A stream bypasses Django's request handling on purpose: the handler
+    keeps a thread for each request until its response ends, one per open
+    stream. Here the client is authenticated like the async views, and an
+    idle stream is only its subscription and the task waiting for the
+    client to disconnect.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.authentication = StreamJWTAuthentication()
+        self._path = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = reverse('task-events')
+        return self._path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.path:
+            return await self.app(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await self.reject(send, status.HTTP_405_METHOD_NOT_ALLOWED,
+                                     {'detail': f'Method "{scope["method"]}" not allowed.'}, [(b'allow', b'GET')])
+        try:
+            request = ASGIRequest(scope, BytesIO())
+            result = await self.authentication.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            header = self.authentication.authenticate_header(request).encode('latin-1')
+            return await self.reject(send, status.HTTP_401_UNAUTHORIZED, detail, [(b'www-authenticate', header)])
+        await self.stream(result[0].pk, result[1], receive, send)
+
+    async def reject(self, send, status_code, data, headers):
+        await send({'type': 'http.response.start', 'status': status_code,
+                    'headers': [(b'content-type', b'application/json'), *headers]})
+        await send({'type': 'http.response.body', 'body': renderer.render(data)})
+
+    async def stream(self, user_id, validated_token, receive, send):
+        """
+        ``ready`` once subscribed, then each event as it is published, with
+        a comment line every ``EVENTS_HEARTBEAT`` seconds so that proxies
+        keep the connection open.
+
+        The stream lasts as long as its access token: it ends with
+        ``expired`` when the token's ``exp`` passes, and without a word
+        once the user is deactivated or deleted, which is checked again
+        every heartbeat through the user-state cache.
+        """
+        heartbeat = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+        expires = validated_token['exp']
+        loop = asyncio.get_running_loop()
+        get_backend().start()
+        subscription = broker.subscribe(user_id, loop)
+        watcher = loop.create_task(self.watch(receive, subscription))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+            await send({'type': 'http.response.body', 'body': READY, 'more_body': True})
+            checked = time.monotonic()
+            while True:
+                remaining = expires - time.time()
+                if remaining <= 0:
+                    await send({'type': 'http.response.body', 'body': EXPIRED})
+                    return
+                frames = await subscription.get(min(heartbeat, remaining))
+                if subscription.closed:
+                    return
+                if subscription.overflowed:
+                    await send({'type': 'http.response.body', 'body': RESYNC})
+                    return
+                if time.monotonic() - checked >= heartbeat:
+                    try:
+                        await self.authentication.aget_user(validated_token)
+                    except exceptions.AuthenticationFailed:
+                        await send({'type': 'http.response.body', 'body': b''})
+                        return
+                    checked = time.monotonic()
+                if not frames and time.time() >= expires:
+                    # Woken by the expiry rather than the heartbeat.
+                    continue
+                await send({'type': 'http.response.body', 'body': b''.join(frames) or HEARTBEAT,
+                            'more_body': True})
+        finally:
+            watcher.cancel()
+            broker.unsubscribe(subscription)
+
+    async def watch(self, receive, subscription):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
@@ -0,0 +1,19 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from .hashers import HashingBusy
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress, please retry shortly.'
+    default_code = 'hashing_busy'
+    wait = 1
+
+
+def exception_handler(exc, context):
+    """DRF's handler, which also answers a full password hashing gate with a 503."""
+    if isinstance(exc, HashingBusy):
+        exc = HashingUnavailable()
+    return drf_exception_handler(exc, context)
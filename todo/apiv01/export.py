@@ -0,0 +1,122 @@
+"""
+Streaming export of a user's tasks with their comments.
+
+Rows are read with ``values_list().iterator()`` in chunks and encoded
+straight to NDJSON or CSV text, without model instances or serializers.
+Each chunk of tasks costs one query for its comments, and only one chunk
+is held in memory at a time, so memory stays flat however many rows are
+exported. Field names and value formats match the API's JSON.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from rest_framework.negotiation import BaseContentNegotiation
+
+from .models import Comment
+
+
+EXPORT_CHUNK_SIZE = 1000
+
+TASK_FIELDS = ('id', 'title', 'description', 'status', 'due_date', 'created_at', 'updated_at',
+               'user_id', 'comment_count', 'last_commented_at')
+TASK_KEYS = ('id', 'title', 'description', 'status', 'due_date', 'created_at', 'updated_at',
+             'user', 'comment_count', 'last_commented_at')
+COMMENT_FIELDS = ('id', 'task_id', 'text', 'created_at', 'user_id')
+COMMENT_KEYS = ('id', 'task', 'text', 'created_at', 'user')
+
+CSV_HEADER = ('record', 'id', 'task', 'title', 'description', 'status', 'due_date', 'created_at',
+              'updated_at', 'user', 'comment_count', 'last_commented_at', 'text')
+
+
+def format_value(value):
+    # Same representation as rest_framework.fields.DateTimeField with UTC.
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+    return value
+
+
+def iter_chunks(tasks, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of ``(task_row, comment_rows)`` pairs, ``chunk_size`` tasks
+    at a time, in primary key order.
+    """
+    rows = tasks.order_by('pk').values_list(*TASK_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        comments = defaultdict(list)
+        comment_rows = Comment.objects.filter(task_id__in=[row[0] for row in chunk]) \
+            .order_by('task_id', 'pk').values_list(*COMMENT_FIELDS)
+        for row in comment_rows.iterator(chunk_size=chunk_size):
+            comments[row[1]].append(row)
+        yield [(row, comments.get(row[0], ())) for row in chunk]
+
+
+def ndjson_chunks(chunks):
+    """One JSON object per task and line, with its comments nested."""
+    for chunk in chunks:
+        lines = []
+        for task, comments in chunk:
+            record = dict(zip(TASK_KEYS, map(format_value, task)))
+            record['comments'] = [
+                dict(zip(COMMENT_KEYS, map(format_value, comment))) for comment in comments]
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(chunks):
+    """A ``task`` row per task followed by a ``comment`` row per comment."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    # The header goes out on its own, so an export with no tasks still has it.
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for chunk in chunks:
+        for task, comments in chunk:
+            (pk, title, description, status, due_date, created_at, updated_at,
+             user, comment_count, last_commented_at) = map(format_value, task)
+            writer.writerow(('task', pk, '', title, description, status, due_date, created_at,
+                             updated_at, user, comment_count, last_commented_at, ''))
+            for comment in comments:
+                comment_pk, task_pk, text, created_at, user = map(format_value, comment)
+                writer.writerow(('comment', comment_pk, task_pk, '', '', '', '', created_at,
+                                 '', user, '', '', text))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', ndjson_chunks),
+    'csv': ('text/csv', csv_chunks),
+}
+
+
+def export(tasks, export_format='ndjson', chunk_size=EXPORT_CHUNK_SIZE):
+    """Return a generator of text chunks exporting ``tasks`` in ``export_format``."""
+    _, encode = EXPORT_FORMATS[export_format]
+    return encode(iter_chunks(tasks, chunk_size))
+
+
+class RawBodyContentNegotiation(BaseContentNegotiation):
+    """
+    For views that stream their body in or out directly: the ``Accept``
+    header and the ``format`` query parameter (which names the export or
+    import format) are not matched against renderers. The first renderer
+    is used for JSON responses and errors.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
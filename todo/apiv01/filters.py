@@ -1,10 +1,37 @@
 import django_filters
-from .models import Task
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import COMPLETED, Task
+from .search import search_tasks
+
+
+class StatusInFilter(django_filters.BaseInFilter, django_filters.ChoiceFilter):
+    pass
+
 
 class TaskFilter(django_filters.FilterSet):
     status = django_filters.ChoiceFilter(choices=Task.TASK_STATUS)
+    status__in = StatusInFilter(field_name='status', choices=Task.TASK_STATUS)
     due_date = django_filters.DateTimeFilter()
+    due_date__gte = django_filters.DateTimeFilter(field_name='due_date', lookup_expr='gte')
+    due_date__lte = django_filters.DateTimeFilter(field_name='due_date', lookup_expr='lte')
+    overdue = django_filters.BooleanFilter(method='filter_overdue')
+    q = django_filters.CharFilter(
+        method='filter_search', label="Search titles, descriptions and comments; best matches first.")
 
     class Meta:
         model = Task
-        fields = ['status', 'due_date']
+        fields = ['status', 'status__in', 'due_date', 'due_date__gte', 'due_date__lte', 'overdue', 'q']
+
+    def filter_overdue(self, queryset, name, value):
+        now = timezone.now()
+        if value:
+            return queryset.filter(due_date__lt=now).exclude(status=COMPLETED)
+        return queryset.filter(
+            Q(due_date__isnull=True) | Q(due_date__gte=now) | Q(status=COMPLETED)
+        )
+
+    def filter_search(self, queryset, name, value):
+        owner = getattr(getattr(self.request, 'user', None), 'pk', None)
+        return search_tasks(queryset, value, owner)
@@ -0,0 +1,124 @@
+"""
+Password hashers with work factors taken from settings, and a gate that
+bounds how many hashes a process computes at once.
+
+The classes keep the algorithm names of Django's hashers, so existing
+hashes stay valid. ``must_update()`` compares a stored hash with the
+current parameters, so ``check_password`` rehashes a user's password on
+their next successful login after ``TODO_PASSWORD_HASHER`` or a work factor
+changes.
+
+Every hash takes a slot from ``hashing_gate``. Slots are
+``PASSWORD_HASHING_CONCURRENCY`` per process, so a login spike cannot
+occupy every core and starve the task endpoints. A hash that waits
+longer than ``PASSWORD_HASHING_TIMEOUT`` seconds for a slot raises
+``HashingBusy``. The API answers it with a 503 and ``Retry-After``
+(apiv01.exceptions); elsewhere, e.g. the admin login, it is an error.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class HashingBusy(Exception):
+    """No hashing slot freed up within ``PASSWORD_HASHING_TIMEOUT`` seconds."""
+
+
+class HashingGate:
+    """A bounded semaphore sized from settings on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphore = None
+
+    def reset(self):
+        with self._lock:
+            self._semaphore = None
+
+    @property
+    def semaphore(self):
+        with self._lock:
+            if self._semaphore is None:
+                self._semaphore = threading.BoundedSemaphore(
+                    getattr(settings, 'PASSWORD_HASHING_CONCURRENCY', 1))
+            return self._semaphore
+
+    @contextmanager
+    def slot(self):
+        semaphore = self.semaphore
+        if not semaphore.acquire(timeout=getattr(settings, 'PASSWORD_HASHING_TIMEOUT', None)):
+            raise HashingBusy(
+                f"No password hashing slot free after {getattr(settings, 'PASSWORD_HASHING_TIMEOUT', None)} s "
+                f"(PASSWORD_HASHING_CONCURRENCY is {getattr(settings, 'PASSWORD_HASHING_CONCURRENCY', 1)}).")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+hashing_gate = HashingGate()
+
+
+@receiver(setting_changed)
+def reset_hashing_gate(setting, **kwargs):
+    if setting == 'PASSWORD_HASHING_CONCURRENCY':
+        hashing_gate.reset()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+    def encode(self, password, salt, iterations=None):
+        # verify() and harden_runtime() go through encode() too.
+        with hashing_gate.slot():
+            return super().encode(password, salt, iterations)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', hashers.ScryptPasswordHasher.parallelism)
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        with hashing_gate.slot():
+            return super().encode(password, salt, n, r, p)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Needs the optional ``argon2-cffi`` package."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+    def encode(self, password, salt):
+        with hashing_gate.slot():
+            return super().encode(password, salt)
+
+    def verify(self, password, encoded):
+        with hashing_gate.slot():
+            return super().verify(password, encoded)
@@ -0,0 +1,305 @@
+"""
+Batched import of tasks and their comments from NDJSON or CSV.
+
+The input format is the one written by ``export.py``: an NDJSON object
+per task with optional nested ``comments``, or CSV ``task`` rows each
+followed by its ``comment`` rows. Records are validated a batch at a
+time: statuses, due dates and titles column-wise, and owners with one
+query per batch. Valid records are written with ``bulk_create`` in one
+transaction per batch. Invalid records are reported by position and
+skipped. An ``ImportCheckpoint`` advances in the same transaction, so an
+interrupted import resumes after the last committed batch.
+"""
+import csv
+import json
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import bump_generation
+from .events import publish
+from .models import Task, Comment, ImportCheckpoint
+
+
+IMPORT_BATCH_SIZE = 2000
+IMPORT_MAX_ERRORS = 100
+
+TASK_STATUSES = frozenset(dict(Task.TASK_STATUS))
+TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+
+class InvalidRecord(dict):
+    """Stands in for a record the reader could not decode."""
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield InvalidRecord(non_field_errors=[f"Invalid JSON: {exc}"])
+            continue
+        yield record if isinstance(record, dict) else InvalidRecord(
+            non_field_errors=["Expected a JSON object."])
+
+
+def read_csv(lines):
+    """
+    Group CSV rows into task records. Rows whose ``record`` column is
+    ``comment`` belong to the task row before them; without a ``record``
+    column every row is a task.
+    """
+    lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+    record = None
+    for row in csv.DictReader(lines):
+        if row.get('record') == 'comment':
+            if record is None or isinstance(record, InvalidRecord):
+                record = InvalidRecord(non_field_errors=["Comment row without a task row."])
+            else:
+                record['comments'].append({'text': row.get('text'), 'user': row.get('user') or None})
+            continue
+        if record is not None:
+            yield record
+        record = {
+            'title': row.get('title'),
+            'description': row.get('description') or None,
+            'status': row.get('status') or None,
+            'due_date': row.get('due_date') or None,
+            'user': row.get('user') or None,
+            'comments': [],
+        }
+    if record is not None:
+        yield record
+
+
+IMPORT_FORMATS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def parse_due_date(value):
+    if value is None or isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError
+    else:
+        raise ValueError
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_user(value):
+    """
+    A user id from JSON (an int, or a float such as ``3.0``) or CSV (a
+    string of digits). Fractional ids raise rather than being truncated.
+    """
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError
+        return int(value)
+    if isinstance(value, (int, str)):
+        return int(value)
+    raise TypeError
+
+
+class TaskImporter:
+    """
+    Import task records for ``owner_id``, or, without one, for the user
+    named by each record's ``user`` field. ``progress(result)`` is called
+    after every committed batch.
+
+    Past due dates are accepted: imported tasks carry history that the
+    API's create validation would reject.
+    """
+
+    def __init__(self, owner_id=None, batch_size=IMPORT_BATCH_SIZE, checkpoint=None, progress=None):
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progress = progress
+
+    def run(self, records, resume=False):
+        """Import ``records`` and return a summary dict."""
+        skip = 0
+        if self.checkpoint is not None:
+            checkpoint, _ = ImportCheckpoint.objects.get_or_create(user_id=self.owner_id, name=self.checkpoint)
+            if resume:
+                skip = checkpoint.records
+            else:
+                ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(records=0)
+
+        self.result = {
+            'skipped': skip,
+            'processed': skip,
+            'tasks': 0,
+            'comments': 0,
+            'invalid': 0,
+            'errors': [],
+            'elapsed': 0.0,
+            'rows_per_second': 0.0,
+        }
+        started = time.perf_counter()
+        records = iter(records)
+        for _ in range(skip):
+            if next(records, None) is None:
+                break
+
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, started)
+                batch = []
+        if batch:
+            self.import_batch(batch, started)
+        return self.result
+
+    def import_batch(self, batch, started):
+        offset = self.result['processed']
+        tasks, comments, errors = self.validate(batch, offset)
+
+        owners = {task.user_id for task in tasks}
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+            for task, task_comments in zip(tasks, comments):
+                for comment in task_comments:
+                    comment.task_id = task.pk
+            Comment.objects.bulk_create(
+                [comment for task_comments in comments for comment in task_comments],
+                batch_size=self.batch_size,
+            )
+            if self.checkpoint is not None:
+                ImportCheckpoint.objects.filter(user_id=self.owner_id, name=self.checkpoint) \
+                    .update(records=offset + len(batch), updated_at=timezone.now())
+            for owner in owners:
+                transaction.on_commit(lambda owner=owner: bump_generation('tasks', owner))
+                transaction.on_commit(lambda owner=owner: publish(owner, 'tasks.changed', dict))
+
+        result = self.result
+        result['processed'] += len(batch)
+        result['tasks'] += len(tasks)
+        result['comments'] += sum(map(len, comments))
+        result['invalid'] += len(errors)
+        result['errors'].extend(errors[:IMPORT_MAX_ERRORS - len(result['errors'])])
+        result['elapsed'] = time.perf_counter() - started
+        rows = result['tasks'] + result['comments']
+        result['rows_per_second'] = rows / result['elapsed'] if result['elapsed'] else 0.0
+        if self.progress is not None:
+            self.progress(result)
+
+    def validate(self, batch, offset):
+        """
+        Return the ``Task`` objects of the valid records in ``batch``, their
+        ``Comment`` objects and a list of ``{"record", "errors"}`` for the rest.
+        """
+        errors = {}
+
+        def error(index, field, message):
+            errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+        titles = [record.get('title') for record in batch]
+        for index, title in enumerate(titles):
+            if not isinstance(title, str) or not title.strip():
+                error(index, 'title', "This field is required.")
+            elif len(title) > TITLE_MAX_LENGTH:
+                error(index, 'title', f"Ensure this field has no more than {TITLE_MAX_LENGTH} characters.")
+
+        for index, record in enumerate(batch):
+            if not isinstance(record.get('description'), (str, type(None))):
+                error(index, 'description', "Not a valid string.")
+
+        statuses = [record.get('status') or 'pending' for record in batch]
+        for index, status in enumerate(statuses):
+            if not isinstance(status, str) or status not in TASK_STATUSES:
+                error(index, 'status', "Invalid status value.")
+
+        due_dates = []
+        for index, record in enumerate(batch):
+            try:
+                due_dates.append(parse_due_date(record.get('due_date')))
+            except (ValueError, TypeError):
+                due_dates.append(None)
+                error(index, 'due_date', "Datetime has wrong format.")
+
+        comment_lists = [record.get('comments') or [] for record in batch]
+        for index, task_comments in enumerate(comment_lists):
+            if not isinstance(task_comments, list) or not all(
+                    isinstance(comment, dict) and isinstance(comment.get('text'), str) and comment['text']
+                    for comment in task_comments):
+                error(index, 'comments', "Every comment needs a non-empty text.")
+
+        owners = self.validate_owners(batch, comment_lists, error)
+
+        # Undecodable input replaces whatever the column checks made of it.
+        for index, record in enumerate(batch):
+            if isinstance(record, InvalidRecord):
+                errors[index] = dict(record)
+
+        now = timezone.now()
+        tasks, comments = [], []
+        for index, record in enumerate(batch):
+            if index in errors:
+                continue
+            owner = owners[index]
+            task_comments = [
+                Comment(text=comment['text'], user_id=owner if self.owner_id else
+                        parse_user(comment.get('user') or owner))
+                for comment in comment_lists[index]
+            ]
+            tasks.append(Task(
+                title=titles[index],
+                description=record.get('description'),
+                status=statuses[index],
+                due_date=due_dates[index],
+                user_id=owner,
+                comment_count=len(task_comments),
+                last_commented_at=now if task_comments else None,
+            ))
+            comments.append(task_comments)
+
+        return tasks, comments, [
+            {'record': offset + index, 'errors': errors[index]} for index in sorted(errors)]
+
+    def validate_owners(self, batch, comment_lists, error):
+        if self.owner_id is not None:
+            return [self.owner_id] * len(batch)
+
+        owners, wanted = [], set()
+        for index, record in enumerate(batch):
+            try:
+                owner = parse_user(record.get('user'))
+                wanted.add(owner)
+                for comment in comment_lists[index] if isinstance(comment_lists[index], list) else ():
+                    if isinstance(comment, dict) and comment.get('user') is not None:
+                        wanted.add(parse_user(comment['user']))
+            except (ValueError, TypeError):
+                owner = None
+                error(index, 'user', "A valid user id is required.")
+            owners.append(owner)
+
+        existing = set(User.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+        for index, owner in enumerate(owners):
+            if owner is None:
+                continue
+            referenced = {owner}
+            if isinstance(comment_lists[index], list):
+                referenced.update(
+                    parse_user(comment['user']) for comment in comment_lists[index]
+                    if isinstance(comment, dict) and comment.get('user') is not None)
+            if not referenced <= existing:
+                error(index, 'user', "User does not exist.")
+        return owners
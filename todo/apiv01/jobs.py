@@ -0,0 +1,350 @@
+"""
+Background jobs kept in the database and run by ``manage.py run_worker``.
+
+``enqueue()`` inserts a ``Job`` row in the caller's transaction, so a job
+queued by a write exists exactly when the write commits, and no broker is
+needed. Job functions are registered by name with ``@job('name')`` and
+are called with the payload's items as keyword arguments.
+
+A ``Worker`` claims due jobs in batches with one ``UPDATE ... RETURNING``
+(``FOR UPDATE SKIP LOCKED`` on PostgreSQL) and runs at most
+``concurrency`` at once in a thread or process pool. A claim is a lease of
+``JOBS_LEASE`` seconds: the job of a worker that died is queued again when
+its lease runs out, so jobs must be safe to run twice. A job that raises
+is retried with exponential backoff until it has been tried
+``max_attempts`` times, then left ``failed`` with its traceback.
+
+A ``unique_key`` makes ``enqueue()`` a no-op while a job with the same key
+exists, done jobs included until ``jobs.prune`` deletes them after
+``JOBS_RETENTION``.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from itertools import count
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+POOLS = ('thread', 'process', 'solo')
+
+registry = {}
+
+# The status literals match the partial index conditions, and the outer
+# status condition skips rows that another worker claimed first: SQLite
+# serializes writers, PostgreSQL skips the rows other claims have locked.
+CLAIM_SQL = """
+    UPDATE {table}
+    SET status = 'running', claimed_by = %s, lease_expires_at = %s, attempts = attempts + 1
+    WHERE status = 'queued' AND id IN (
+        SELECT id FROM {table} WHERE status = 'queued' AND run_at <= %s
+        ORDER BY run_at, id LIMIT %s{lock}
+    )
+    RETURNING id, name, payload, run_at, attempts, max_attempts
+"""
+CLAIM_LOCKS = {
+    'sqlite': '',
+    'postgresql': ' FOR UPDATE SKIP LOCKED',
+}
+
+
+def job(name):
+    """Register the decorated function as the job ``name``."""
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def jobs_setting(name, default):
+    return getattr(settings, f'JOBS_{name}', default)
+
+
+def new_job(name, payload=None, run_at=None, unique_key=None, max_attempts=None):
+    """An unsaved ``Job``, for ``enqueue_many()``."""
+    if name not in registry:
+        raise LookupError(f"No job is registered as {name!r}.")
+    return Job(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        unique_key=unique_key,
+        max_attempts=max_attempts or jobs_setting('MAX_ATTEMPTS', 5),
+    )
+
+
+def enqueue(name, payload=None, run_at=None, unique_key=None, max_attempts=None):
+    """
+    Queue the job ``name`` to run at ``run_at`` (default: now). Returns
+    the ``Job``, or ``None`` when ``unique_key`` is taken already.
+    """
+    instance = new_job(name, payload, run_at, unique_key, max_attempts)
+    if unique_key is None:
+        instance.save()
+        return instance
+    # Not Job.objects.create(): the IntegrityError would break the caller's transaction.
+    if enqueue_many([instance]):
+        return Job.objects.get(unique_key=unique_key)
+    return None
+
+
+def enqueue_many(jobs, batch_size=1000):
+    """
+    Insert the unsaved ``jobs``, skipping those whose ``unique_key`` is
+    taken. Returns how many were queued.
+    """
+    queued, keys = [], set()
+    for instance in jobs:
+        if instance.unique_key is not None:
+            if instance.unique_key in keys:
+                continue
+            keys.add(instance.unique_key)
+        queued.append(instance)
+    keys, taken = list(keys), set()
+    for start in range(0, len(keys), batch_size):
+        taken.update(Job.objects.filter(unique_key__in=keys[start:start + batch_size])
+                     .values_list('unique_key', flat=True))
+    jobs = [instance for instance in queued if instance.unique_key not in taken]
+    # ignore_conflicts covers a job queued between the lookup and the insert.
+    Job.objects.bulk_create(jobs, batch_size=batch_size, ignore_conflicts=True)
+    return len(jobs)
+
+
+def backoff(attempts):
+    """Seconds before retrying a job that failed its ``attempts``-th try, with jitter."""
+    delay = min(jobs_setting('RETRY_BACKOFF', 10) * 2 ** (attempts - 1), jobs_setting('RETRY_MAX_BACKOFF', 3600))
+    return delay * random.uniform(0.5, 1)
+
+
+def perform(claimed):
+    """Run one job claimed by ``Worker.claim()`` and record the outcome."""
+    mine = Job.objects.filter(pk=claimed['pk'], status=Job.RUNNING, claimed_by=claimed['claimed_by'])
+    try:
+        func = registry.get(claimed['name'])
+        if func is None:
+            raise LookupError(f"No job is registered as {claimed['name']!r}.")
+        func(**claimed['payload'])
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if claimed['attempts'] >= claimed['max_attempts']:
+            logger.error("Job %s (%s) failed for good:\n%s", claimed['pk'], claimed['name'], error)
+            mine.update(status=Job.FAILED, last_error=error, finished_at=now, lease_expires_at=None)
+        else:
+            logger.warning("Job %s (%s) failed, retrying:\n%s", claimed['pk'], claimed['name'], error)
+            mine.update(status=Job.QUEUED, last_error=error, claimed_by='', lease_expires_at=None,
+                        run_at=now + timedelta(seconds=backoff(claimed['attempts'])))
+    else:
+        # A no-op when the lease ran out and another worker took the job.
+        mine.update(status=Job.DONE, finished_at=timezone.now(), lease_expires_at=None)
+
+
+def perform_pooled(claimed):
+    # Like a request, a job in a pool thread or process drops unusable or
+    # expired connections before and after it runs.
+    close_old_connections()
+    try:
+        perform(claimed)
+    finally:
+        close_old_connections()
+
+
+def init_process():
+    # Children of a spawn/forkserver pool start without Django.
+    import django
+
+    django.setup()
+    # The worker drains the pool on Ctrl-C; the children must not die first.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class SoloExecutor:
+    """Runs each job in the worker's own thread: one at a time, for tests and debugging."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class Worker:
+    """
+    Claims due jobs and runs up to ``concurrency`` of them at a time in a
+    ``pool`` of threads (I/O-bound jobs), processes (CPU-bound jobs) or,
+    with ``solo``, in the calling thread.
+    """
+
+    def __init__(self, concurrency=None, pool=None, poll_interval=None, lease=None, periodic=None):
+        self.concurrency = max(1, concurrency or jobs_setting('CONCURRENCY', 4))
+        self.pool = pool or jobs_setting('POOL', 'thread')
+        if self.pool not in POOLS:
+            raise ValueError(f"Unknown pool {self.pool!r}, expected one of {', '.join(POOLS)}.")
+        if self.pool == 'solo':
+            self.concurrency = 1
+        self.poll_interval = poll_interval if poll_interval is not None else jobs_setting('POLL_INTERVAL', 1.0)
+        self.lease = timedelta(seconds=lease or jobs_setting('LEASE', 300))
+        self.periodic = periodic if periodic is not None else jobs_setting('PERIODIC', {})
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._claims = count()
+        self._next_periodic = {}
+
+    def claim(self, limit):
+        """Lease up to ``limit`` due jobs to this worker, oldest first."""
+        now = timezone.now()
+        token = f'{self.name}:{next(self._claims)}'
+        if connection.vendor in CLAIM_LOCKS:
+            # One statement, where the ORM would need a SELECT, an UPDATE
+            # and a SELECT of what the UPDATE got.
+            sql = CLAIM_SQL.format(table=Job._meta.db_table, lock=CLAIM_LOCKS[connection.vendor])
+            params = [token, connection.ops.adapt_datetimefield_value(now + self.lease),
+                      connection.ops.adapt_datetimefield_value(now), limit]
+            claimed = sorted(Job.objects.raw(sql, params), key=lambda claimed: (claimed.run_at, claimed.pk))
+        else:
+            due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'pk')
+            with transaction.atomic():
+                pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+                Job.objects.filter(pk__in=pks, status=Job.QUEUED).update(
+                    status=Job.RUNNING, claimed_by=token, lease_expires_at=now + self.lease,
+                    attempts=F('attempts') + 1)
+                claimed = list(Job.objects.filter(pk__in=pks, claimed_by=token).order_by('run_at', 'pk'))
+        return [
+            {'pk': instance.pk, 'name': instance.name, 'payload': instance.payload, 'attempts': instance.attempts,
+             'max_attempts': instance.max_attempts, 'claimed_by': token}
+            for instance in claimed
+        ]
+
+    def requeue_expired(self):
+        """Queue again the jobs whose worker let their lease run out, or fail them when out of attempts."""
+        now = timezone.now()
+        expired = Job.objects.filter(status=Job.RUNNING, lease_expires_at__lt=now)
+        error = "The job's lease expired before it finished."
+        failed = expired.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, last_error=error, finished_at=now, lease_expires_at=None)
+        requeued = expired.update(
+            status=Job.QUEUED, last_error=error, claimed_by='', lease_expires_at=None, run_at=now)
+        if failed or requeued:
+            logger.warning("Requeued %s and failed %s jobs with expired leases", requeued, failed)
+
+    def schedule(self):
+        """
+        Queue the periodic jobs that are due. Every worker does, and the
+        ``unique_key`` of each period keeps that to one job per period.
+        """
+        now = time.time()
+        for name, interval in self.periodic.items():
+            if now < self._next_periodic.get(name, 0):
+                continue
+            period = int(now // interval)
+            enqueue(name, unique_key=f'{name}:{period}')
+            self._next_periodic[name] = (period + 1) * interval
+
+    def executor(self):
+        if self.pool == 'thread':
+            return ThreadPoolExecutor(self.concurrency, thread_name_prefix='apiv01-job')
+        if self.pool == 'process':
+            # Forked children must not share the parent's connections.
+            connections.close_all()
+            return ProcessPoolExecutor(self.concurrency, initializer=init_process)
+        return SoloExecutor()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self, burst=False, max_jobs=None):
+        """
+        Work until ``stop()`` is called or, with ``burst``, until no job is
+        due, finishing the jobs in flight. Returns how many jobs ran.
+        """
+        executor = self.executor()
+        in_flight = set()
+        next_maintenance = 0
+        try:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(in_flight)
+                if max_jobs is not None:
+                    free = min(free, max_jobs - self.processed - len(in_flight))
+                try:
+                    if time.monotonic() >= next_maintenance:
+                        self.requeue_expired()
+                        self.schedule()
+                        next_maintenance = time.monotonic() + self.poll_interval
+                    claimed = self.claim(free) if free > 0 else []
+                except DatabaseError:
+                    # A busy or restarting database; try again after a poll.
+                    logger.exception("Could not claim jobs")
+                    claimed = []
+                target = perform if self.pool == 'solo' else perform_pooled
+                for item in claimed:
+                    in_flight.add(executor.submit(target, item))
+                in_flight = self.collect(in_flight, timeout=0)
+                if max_jobs is not None and self.processed + len(in_flight) >= max_jobs:
+                    break
+                if len(claimed) < free:
+                    # Nothing more is due right now.
+                    if burst and not in_flight:
+                        break
+                    if in_flight:
+                        in_flight = self.collect(in_flight, timeout=self.poll_interval)
+                    else:
+                        self.stopping.wait(self.poll_interval)
+                elif in_flight and len(in_flight) >= self.concurrency:
+                    in_flight = self.collect(in_flight, timeout=None)
+            self.collect(in_flight, timeout=None, all_done=True)
+        finally:
+            executor.shutdown(wait=True)
+        return self.processed
+
+    def collect(self, in_flight, timeout, all_done=False):
+        """Wait up to ``timeout`` for the first (or, with ``all_done``, every) job in flight; return the rest."""
+        if not in_flight:
+            return in_flight
+        done, pending = wait(in_flight, timeout=timeout, return_when=ALL_COMPLETED if all_done else FIRST_COMPLETED)
+        for future in done:
+            self.processed += 1
+            exc = future.exception()
+            if exc is not None:
+                # perform() records job errors itself; this is the worker's own.
+                logger.error("Could not run a job", exc_info=exc)
+        return pending
+
+
+@job('jobs.prune')
+def prune_jobs(batch_size=5000):
+    """Delete done jobs older than ``JOBS_RETENTION``, in batches."""
+    cutoff = timezone.now() - jobs_setting('RETENTION', timedelta(days=7))
+    while True:
+        with transaction.atomic():
+            pks = list(Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff)
+                       .values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return
+            Job.objects.filter(pk__in=pks).delete()
+
+
+@job('jobs.sleep')
+def sleep(seconds=0):
+    """Do nothing for ``seconds``: a stand-in job for benchmarks and smoke tests."""
+    time.sleep(seconds)
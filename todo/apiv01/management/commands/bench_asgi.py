@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apiv01.benchmark import run_concurrent, seed
+from apiv01.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync DRF views with their async counterparts under ASGI: "
+        "many concurrent in-process clients against Django's ASGI handler, "
+        "reporting p50/p95/p99 latency and throughput for each path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help="Concurrent clients.")
+        parser.add_argument('--requests', type=int, default=5, help="Requests per client.")
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--tasks', type=int, default=200, help="Tasks per user.")
+        parser.add_argument('--comments', type=int, default=2, help="Comments per task.")
+        parser.add_argument('--only', nargs='*', help="Scenario names to run.")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Disable the list response cache while measuring.")
+        parser.add_argument('--output', help="Write results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        test_file = None
+        if connection.vendor == 'sqlite':
+            # ASGIHandler gives every request its own thread and connection; a
+            # shared-cache in-memory database would fail them on table locks.
+            test_file = os.path.join(tempfile.gettempdir(), 'todo_bench_asgi.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = test_file
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Slow-request logging would flood the output at this concurrency, and
+        # the write throttle would reject most of the write scenarios.
+        overrides = {'METRICS_SLOW_REQUEST_MS': None, 'THROTTLE_ENABLED': False}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        try:
+            with override_settings(**overrides):
+                results = self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if test_file is not None:
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(test_file + suffix):
+                        os.remove(test_file + suffix)
+
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({'options': {k: options[k] for k in ('clients', 'requests', 'no_cache')},
+                           'results': results}, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def measure(self, options):
+        users = seed(options['users'], options['tasks'], options['comments'])
+        auth = [('Authorization', f'Bearer {RefreshToken.for_user(user).access_token}') for user in users]
+        tasks = [Task.objects.filter(user_id=user.pk).values_list('pk', flat=True).first() for user in users]
+        app = ASGIHandler()
+
+        def scenario(method, route, with_task=False, body=None):
+            def build(client, i):
+                index = client % len(users)
+                args = [tasks[index]] if with_task else []
+                return method, reverse(route, args=args), [auth[index]], body
+            return build
+
+        scenarios = {
+            'task_list': ('task-list', 'async-task-list', 'get', False, None),
+            'task_detail': ('task-detail', 'async-task-detail', 'get', True, None),
+            'comment_list': ('comment-list', 'async-comment-list', 'get', True, None),
+            'task_create': ('create-task', 'async-create-task', 'post', False, {'title': 'ASGI bench'}),
+            'comment_create': ('comment-create', 'async-comment-create', 'post', True, {'text': 'ASGI bench'}),
+        }
+        results = {}
+        for name, (sync_route, async_route, method, with_task, body) in scenarios.items():
+            if options['only'] and name not in options['only']:
+                continue
+            for path, route in (('sync', sync_route), ('async', async_route)):
+                results[f'{name}:{path}'] = run_concurrent(
+                    app, scenario(method, route, with_task, body),
+                    clients=options['clients'], requests_per_client=options['requests'])
+        return results
+
+    def print_table(self, results):
+        self.stdout.write(
+            f"{'scenario':<24}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'failed':>8}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<24}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                f"{row['throughput_rps']:>9.1f}{row['failures']:>8}")
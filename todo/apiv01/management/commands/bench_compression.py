@@ -0,0 +1,110 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apiv01 import compression, renderers
+from apiv01.benchmark import percentile, seed
+from apiv01.models import Comment, Task
+
+
+WORDS = (
+    'review update the draft before friday and send notes to the team about budget release '
+    'client meeting schedule fix bug in login flow check numbers again call back tomorrow '
+    'plan sprint write tests deploy staging ask for feedback on design mockups'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch typical API responses from a throwaway test database and report their size "
+        "and the CPU time to compress them with every installed coding, and in MessagePack "
+        "when msgpack is installed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=200)
+        parser.add_argument('--comments', type=int, default=10, help="Comments per task.")
+        parser.add_argument('--description-words', type=int, default=80)
+        parser.add_argument('--repeat', type=int, default=200, help="Compressions per response; the median is reported.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = seed(1, options['tasks'], options['comments'], prefix='bench_compression')[0]
+            self.lengthen(options)
+            self.measure(user, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def lengthen(self, options):
+        # Seeded text is a few words; real descriptions and comment threads are longer.
+        rng = random.Random(0)
+
+        def text(words):
+            return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+        tasks = list(Task.objects.all())
+        for task in tasks:
+            task.description = text(options['description_words'])
+        Task.objects.bulk_update(tasks, ['description'], batch_size=1000)
+        comments = list(Comment.objects.all())
+        for comment in comments:
+            comment.text = text(options['description_words'] // 3)
+        Comment.objects.bulk_update(comments, ['text'], batch_size=1000)
+
+    def measure(self, user, options):
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        task = Task.objects.filter(user=user).order_by('-created_at', '-pk').first()
+        pages = {
+            'task list': reverse('task-list'),
+            'task list (cursor)': reverse('task-list') + '?cursor=',
+            'comment list': reverse('comment-list', args=[task.pk]),
+            'task detail': reverse('task-detail', args=[task.pk]),
+            'delta sync': reverse('task-changes'),
+            'export': reverse('task-export'),
+        }
+        # As CompressionMiddleware compresses.
+        codings = compression.available_encodings(getattr(settings, 'API_COMPRESSION_ENCODINGS', ('zstd', 'br', 'gzip')))
+        levels = {**compression.FAST_LEVELS, **getattr(settings, 'API_COMPRESSION_LEVELS', {})}
+        self.stdout.write(f"{'response':<20}{'encoding':<10}{'bytes':>10}{'ratio':>8}{'cpu µs':>10}")
+        for name, path in pages.items():
+            response = client.get(path)
+            if response.status_code != 200:
+                self.stderr.write(f"{name}: {response.status_code}, skipped")
+                continue
+            if response.streaming:
+                chunks = list(response.streaming_content)
+            else:
+                chunks = [response.content]
+            size = sum(map(len, chunks))
+            self.stdout.write(f"{name:<20}{'identity':<10}{size:>10}{1:>8.2f}{'-':>10}")
+            for coding in codings:
+                level = levels[coding]
+                samples = []
+                for _ in range(options['repeat']):
+                    started = time.process_time()
+                    if response.streaming:
+                        compressor = compression.StreamCompressor(coding, level)
+                        encoded = b''.join(compressor.compress(chunk) for chunk in chunks) + compressor.finish()
+                    else:
+                        encoded = compression.compress(chunks[0], coding, level)
+                    samples.append((time.process_time() - started) * 1e6)
+                self.stdout.write(
+                    f"{'':<20}{coding:<10}{len(encoded):>10}{len(encoded) / size:>8.2f}"
+                    f"{percentile(samples, 50):>10.0f}")
+            if renderers.msgpack is not None and not response.streaming:
+                packed = client.get(path, HTTP_ACCEPT='application/msgpack').content
+                self.stdout.write(f"{'':<20}{'msgpack':<10}{len(packed):>10}{len(packed) / size:>8.2f}{'':>10}")
+                gzipped = compression.compress(packed, 'gzip', levels['gzip'])
+                self.stdout.write(
+                    f"{'':<20}{'mp+gzip':<10}{len(gzipped):>10}{len(gzipped) / size:>8.2f}{'':>10}")
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+
+from apiv01.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent write throughput against the configured database "
+        "(SQLite WAL profile or PostgreSQL). Creates and removes its own rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=500,
+                            help="Transactions per thread.")
+        parser.add_argument('--rows', type=int, default=1,
+                            help="Tasks inserted per transaction.")
+
+    def handle(self, *args, **options):
+        threads, writes, rows = options['threads'], options['writes'], options['rows']
+        user, _ = User.objects.get_or_create(username='__bench_db_writes__')
+        errors = []
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(index):
+            close_old_connections()
+            try:
+                barrier.wait()
+                for n in range(writes):
+                    try:
+                        with transaction.atomic():
+                            Task.objects.bulk_create([
+                                Task(title=f"bench {index}-{n}-{r}", user_id=user.pk)
+                                for r in range(rows)
+                            ])
+                    except OperationalError as exc:
+                        errors.append(str(exc))
+            finally:
+                connections.close_all()
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        committed = threads * writes - len(errors)
+        self.stdout.write(f"vendor:            {connection.vendor}")
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f"journal_mode:      {cursor.fetchone()[0]}")
+        self.stdout.write(f"threads:           {threads}")
+        self.stdout.write(f"transactions:      {committed} committed, {len(errors)} failed")
+        self.stdout.write(f"elapsed:           {elapsed:.3f}s")
+        self.stdout.write(f"transactions/sec:  {committed / elapsed:.1f}")
+        self.stdout.write(f"rows/sec:          {committed * rows / elapsed:.1f}")
+        if errors:
+            self.stdout.write(self.style.WARNING(f"first error: {errors[0]}"))
+
+        Task.objects.filter(user=user).delete()
+        user.delete()
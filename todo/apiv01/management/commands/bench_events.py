@@ -0,0 +1,94 @@
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apiv01 import events
+from apiv01.benchmark import EventStreamClient, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold many idle event streams open against the ASGI application in-process, then "
+        "report connect time, memory per stream and publish-to-delivery latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000, help="Streams to hold open.")
+        parser.add_argument('--users', type=int, default=1000, help="Users the streams belong to.")
+        parser.add_argument('--events', type=int, default=1000, help="Events to publish.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        test_file = None
+        if connection.vendor == 'sqlite':
+            # Authentication reads users from the async ORM's own thread and
+            # connection, which an in-memory database would not share.
+            test_file = os.path.join(tempfile.gettempdir(), 'todo_bench_events.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = test_file
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            User.objects.bulk_create(
+                [User(username=f'bench_events_{n}') for n in range(options['users'])])
+            users = list(User.objects.filter(username__startswith='bench_events_').order_by('pk'))
+            asyncio.run(self.measure(users, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if test_file is not None:
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(test_file + suffix):
+                        os.remove(test_file + suffix)
+
+    async def measure(self, users, options):
+        app = events.EventStreamRouter(ASGIHandler())
+        path = reverse('task-events')
+        auth = [[('Authorization', f'Bearer {AccessToken.for_user(user)}')] for user in users]
+        count = options['connections']
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        streams = await asyncio.gather(*(
+            EventStreamClient(app, path, auth[n % len(users)]).open() for n in range(count)))
+        connect = time.perf_counter() - started
+        for stream in streams:
+            await stream.read()
+        per_stream = (tracemalloc.get_traced_memory()[0] - baseline) / count
+        tracemalloc.stop()
+        failed = sum(stream.status != 200 for stream in streams)
+        self.stdout.write(
+            f"{count} streams open in {connect:.1f}s ({count / connect:.0f}/s), {failed} failed, "
+            f"{per_stream / 1024:.1f} KiB each (client side included)")
+
+        # Publish from a worker thread, as the on-commit hooks do, and time
+        # until every stream of the user has the event.
+        by_user = {}
+        for n, stream in enumerate(streams):
+            by_user.setdefault(users[n % len(users)].pk, []).append(stream)
+        rng = random.Random(0)
+        loop = asyncio.get_running_loop()
+        samples = []
+        for n in range(options['events']):
+            user_id = rng.choice(list(by_user))
+            started = time.perf_counter()
+            await loop.run_in_executor(None, events.publish, user_id, 'task.deleted', lambda: {'id': n})
+            await asyncio.gather(*(stream.read() for stream in by_user[user_id]))
+            samples.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"publish to {count // len(users)} streams: p50 {percentile(samples, 50):.2f} ms, "
+            f"p95 {percentile(samples, 95):.2f} ms, p99 {percentile(samples, 99):.2f} ms")
+
+        await asyncio.gather(*(stream.close() for stream in streams))
+        self.stdout.write(f"{events.broker.count()} streams left after disconnecting")
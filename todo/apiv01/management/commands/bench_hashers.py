@@ -0,0 +1,70 @@
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password verification (one login) per second per core for each configured "
+        "hasher, single-threaded and across threads, and suggest work factors for a target latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='*', choices=list(settings.PASSWORD_HASHER_CHOICES),
+                            help="Hashers to measure (default: all available).")
+        parser.add_argument('--iterations', type=int, default=20, help="Verifications per thread.")
+        parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--target-ms', type=float,
+                            help="Suggest work factors that make one verification take this long.")
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"cores: {cores}, threads: {options['threads']}")
+        self.stdout.write(
+            f"{'hasher':<10}{'ms/login':>10}{'logins/s/core':>15}{'logins/s (threads)':>20}{'scaling':>9}")
+        # Let every thread hash at once; the gate would serialize them.
+        with override_settings(PASSWORD_HASHING_CONCURRENCY=options['threads']):
+            for name in options['hashers'] or settings.PASSWORD_HASHER_CHOICES:
+                hasher = import_string(settings.PASSWORD_HASHER_CHOICES[name])()
+                try:
+                    encoded = hasher.encode('correct horse battery', hasher.salt())
+                except ValueError as exc:
+                    self.stdout.write(f"{name:<10}skipped: {exc}")
+                    continue
+                self.measure(name, hasher, encoded, options, cores)
+
+    def measure(self, name, hasher, encoded, options, cores):
+        def verify(count):
+            for _ in range(count):
+                hasher.verify('correct horse battery', encoded)
+
+        started = time.perf_counter()
+        verify(options['iterations'])
+        single = (time.perf_counter() - started) / options['iterations']
+
+        threads = options['threads']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(verify, [options['iterations']] * threads))
+        parallel = threads * options['iterations'] / (time.perf_counter() - started)
+
+        self.stdout.write(
+            f"{name:<10}{single * 1000:>10.1f}{1 / single:>15.1f}{parallel:>20.1f}"
+            f"{parallel * single:>8.1f}x")
+        if options['target_ms']:
+            self.stdout.write(f"{'':<10}suggested: {self.suggest(name, single, options['target_ms'])}")
+
+    def suggest(self, name, seconds, target_ms):
+        scale = target_ms / 1000 / seconds
+        if name == 'pbkdf2':
+            return f"TODO_PBKDF2_ITERATIONS={int(settings.PASSWORD_PBKDF2_ITERATIONS * scale)}"
+        if name == 'scrypt':
+            exponent = round(math.log2(settings.PASSWORD_SCRYPT_WORK_FACTOR * scale))
+            return f"TODO_SCRYPT_WORK_FACTOR={2 ** max(exponent, 10)}"
+        return f"TODO_ARGON2_TIME_COST={max(1, round(settings.PASSWORD_ARGON2_TIME_COST * scale))}"
@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apiv01.importer import IMPORT_BATCH_SIZE, TaskImporter
+from apiv01.models import Comment, Task
+from apiv01.serializers import TaskSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure import throughput in rows per second on a throwaway test database: the "
+        "batched import pipeline against one TaskSerializer save per record."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100000, help="Tasks to import.")
+        parser.add_argument('--comments', type=int, default=1, help="Comments per task.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--baseline-records', type=int, default=2000,
+                            help="Tasks saved one at a time through TaskSerializer (0 to skip).")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def records(self, count, comments):
+        due = (timezone.now() + timedelta(days=30)).isoformat()
+        statuses = [value for value, _ in Task.TASK_STATUS]
+        for n in range(count):
+            yield {
+                'title': f'Imported {n}',
+                'description': f'Imported task number {n}',
+                'status': statuses[n % 3],
+                'due_date': due,
+                'comments': [{'text': f'Comment {c}'} for c in range(comments)],
+            }
+
+    def measure(self, options):
+        user = User.objects.create_user(username='bench_import')
+        records, comments = options['records'], options['comments']
+
+        result = TaskImporter(user.pk, options['batch_size']).run(self.records(records, comments))
+        self.report('pipeline', result['tasks'] + result['comments'], result['elapsed'])
+
+        baseline = options['baseline_records']
+        if baseline:
+            started = time.perf_counter()
+            for record in self.records(baseline, comments):
+                serializer = TaskSerializer(data=record)
+                serializer.is_valid(raise_exception=True)
+                task = serializer.save(user_id=user.pk)
+                for comment in record['comments']:
+                    Comment.objects.create(text=comment['text'], task=task, user_id=user.pk)
+            self.report('per-record serializer', baseline * (1 + comments), time.perf_counter() - started)
+
+    def report(self, name, rows, elapsed):
+        self.stdout.write(f"{name:<24}{rows:>10} rows{elapsed:>10.2f}s{rows / elapsed:>12.0f} rows/s")
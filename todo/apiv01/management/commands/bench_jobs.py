@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apiv01.benchmark import seed
+from apiv01.jobs import Worker, enqueue_many, new_job
+from apiv01.models import Job, Task
+from apiv01.reminders import scan_due_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue jobs in a throwaway test database and report how many jobs per second "
+        "workers run them with each pool and concurrency, and how long the due-date "
+        "reminder scan takes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000, help="Jobs per run.")
+        parser.add_argument('--work-ms', type=float, default=(0, 5), nargs='+',
+                            help="Milliseconds each job sleeps; one set of runs per value.")
+        parser.add_argument('--concurrency', type=int, default=(1, 4, 16), nargs='+')
+        parser.add_argument('--users', type=int, default=100, help="Users for the reminder scan.")
+        parser.add_argument('--tasks', type=int, default=1000, help="Tasks per user for the reminder scan.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        test_file = None
+        if connection.vendor == 'sqlite':
+            # Pool threads and processes open their own connections, which
+            # an in-memory database would not share.
+            test_file = os.path.join(tempfile.gettempdir(), 'todo_bench_jobs.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = test_file
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.measure_workers(options)
+            self.measure_scan(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if test_file is not None:
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(test_file + suffix):
+                        os.remove(test_file + suffix)
+
+    def measure_workers(self, options):
+        count = options['jobs']
+        self.stdout.write(f"{'pool':<10}{'concurrency':>12}{'work ms':>10}{'enqueue/s':>12}{'jobs/s':>10}")
+        runs = [('solo', 1)] + [(pool, n) for pool in ('thread', 'process') for n in options['concurrency']]
+        for work_ms in options['work_ms']:
+            for pool, concurrency in runs:
+                Job.objects.all().delete()
+                started = time.perf_counter()
+                enqueue_many(new_job('jobs.sleep', {'seconds': work_ms / 1000}) for _ in range(count))
+                enqueued = count / (time.perf_counter() - started)
+                worker = Worker(concurrency=concurrency, pool=pool, poll_interval=0.01, periodic={})
+                started = time.perf_counter()
+                processed = worker.run(burst=True)
+                elapsed = time.perf_counter() - started
+                done = Job.objects.filter(status=Job.DONE).count()
+                if done != count:
+                    self.stderr.write(f"{pool} x{concurrency}: {done} of {count} jobs done ({processed} run)")
+                self.stdout.write(
+                    f"{pool:<10}{concurrency:>12}{work_ms:>10g}{enqueued:>12.0f}{count / elapsed:>10.0f}")
+
+    def measure_scan(self, options):
+        users = seed(options['users'], options['tasks'], 0, prefix='bench_jobs')
+        # Spread due dates over the next 30 days, so about one task in 30 comes due.
+        rng = random.Random(0)
+        now = timezone.now()
+        tasks = list(Task.objects.filter(user__in=users).only('pk', 'due_date'))
+        for task in tasks:
+            task.due_date = now + timedelta(seconds=rng.uniform(60, 30 * 86400))
+        Task.objects.bulk_update(tasks, ['due_date'], batch_size=2000)
+        Job.objects.all().delete()
+        for label in ('first scan', 'rescan'):
+            started = time.perf_counter()
+            scan_due_tasks()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label}: {len(tasks)} tasks, {Job.objects.filter(name='tasks.remind').count()} "
+                f"reminders queued in {elapsed * 1000:.0f} ms")
@@ -0,0 +1,115 @@
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from apiv01.benchmark import BENCH_PASSWORD, percentile
+from apiv01.models import Comment, Task
+from apiv01.search import fallback_search, search_tasks
+
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'po', 'da', 'fe', 'gu', 'hi', 'jo', 'be')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure ?q= search latency over a large generated task table on a throwaway test "
+        "database: the full-text index against plain icontains matching."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000, help="Tasks to seed.")
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=1, help="Comments per task.")
+        parser.add_argument('--queries', type=int, default=1000, help="Searches to time.")
+        parser.add_argument('--baseline-queries', type=int, default=20,
+                            help="Searches timed with icontains matching (0 to skip).")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        test_file = None
+        if connection.vendor == 'sqlite':
+            # A million tasks and their index do not belong in an in-memory database.
+            test_file = os.path.join(tempfile.gettempdir(), 'todo_bench_search.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = test_file
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if test_file is not None:
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(test_file + suffix):
+                        os.remove(test_file + suffix)
+
+    def words(self, rng, count):
+        """Draw from an 8192-word vocabulary with a Zipf-like distribution, like real text."""
+        return ' '.join(rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count))
+
+    def seed(self, rng, options):
+        password = make_password(BENCH_PASSWORD)
+        User.objects.bulk_create(
+            [User(username=f'bench_search_{n}', password=password) for n in range(options['users'])])
+        users = list(User.objects.filter(username__startswith='bench_search_').values_list('pk', flat=True))
+
+        total, batch_size = options['tasks'], options['batch_size']
+        started = time.perf_counter()
+        for start in range(0, total, batch_size):
+            size = min(batch_size, total - start)
+            owners = [users[(start + n) % len(users)] for n in range(size)]
+            tasks = [
+                Task(title=self.words(rng, 4), description=self.words(rng, 12), user_id=owner)
+                for owner in owners
+            ]
+            with transaction.atomic():
+                Task.objects.bulk_create(tasks)
+                Comment.objects.bulk_create([
+                    Comment(text=self.words(rng, 8), task_id=task.pk, user_id=task.user_id)
+                    for task in tasks for _ in range(options['comments'])
+                ])
+            self.stdout.write(f"\rseeded {start + size}/{total}", ending='')
+            self.stdout.flush()
+        self.stdout.write(f"\nseeded in {time.perf_counter() - started:.1f}s")
+        return users
+
+    def measure(self, options):
+        rng = random.Random(0)
+        self.vocabulary = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+        self.vocabulary = [word + suffix for word in self.vocabulary for suffix in ('', 'n')]
+        self.cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.vocabulary))))
+        users = self.seed(rng, options)
+
+        self.stdout.write(f"{'search':<12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'hits':>8}")
+        for name, count in (('fulltext', options['queries']), ('icontains', options['baseline_queries'])):
+            if not count:
+                continue
+            samples, hits = [], 0
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(count):
+                    owner = rng.choice(users)
+                    # Searches name specific things: terms are drawn uniformly, so
+                    # the near-stopwords at the head of the Zipf curve are rare.
+                    query = ' '.join(rng.sample(self.vocabulary, rng.choice((1, 1, 2))))
+                    tasks = Task.objects.filter(user_id=owner).order_by('-created_at')
+                    started = time.perf_counter()
+                    if name == 'fulltext':
+                        page = search_tasks(tasks, query, owner)
+                    else:
+                        page = fallback_search(tasks, query.split(), owner)
+                    # What a list request runs: the page-number COUNT and the first page.
+                    hits += page.count()
+                    list(page[:5])
+                    samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:<12}{percentile(samples, 50):>9.2f}{percentile(samples, 95):>9.2f}"
+                f"{percentile(samples, 99):>9.2f}{len(queries) / count:>9.1f}{hits / count:>8.1f}")
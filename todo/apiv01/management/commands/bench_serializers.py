@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from apiv01.benchmark import percentile, seed
+from apiv01.models import Comment, Task
+from apiv01.renderers import FastJSONRenderer, orjson
+from apiv01.rows import comment_rows, task_rows
+from apiv01.serializers import CommentSerializer, TaskSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize the same tasks and comments through the serializers and through the "
+        "row encoders on a throwaway test database, timing the fetch, encode and render "
+        "steps of each and checking that both produce the same bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per path; the median is reported.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed(1, options['tasks'], 1, prefix='bench_serializers')
+            self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def measure(self, options):
+        self.stdout.write(f"JSON: {'orjson' if orjson is not None else 'json (install orjson for more)'}")
+        self.stdout.write(f"{'path':<22}{'fetch ms':>10}{'encode ms':>11}{'render ms':>11}{'total ms':>10}")
+        for name, queryset, serializer_class, encoder in (
+                ('task', Task.objects.order_by('-created_at', '-pk'), TaskSerializer, task_rows),
+                ('comment', Comment.objects.order_by('-created_at', '-pk'), CommentSerializer, comment_rows)):
+            def serializer_path():
+                objects = list(queryset.all())
+                fetched = time.perf_counter()
+                data = serializer_class(objects, many=True).data
+                encoded = time.perf_counter()
+                return fetched, encoded, JSONRenderer().render(data)
+
+            def rows_path():
+                rows = list(encoder.values(queryset.all()))
+                fetched = time.perf_counter()
+                data = encoder.encode(rows)
+                encoded = time.perf_counter()
+                return fetched, encoded, FastJSONRenderer().render(data)
+
+            bodies = {}
+            for path, run in (('serializer', serializer_path), ('rows', rows_path)):
+                steps = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    fetched, encoded, bodies[path] = run()
+                    finished = time.perf_counter()
+                    steps.append((fetched - started, encoded - fetched, finished - encoded, finished - started))
+                fetch, encode, render, total = (percentile([step[n] for step in steps], 50) * 1000 for n in range(4))
+                self.stdout.write(f"{name + ':' + path:<22}{fetch:>10.1f}{encode:>11.1f}{render:>11.1f}{total:>10.1f}")
+            if bodies['serializer'] != bodies['rows']:
+                raise CommandError(f"{name}: the row encoder's output differs from {serializer_class.__name__}'s")
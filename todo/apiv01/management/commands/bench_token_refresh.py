@@ -0,0 +1,113 @@
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import (CaptureQueriesContext, override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apiv01.benchmark import percentile
+from apiv01.serializers import RefreshSerializer
+from apiv01.tokens import FilteredRefreshToken, blacklist_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure refresh latency with a large token_blacklist table on a throwaway test "
+        "database: simplejwt's refresh serializer against the Bloom-filtered one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--outstanding', type=int, default=10_000_000,
+                            help="Outstanding tokens to seed.")
+        parser.add_argument('--blacklisted', type=float, default=0.05,
+                            help="Fraction of the seeded tokens that are blacklisted.")
+        parser.add_argument('--expired', type=float, default=0.5,
+                            help="Fraction of the seeded tokens that have expired.")
+        parser.add_argument('--refreshes', type=int, default=2000, help="Refreshes per serializer.")
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        test_file = None
+        if connection.vendor == 'sqlite':
+            # Millions of rows do not belong in an in-memory database.
+            test_file = os.path.join(tempfile.gettempdir(), 'todo_bench_tokens.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = test_file
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # A single process needs no shared cache to keep the filter current.
+            with override_settings(JWT_BLACKLIST_FILTER=True):
+                self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if test_file is not None:
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(test_file + suffix):
+                        os.remove(test_file + suffix)
+
+    def seed(self, user, options):
+        """Bulk-insert placeholder tokens; only their jti and expiry matter to the lookups."""
+        now = timezone.now()
+        total, batch_size = options['outstanding'], options['batch_size']
+        blacklist_every = round(1 / options['blacklisted']) if options['blacklisted'] else 0
+        expired_below = int(batch_size * options['expired'])
+        started = time.perf_counter()
+        for start in range(0, total, batch_size):
+            size = min(batch_size, total - start)
+            tokens = [
+                OutstandingToken(
+                    user=user, jti=uuid.uuid4().hex, token='-', created_at=now,
+                    expires_at=now + (timedelta(days=-1) if n < expired_below else timedelta(days=15)),
+                )
+                for n in range(size)
+            ]
+            with transaction.atomic():
+                OutstandingToken.objects.bulk_create(tokens)
+                if blacklist_every:
+                    BlacklistedToken.objects.bulk_create(
+                        [BlacklistedToken(token=token) for token in tokens[::blacklist_every]])
+            self.stdout.write(f"\rseeded {start + size}/{total}", ending='')
+            self.stdout.flush()
+        self.stdout.write(f"\nseeded in {time.perf_counter() - started:.1f}s")
+
+    def measure(self, options):
+        user = User.objects.create_user(username='bench_tokens')
+        self.seed(user, options)
+
+        refreshes = options['refreshes']
+        tokens = [str(FilteredRefreshToken.for_user(user)) for _ in range(refreshes)]
+        # Keep a few real blacklist hits in the mix; they must still be rejected.
+        for token in tokens[::100]:
+            FilteredRefreshToken(token).blacklist()
+
+        blacklist_index.reset()
+        started = time.perf_counter()
+        blacklist_index.sync()
+        self.stdout.write(f"filter build: {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        self.stdout.write(f"{'serializer':<12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'queries':>9}{'rejected':>10}")
+        for name, serializer_class in (('simplejwt', TokenRefreshSerializer), ('filtered', RefreshSerializer)):
+            samples, rejected = [], 0
+            with CaptureQueriesContext(connection) as queries:
+                for token in tokens:
+                    started = time.perf_counter()
+                    try:
+                        serializer_class(data={'refresh': token}).is_valid(raise_exception=True)
+                    except TokenError:
+                        rejected += 1
+                    samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:<12}{percentile(samples, 50):>9.3f}{percentile(samples, 95):>9.3f}"
+                f"{percentile(samples, 99):>9.3f}{len(queries) / refreshes:>9.2f}{rejected:>10}")
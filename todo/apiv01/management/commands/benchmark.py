@@ -0,0 +1,101 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apiv01.benchmark import compare, run, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every apiv01 route in-process: p50/p95/p99 latency, throughput "
+        "and queries per request. Runs against a throwaway test database by default."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3)
+        parser.add_argument('--tasks', type=int, default=1000, help="Tasks per user.")
+        parser.add_argument('--comments', type=int, default=2, help="Comments per task.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--only', nargs='*', help="Scenario names to run.")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Disable the list response cache while measuring.")
+        parser.add_argument('--output', help="Write results as JSON to this file.")
+        parser.add_argument('--compare', help="Baseline JSON file to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed p95 growth ratio before --compare fails.")
+        parser.add_argument('--use-current-db', action='store_true',
+                            help="Seed and measure in the configured database instead of a test database.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = None
+        if not options['use_current_db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.measure(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'commit': self.git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'vendor': connection.vendor,
+                'users': options['users'],
+                'tasks': options['tasks'],
+                'comments': options['comments'],
+                'cache': not options['no_cache'],
+            },
+            'results': results,
+        }
+        self.print_table(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            regressions = compare(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def measure(self, options):
+        users = seed(options['users'], options['tasks'], options['comments'])
+        # Every iteration logs in as the same user; throttling would reject most of them.
+        overrides = {'THROTTLE_ENABLED': False}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(**overrides):
+            return run(users[0], options['iterations'], only=options['only'])
+
+    def print_table(self, results):
+        self.stdout.write(
+            f"{'scenario':<24}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<24}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                f"{row['throughput_rps']:>9.1f}{row['queries']:>9}")
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apiv01.schema import generate_schema, urlconf_fingerprint, write_schema_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema and write it to API_SCHEMA_FILE, from which the "
+        "/schema/ endpoint loads it instead of generating it on the first request. "
+        "Run it on every build or deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Where to write the schema (default: API_SCHEMA_FILE).")
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'API_SCHEMA_FILE', None)
+        if not path:
+            raise CommandError("Set API_SCHEMA_FILE or pass --output.")
+        started = time.perf_counter()
+        schema = generate_schema()
+        write_schema_file(path, schema, urlconf_fingerprint())
+        self.stdout.write(
+            f"Wrote the schema of {len(schema.get('paths', {}))} paths to {path} "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms.")
@@ -0,0 +1,53 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apiv01.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export
+from apiv01.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every task and comment of each user to NDJSON or CSV. With --output-dir "
+        "one <username>.<format> file is written per user, otherwise the export goes to stdout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', nargs='*', help="Usernames to export (default: every user).")
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--output-dir', help="Directory for the per-user export files.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Tasks read and encoded per query.")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username__in=options['user'])
+            missing = set(options['user']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        output_dir = options['output_dir']
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        exported = 0
+        for user_id, username in users.values_list('pk', 'username').iterator():
+            chunks = export(Task.objects.filter(user_id=user_id), options['format'], options['chunk_size'])
+            if not output_dir:
+                for chunk in chunks:
+                    self.stdout.write(chunk, ending='')
+                continue
+
+            path = os.path.join(output_dir, f"{username}.{options['format']}")
+            # Write under a temporary name so that a failed run never leaves a
+            # truncated file where the previous export was.
+            with open(path + '.tmp', 'w', encoding='utf-8', newline='') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            os.replace(path + '.tmp', path)
+            exported += 1
+
+        if output_dir:
+            self.stdout.write(self.style.SUCCESS(f"Exported {exported} users to {output_dir}."))
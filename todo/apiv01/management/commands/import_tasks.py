@@ -0,0 +1,66 @@
+import os
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apiv01.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, TaskImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks and their comments from an NDJSON or CSV file in the export format. "
+        "Records are validated and inserted in batches; an interrupted import can be "
+        "continued with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=list(IMPORT_FORMATS),
+                            help="Input format (default: from the file extension, else ndjson).")
+        parser.add_argument('--user', help="Import every task for this username instead of "
+                                           "the user id in each record.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help="Records validated and committed per transaction.")
+        parser.add_argument('--checkpoint', help="Checkpoint name (default: the absolute input path).")
+        parser.add_argument('--resume', action='store_true',
+                            help="Skip the records committed by a previous run with the same checkpoint.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format']
+        if import_format is None:
+            import_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+        owner_id = None
+        if options['user']:
+            owner_id = User.objects.filter(username=options['user']).values_list('pk', flat=True).first()
+            if owner_id is None:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        checkpoint = options['checkpoint']
+        if checkpoint is None and path != '-':
+            checkpoint = os.path.abspath(path)
+        if options['resume'] and checkpoint is None:
+            raise CommandError("--resume needs --checkpoint when reading stdin.")
+
+        def progress(result):
+            self.stdout.write(
+                f"{result['processed']} records: {result['tasks']} tasks, {result['comments']} "
+                f"comments, {result['invalid']} invalid ({result['rows_per_second']:.0f} rows/s)")
+
+        importer = TaskImporter(owner_id, options['batch_size'], checkpoint, progress)
+        if path == '-':
+            result = importer.run(IMPORT_FORMATS[import_format](sys.stdin), resume=options['resume'])
+        else:
+            with open(path, encoding='utf-8', newline='') as fh:
+                result = importer.run(IMPORT_FORMATS[import_format](fh), resume=options['resume'])
+
+        for error in result['errors']:
+            self.stderr.write(f"record {error['record']}: {error['errors']}")
+        if result['invalid'] > len(result['errors']):
+            self.stderr.write(f"... and {result['invalid'] - len(result['errors'])} more invalid records")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['tasks']} tasks and {result['comments']} comments in "
+            f"{result['elapsed']:.2f}s ({result['rows_per_second']:.0f} rows/s); "
+            f"{result['skipped']} records skipped by --resume, {result['invalid']} invalid."))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding refresh tokens, and their blacklist entries, in small "
+        "batches. Unlike flushexpiredtokens it never holds one long delete on the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of tokens deleted per transaction.")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches, to leave room for other writers.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the expired tokens.")
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} expired tokens would be deleted.")
+            return
+
+        batch_size = options['batch_size']
+        last_pk = 0
+        total = 0
+        while True:
+            pks = list(
+                expired.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                # Deleting the tokens cascades to their BlacklistedToken rows.
+                OutstandingToken.objects.filter(pk__in=pks).delete()
+            total += len(pks)
+            last_pk = pks[-1]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} expired tokens."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apiv01.cache import bump_generation
+from apiv01.models import Task
+
+
+class Command(BaseCommand):
+    help = "Recompute Task.comment_count and Task.last_commented_at from the comments table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of tasks updated per transaction.")
+        parser.add_argument('--user', type=int, help="Only rebuild tasks of this user id.")
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.all()
+        if options['user'] is not None:
+            tasks = tasks.filter(user_id=options['user'])
+
+        batch_size = options['batch_size']
+        last_pk = 0
+        total = 0
+        while True:
+            pks = list(
+                tasks.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                total += Task.objects.filter(pk__in=pks).refresh_comment_stats()
+            last_pk = pks[-1]
+
+        for user_id in tasks.order_by().values_list('user_id', flat=True).distinct():
+            bump_generation('tasks', user_id)
+        self.stdout.write(self.style.SUCCESS(f"Repaired comment stats of {total} tasks."))
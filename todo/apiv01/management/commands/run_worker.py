@@ -0,0 +1,54 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apiv01.events import LocalBackend, get_backend
+from apiv01.jobs import POOLS, Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs from the database queue (apiv01.jobs), at most --concurrency "
+        "at a time, and queue the periodic ones (JOBS_PERIODIC) such as the due-date "
+        "reminder scan. Start as many workers as needed; they share the queue. "
+        "SIGINT/SIGTERM stop claiming jobs and let the running ones finish."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Jobs run at once (default: JOBS_CONCURRENCY).")
+        parser.add_argument('--pool', choices=POOLS, default=None,
+                            help="Run jobs in threads, processes or one at a time in the worker (default: JOBS_POOL).")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds between polls of an empty queue (default: JOBS_POLL_INTERVAL).")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once no job is due instead of waiting for more.")
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help="Exit after running this many jobs.")
+        parser.add_argument('--no-periodic', action='store_true',
+                            help="Do not queue the periodic jobs.")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] is not None and options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        worker = Worker(
+            concurrency=options['concurrency'],
+            pool=options['pool'],
+            poll_interval=options['poll_interval'],
+            periodic={} if options['no_periodic'] else getattr(settings, 'JOBS_PERIODIC', {}),
+        )
+        if 'tasks.scan_due' in worker.periodic and isinstance(get_backend(), LocalBackend):
+            self.stderr.write(self.style.WARNING(
+                "Due-date reminders are published with the local events backend, which only "
+                "reaches streams served by this worker; set TODO_EVENTS_BACKEND=redis for the "
+                "API's streams to receive them."))
+        handlers = {signum: signal.signal(signum, worker.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        self.stdout.write(
+            f"Worker {worker.name} running up to {worker.concurrency} jobs at once in a {worker.pool} pool.")
+        try:
+            processed = worker.run(burst=options['burst'], max_jobs=options['max_jobs'])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker.name} stopped after {processed} jobs."))
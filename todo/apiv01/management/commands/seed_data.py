@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apiv01.benchmark import BENCH_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Seed N users with M tasks each and K comments per task for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tasks', type=int, default=100, help="Tasks per user.")
+        parser.add_argument('--comments', type=int, default=3, help="Comments per task.")
+        parser.add_argument('--prefix', default='bench', help="Username prefix.")
+
+    def handle(self, *args, **options):
+        users = seed(options['users'], options['tasks'], options['comments'], prefix=options['prefix'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users ({options['prefix']}_0..) with {options['tasks']} tasks "
+            f"and {options['comments']} comments per task. Password: {BENCH_PASSWORD}"
+        ))
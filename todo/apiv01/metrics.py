@@ -0,0 +1,195 @@
+"""
+Low-overhead, in-process request metrics.
+
+``MetricsMiddleware`` (see ``middleware.py``) opens a ``RequestSample``
+for each sampled request, ``record_query`` adds the SQL run on any
+connection to it, ``InstrumentedViewMixin`` adds serializer time to it,
+and ``registry`` aggregates finished samples into Prometheus-style
+histograms rendered by ``registry.render()``.
+"""
+import heapq
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; not thread-safe on its own."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestSample:
+    """
+    Measurements of one in-flight request. With ``keep_sql``, ``statements``
+    holds the ``(seconds, sql)`` of its ``SLOWEST`` slowest queries, as a heap.
+    """
+    __slots__ = ('started', 'db_time', 'queries', 'serializer_time', 'statements')
+
+    SLOWEST = 10
+
+    def __init__(self, keep_sql=False):
+        self.started = perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.serializer_time = 0.0
+        self.statements = [] if keep_sql else None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            self.db_time += elapsed
+            self.queries += 1
+            if self.statements is not None:
+                if len(self.statements) < self.SLOWEST:
+                    heapq.heappush(self.statements, (elapsed, sql))
+                elif elapsed > self.statements[0][0]:
+                    heapq.heapreplace(self.statements, (elapsed, sql))
+
+
+current_sample = ContextVar('apiv01_request_sample', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every DB connection. It looks the sample up
+    through ``current_sample`` rather than being installed per request, so
+    queries that async views run on the ORM's worker thread are counted too.
+    """
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample.execute_wrapper(execute, sql, params, many, context)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsRegistry:
+    """Per-route histograms for wall, DB and serializer time, queries and response size."""
+
+    series = (
+        ('request_duration_seconds', 'Wall time of the request.', SECONDS_BUCKETS),
+        ('db_duration_seconds', 'Time spent executing SQL.', SECONDS_BUCKETS),
+        ('serializer_duration_seconds', 'Time spent in serializer to_representation.', SECONDS_BUCKETS),
+        ('db_queries', 'SQL queries executed per request.', QUERY_BUCKETS),
+        ('response_size_bytes', 'Size of the response body.', SIZE_BUCKETS),
+    )
+
+    def __init__(self, prefix='apiv01'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._requests = {}
+
+    def record(self, route, method, status, sample, wall, size):
+        values = (wall, sample.db_time, sample.serializer_time, sample.queries, size)
+        with self._lock:
+            histograms = self._histograms.get((route, method))
+            if histograms is None:
+                histograms = [Histogram(buckets) for _, _, buckets in self.series]
+                self._histograms[(route, method)] = histograms
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def snapshot(self, route, method):
+        with self._lock:
+            histograms = self._histograms.get((route, method))
+            if histograms is None:
+                return None
+            return {name: (h.count, h.sum) for (name, _, _), h in zip(self.series, histograms)}
+
+    def render(self, extra=()):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            name = f'{self.prefix}_requests_total'
+            lines.append(f'# HELP {name} Requests handled, by route, method and status.')
+            lines.append(f'# TYPE {name} counter')
+            for (route, method, status), count in sorted(self._requests.items()):
+                lines.append(
+                    f'{name}{{route="{escape(route)}",method="{method}",status="{status}"}} {count}')
+
+            for index, (series, help_text, _) in enumerate(self.series):
+                name = f'{self.prefix}_{series}'
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), histograms in sorted(self._histograms.items()):
+                    histogram = histograms[index]
+                    labels = f'route="{escape(route)}",method="{method}"'
+                    for bound, total in histogram.cumulative():
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum!r}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+        for name, kind, help_text, value in extra:
+            name = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class InstrumentedViewMixin:
+    """
+    Add the time a generic view's serializer spends in ``to_representation``
+    to the current request sample.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        sample = current_sample.get()
+        if sample is None:
+            return serializer
+
+        to_representation = serializer.to_representation
+
+        def timed(instance):
+            started = perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                sample.serializer_time += perf_counter() - started
+
+        serializer.to_representation = timed
+        return serializer
@@ -0,0 +1,174 @@
+import logging
+import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .compression import FAST_LEVELS, StreamCompressor, available_encodings, choose_encoding, compress
+from .metrics import RequestSample, current_sample, registry
+
+
+logger = logging.getLogger('apiv01.slow_requests')
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, DB time, query count, serializer time and response
+    size per route for a ``METRICS_SAMPLE_RATE`` share of requests, and log
+    requests slower than ``METRICS_SLOW_REQUEST_MS`` with their SQL.
+
+    Under ASGI the middleware runs natively async, so async views are not
+    pushed onto a thread just to be measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        slow_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', None)
+        self.slow_threshold = slow_ms / 1000 if slow_ms is not None else None
+
+    def sampled(self):
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        sample = RequestSample(keep_sql=self.slow_threshold is not None)
+        token = current_sample.set(sample)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        self.finish(request, response, sample)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        sample = RequestSample(keep_sql=self.slow_threshold is not None)
+        token = current_sample.set(sample)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        self.finish(request, response, sample)
+        return response
+
+    def finish(self, request, response, sample):
+        wall = perf_counter() - sample.started
+
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        registry.record(route, request.method, response.status_code, sample, wall, size)
+
+        if self.slow_threshold is not None and wall >= self.slow_threshold:
+            statements = sorted(sample.statements, reverse=True)
+            logger.warning(
+                "Slow request %s %s: %.1fms (db %.1fms in %d queries, serializer %.1fms)\n%s",
+                request.method, request.get_full_path(), wall * 1000, sample.db_time * 1000,
+                sample.queries, sample.serializer_time * 1000,
+                '\n'.join(f'  {elapsed * 1000:.1f}ms {sql}' for elapsed, sql in statements),
+            )
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies with the first of ``API_COMPRESSION_ENCODINGS``
+    that is installed and that the client accepts with the highest quality.
+
+    Bodies shorter than ``API_COMPRESSION_MIN_SIZE`` are sent as they are,
+    as are event streams, bodies that already have a ``Content-Encoding``
+    and responses marked ``Cache-Control: no-transform``. Streamed bodies,
+    sync or async, are compressed chunk by chunk and each chunk is flushed,
+    so an export still arrives as it is produced.
+
+    Installed after MetricsMiddleware, so the response sizes it records are
+    the compressed ones.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.encodings = available_encodings(getattr(settings, 'API_COMPRESSION_ENCODINGS', ('zstd', 'br', 'gzip')))
+        self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        self.levels = {**FAST_LEVELS, **getattr(settings, 'API_COMPRESSION_LEVELS', {})}
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        if response.has_header('Content-Encoding') \
+                or response.get('Content-Type', '').startswith('text/event-stream') \
+                or 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        coding = choose_encoding(request, self.encodings)
+        if coding is None:
+            return response
+
+        level = self.levels.get(coding)
+        if response.streaming:
+            compressor = StreamCompressor(coding, level)
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(response.streaming_content, compressor)
+            else:
+                response.streaming_content = self.compress_stream(response.streaming_content, compressor)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, coding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The encoded body is another representation of the resource; weak
+        # ETags still match in conditional requests.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
+
+    @staticmethod
+    def compress_stream(content, compressor):
+        for chunk in content:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+    @staticmethod
+    async def compress_async_stream(content, compressor):
+        async for chunk in content:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
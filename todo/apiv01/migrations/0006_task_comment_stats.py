@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 01:45
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_stats(apps, schema_editor):
+    Task = apps.get_model('apiv01', 'Task')
+    Comment = apps.get_model('apiv01', 'Comment')
+    comments = Comment.objects.filter(task=models.OuterRef('pk')).order_by().values('task')
+    Task.objects.update(
+        comment_count=Coalesce(
+            models.Subquery(comments.annotate(n=models.Count('pk')).values('n')), 0),
+        last_commented_at=models.Subquery(
+            comments.annotate(last=models.Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiv01', '0005_task_user_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 02:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    The token_blacklist tables belong to simplejwt, so their indexes are
+    added with SQL: ``expires_at`` for prune_tokens and the blacklist
+    filter rebuild, ``blacklisted_at`` for the filter's incremental sync.
+    """
+
+    dependencies = [
+        ('apiv01', '0007_import_checkpoint'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS outstandingtoken_expires_at_idx '
+            'ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX IF EXISTS outstandingtoken_expires_at_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS blacklistedtoken_blacklisted_at_idx '
+            'ON token_blacklist_blacklistedtoken (blacklisted_at)',
+            'DROP INDEX IF EXISTS blacklistedtoken_blacklisted_at_idx',
+        ),
+    ]
@@ -0,0 +1,161 @@
+# Generated by Django 5.1.2 on 2026-10-18 03:10
+
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE apiv01_task_fts USING fts5(
+        owner, title, description, comments,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO apiv01_task_fts (rowid, owner, title, description, comments)
+    SELECT t.id, 'u' || t.user_id, t.title, coalesce(t.description, ''),
+           coalesce((SELECT group_concat(c.text, char(10)) FROM apiv01_comment c WHERE c.task_id = t.id), '')
+    FROM apiv01_task t
+    """,
+    """
+    CREATE TRIGGER apiv01_task_fts_insert AFTER INSERT ON apiv01_task BEGIN
+        INSERT INTO apiv01_task_fts (rowid, owner, title, description, comments)
+        VALUES (new.id, 'u' || new.user_id, new.title, coalesce(new.description, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER apiv01_task_fts_update AFTER UPDATE OF title, description, user_id ON apiv01_task BEGIN
+        UPDATE apiv01_task_fts
+        SET owner = 'u' || new.user_id, title = new.title, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER apiv01_task_fts_delete AFTER DELETE ON apiv01_task BEGIN
+        DELETE FROM apiv01_task_fts WHERE rowid = old.id;
+    END
+    """,
+    # A new comment is appended; edits and deletes rebuild the task's comment text.
+    """
+    CREATE TRIGGER apiv01_comment_fts_insert AFTER INSERT ON apiv01_comment BEGIN
+        UPDATE apiv01_task_fts
+        SET comments = CASE comments WHEN '' THEN new.text ELSE comments || char(10) || new.text END
+        WHERE rowid = new.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER apiv01_comment_fts_update AFTER UPDATE OF text, task_id ON apiv01_comment BEGIN
+        UPDATE apiv01_task_fts
+        SET comments = coalesce(
+            (SELECT group_concat(c.text, char(10)) FROM apiv01_comment c WHERE c.task_id = apiv01_task_fts.rowid), '')
+        WHERE rowid IN (old.task_id, new.task_id);
+    END
+    """,
+    """
+    CREATE TRIGGER apiv01_comment_fts_delete AFTER DELETE ON apiv01_comment BEGIN
+        UPDATE apiv01_task_fts
+        SET comments = coalesce(
+            (SELECT group_concat(c.text, char(10)) FROM apiv01_comment c WHERE c.task_id = old.task_id), '')
+        WHERE rowid = old.task_id;
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS apiv01_comment_fts_delete',
+    'DROP TRIGGER IF EXISTS apiv01_comment_fts_update',
+    'DROP TRIGGER IF EXISTS apiv01_comment_fts_insert',
+    'DROP TRIGGER IF EXISTS apiv01_task_fts_delete',
+    'DROP TRIGGER IF EXISTS apiv01_task_fts_update',
+    'DROP TRIGGER IF EXISTS apiv01_task_fts_insert',
+    'DROP TABLE IF EXISTS apiv01_task_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE TABLE apiv01_task_search (
+        task_id bigint PRIMARY KEY REFERENCES apiv01_task (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        comments text NOT NULL DEFAULT '',
+        document tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX apiv01_task_search_document_idx ON apiv01_task_search USING GIN (document)',
+    """
+    CREATE FUNCTION apiv01_task_search_refresh(task bigint) RETURNS void AS $$
+        INSERT INTO apiv01_task_search (task_id, comments, document)
+        SELECT t.id, c.text,
+               setweight(to_tsvector('simple', 'u' || t.user_id), 'D')
+               || setweight(to_tsvector('simple', t.title), 'A')
+               || setweight(to_tsvector('simple', coalesce(t.description, '')), 'B')
+               || setweight(to_tsvector('simple', c.text), 'C')
+        FROM apiv01_task t,
+             LATERAL (SELECT coalesce(string_agg(text, E'\\n' ORDER BY id), '') AS text
+                      FROM apiv01_comment WHERE task_id = t.id) c
+        WHERE t.id = task
+        ON CONFLICT (task_id) DO UPDATE SET comments = excluded.comments, document = excluded.document;
+    $$ LANGUAGE sql
+    """,
+    """
+    CREATE FUNCTION apiv01_task_search_task_trigger() RETURNS trigger AS $$
+    BEGIN
+        PERFORM apiv01_task_search_refresh(NEW.id);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE FUNCTION apiv01_task_search_comment_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            PERFORM apiv01_task_search_refresh(OLD.task_id);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            PERFORM apiv01_task_search_refresh(NEW.task_id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER apiv01_task_search_task AFTER INSERT OR UPDATE OF title, description, user_id
+    ON apiv01_task FOR EACH ROW EXECUTE FUNCTION apiv01_task_search_task_trigger()
+    """,
+    """
+    CREATE TRIGGER apiv01_task_search_comment AFTER INSERT OR UPDATE OF text, task_id OR DELETE
+    ON apiv01_comment FOR EACH ROW EXECUTE FUNCTION apiv01_task_search_comment_trigger()
+    """,
+    'SELECT apiv01_task_search_refresh(id) FROM apiv01_task',
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP TRIGGER IF EXISTS apiv01_task_search_comment ON apiv01_comment',
+    'DROP TRIGGER IF EXISTS apiv01_task_search_task ON apiv01_task',
+    'DROP FUNCTION IF EXISTS apiv01_task_search_comment_trigger()',
+    'DROP FUNCTION IF EXISTS apiv01_task_search_task_trigger()',
+    'DROP FUNCTION IF EXISTS apiv01_task_search_refresh(bigint)',
+    'DROP TABLE IF EXISTS apiv01_task_search',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+    """
+    Search indexes kept by triggers; see apiv01/search.py. Backends other
+    than SQLite and PostgreSQL get no index and search with icontains.
+    """
+
+    dependencies = [
+        ('apiv01', '0008_token_blacklist_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.1.2 on 2026-10-18 02:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+SQLITE_UPSERT = """
+    INSERT INTO apiv01_taskchange (task_id, user_id, seq, deleted, changed_at)
+    VALUES ({row}.id, {row}.user_id, (SELECT coalesce(max(seq), 0) + 1 FROM apiv01_taskchange), {deleted},
+            strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT (task_id) DO UPDATE SET
+        user_id = excluded.user_id, seq = excluded.seq, deleted = excluded.deleted, changed_at = excluded.changed_at;
+"""
+
+# SQLite has a single writer, so max(seq) + 1 is taken in commit order.
+SQLITE_FORWARD = [
+    f"CREATE TRIGGER apiv01_taskchange_insert AFTER INSERT ON apiv01_task BEGIN "
+    f"{SQLITE_UPSERT.format(row='new', deleted=0)} END",
+    f"CREATE TRIGGER apiv01_taskchange_update AFTER UPDATE ON apiv01_task BEGIN "
+    f"{SQLITE_UPSERT.format(row='new', deleted=0)} END",
+    f"CREATE TRIGGER apiv01_taskchange_delete AFTER DELETE ON apiv01_task BEGIN "
+    f"{SQLITE_UPSERT.format(row='old', deleted=1)} END",
+    """
+    INSERT INTO apiv01_taskchange (task_id, user_id, seq, deleted, changed_at)
+    SELECT id, user_id, id, 0, updated_at FROM apiv01_task
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS apiv01_taskchange_delete',
+    'DROP TRIGGER IF EXISTS apiv01_taskchange_update',
+    'DROP TRIGGER IF EXISTS apiv01_taskchange_insert',
+]
+
+# Sequence values are handed out in call order but become visible in
+# commit order. The per-user transaction lock makes the two agree for each
+# user's changes, which is all a user's sync reads, so a client never
+# skips past a change that commits late.
+POSTGRESQL_FORWARD = [
+    'CREATE SEQUENCE apiv01_taskchange_seq',
+    """
+    CREATE FUNCTION apiv01_taskchange_log() RETURNS trigger AS $$
+    DECLARE
+        task apiv01_task;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            task := OLD;
+        ELSE
+            task := NEW;
+        END IF;
+        PERFORM pg_advisory_xact_lock(hashtext('apiv01_taskchange'), task.user_id);
+        INSERT INTO apiv01_taskchange (task_id, user_id, seq, deleted, changed_at)
+        VALUES (task.id, task.user_id, nextval('apiv01_taskchange_seq'), TG_OP = 'DELETE', now())
+        ON CONFLICT (task_id) DO UPDATE SET
+            user_id = excluded.user_id, seq = excluded.seq, deleted = excluded.deleted,
+            changed_at = excluded.changed_at;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER apiv01_taskchange_log AFTER INSERT OR UPDATE OR DELETE
+    ON apiv01_task FOR EACH ROW EXECUTE FUNCTION apiv01_taskchange_log()
+    """,
+    """
+    INSERT INTO apiv01_taskchange (task_id, user_id, seq, deleted, changed_at)
+    SELECT id, user_id, nextval('apiv01_taskchange_seq'), false, updated_at FROM apiv01_task ORDER BY id
+    """,
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP TRIGGER IF EXISTS apiv01_taskchange_log ON apiv01_task',
+    'DROP FUNCTION IF EXISTS apiv01_taskchange_log()',
+    'DROP SEQUENCE IF EXISTS apiv01_taskchange_seq',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+    """
+    Change log for delta sync, written by triggers on apiv01_task; see
+    apiv01/sync.py. SQLite drops a table's triggers when a migration
+    rebuilds it, so a later migration that rebuilds apiv01_task must
+    create these and 0009's again.
+    """
+
+    dependencies = [
+        ('apiv01', '0009_task_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('task_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seq', models.BigIntegerField(unique=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'seq'], name='taskchange_user_seq_idx')],
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.1.2 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+SQLITE_INCREMENT = """
+    INSERT INTO apiv01_taskcounter (user_id, status, count) VALUES (new.user_id, new.status, 1)
+    ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+"""
+
+# A decrement never inserts: the counter of a user being deleted may be
+# gone already when the user's tasks are.
+SQLITE_DECREMENT = """
+    UPDATE apiv01_taskcounter SET count = count - 1 WHERE user_id = old.user_id AND status = old.status;
+"""
+
+SQLITE_FORWARD = [
+    f"CREATE TRIGGER apiv01_taskcounter_insert AFTER INSERT ON apiv01_task BEGIN {SQLITE_INCREMENT} END",
+    f"CREATE TRIGGER apiv01_taskcounter_delete AFTER DELETE ON apiv01_task BEGIN {SQLITE_DECREMENT} END",
+    f"CREATE TRIGGER apiv01_taskcounter_update AFTER UPDATE OF status, user_id ON apiv01_task "
+    f"WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id "
+    f"BEGIN {SQLITE_DECREMENT} {SQLITE_INCREMENT} END",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS apiv01_taskcounter_update',
+    'DROP TRIGGER IF EXISTS apiv01_taskcounter_delete',
+    'DROP TRIGGER IF EXISTS apiv01_taskcounter_insert',
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE FUNCTION apiv01_taskcounter_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE apiv01_taskcounter SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO apiv01_taskcounter (user_id, status, count) VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status) DO UPDATE SET count = apiv01_taskcounter.count + 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER apiv01_taskcounter_count AFTER INSERT OR DELETE ON apiv01_task
+    FOR EACH ROW EXECUTE FUNCTION apiv01_taskcounter_count()
+    """,
+    """
+    CREATE TRIGGER apiv01_taskcounter_update AFTER UPDATE OF status, user_id ON apiv01_task
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION apiv01_taskcounter_count()
+    """,
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP TRIGGER IF EXISTS apiv01_taskcounter_update ON apiv01_task',
+    'DROP TRIGGER IF EXISTS apiv01_taskcounter_count ON apiv01_task',
+    'DROP FUNCTION IF EXISTS apiv01_taskcounter_count()',
+]
+
+# Both backends: count the tasks that exist before the triggers take over.
+BACKFILL = """
+    INSERT INTO apiv01_taskcounter (user_id, status, count)
+    SELECT user_id, status, count(*) FROM apiv01_task GROUP BY user_id, status
+"""
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+    """
+    Per-user task counts by status, written by triggers on apiv01_task;
+    see apiv01/stats.py. Like 0009's and 0010's, SQLite drops these
+    triggers when a migration rebuilds apiv01_task, and that migration
+    must create them again.
+    """
+
+    dependencies = [
+        ('apiv01', '0010_task_change'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('complated', 'Complated')], max_length=15)),
+                ('count', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'status'), name='taskcounter_user_status_uniq')],
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': [*SQLITE_FORWARD, BACKFILL], 'postgresql': [*POSTGRESQL_FORWARD, BACKFILL]}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
@@ -1,12 +1,47 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Now
 from django.contrib.auth.models import User
 
 
+class TaskQuerySet(models.QuerySet):
+
+    def refresh_comment_stats(self):
+        """
+        Recompute ``comment_count`` and ``last_commented_at`` from the
+        comments table in a single UPDATE with correlated subqueries.
+        Only tasks whose stats were wrong are written, and their
+        ``updated_at`` moves so ETags and delta syncs see the change.
+        Returns the number of tasks repaired.
+        """
+        comments = Comment.objects.filter(task=models.OuterRef('pk')).order_by().values('task')
+        count = Coalesce(models.Subquery(comments.annotate(n=models.Count('pk')).values('n')), 0)
+        last = models.Subquery(comments.annotate(last=models.Max('created_at')).values('last'))
+        current = models.Q(comment_count=models.F('actual_count')) & (
+            models.Q(last_commented_at=models.F('actual_last'))
+            | models.Q(last_commented_at__isnull=True, actual_last__isnull=True)
+        )
+        stale = self.annotate(actual_count=count, actual_last=last).annotate(
+            stale=models.Case(models.When(current, then=False), default=True,
+                              output_field=models.BooleanField()),
+        ).filter(stale=True)
+        return stale.update(comment_count=count, last_commented_at=last, updated_at=Now())
+
+
+# The stored value of the completed status, misspelled as in the first
+# migration. Compare statuses with this rather than the literal.
+COMPLETED = "complated"
+
+
+# Triggers created by raw SQL in migrations 0009-0011 keep the search index,
+# the delta-sync change log and the status counters up to date. SQLite drops
+# them whenever a migration rebuilds this table (most AlterField operations
+# do), so such a migration must create them again; check_triggers in
+# apiv01/checks.py warns on migrate when any is missing.
 class Task(models.Model):
     TASK_STATUS = (
         ("pending", "Pending"),
         ("in_progress", "In Progress"),
-        ("complated", "Complated"),
+        (COMPLETED, "Complated"),
     )
     
     title = models.CharField(max_length=255, verbose_name="Task title")
@@ -16,6 +51,29 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_commented_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = TaskQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='task_user_created_id_idx'),
+            models.Index(fields=['user', 'status', 'created_at'], name='task_user_status_idx'),
+            models.Index(fields=['user', 'due_date'], name='task_user_due_idx'),
+            models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+            models.Index(
+                fields=['user', 'due_date'],
+                condition=~models.Q(status=COMPLETED),
+                name='task_user_open_due_idx',
+            ),
+            # Across users, for the due-date reminder scan (apiv01.reminders).
+            models.Index(
+                fields=['due_date'],
+                condition=~models.Q(status=COMPLETED),
+                name='task_open_due_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.status}"
@@ -27,5 +85,120 @@ class Comment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'created_at', 'id'], name='comment_task_created_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} - {self.user}"
+
+class ImportCheckpoint(models.Model):
+    """
+    Number of input records an import has committed, updated in the same
+    transaction as each batch so that a resumed import skips exactly the
+    records already written.
+    """
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    records = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='import_checkpoint_user_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.records}"
+
+
+class TaskChange(models.Model):
+    """
+    The latest change to each task, deletions included, for delta sync.
+
+    Rows are written by database triggers (migration 0010) in the same
+    transaction as the change itself. ``seq`` is drawn from one counter
+    and grows with every change, so "everything since ``seq`` N" is an
+    index range scan. Rows outlive their task, and their user, as
+    tombstones.
+    """
+    task_id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    seq = models.BigIntegerField(unique=True)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'seq'], name='taskchange_user_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} - {self.seq}"
+
+
+class TaskCounter(models.Model):
+    """
+    Number of a user's tasks in one status, for the task stats.
+
+    Rows are kept up to date by database triggers (migration 0011) in the
+    same transaction as the insert, delete or status change, bulk writes
+    and imports included, so reading a user's counts costs one row per
+    status whatever the number of tasks.
+    """
+    # Looked up through the (user, status) constraint's index.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    status = models.CharField(max_length=15, choices=Task.TASK_STATUS)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'status'], name='taskcounter_user_status_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.status}: {self.count}"
+
+
+class Job(models.Model):
+    """
+    A background job, run by ``manage.py run_worker``; see apiv01/jobs.py.
+
+    Done jobs are kept for ``JOBS_RETENTION`` so that ``unique_key`` keeps
+    deduplicating, failed ones until they are deleted.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    JOB_STATUS = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default=QUEUED)
+    run_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    unique_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    claimed_by = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Partial, so that done and failed jobs cost the claims nothing.
+        indexes = [
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+            models.Index(fields=['lease_expires_at'], condition=models.Q(status='running'), name='job_running_idx'),
+            models.Index(fields=['finished_at'], condition=models.Q(status='done'), name='job_done_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.task} - {self.user}"
\ No newline at end of file
+        return f"{self.name} - {self.status}"
@@ -0,0 +1,156 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over ``(-created_at, -id)``.
+
+    The cursor holds the ``created_at`` and ``id`` of the last row on the
+    page, so every page is a single index range scan with no COUNT(*) and
+    no OFFSET, whatever its depth.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    position_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.seek(queryset, request)
+        return self.set_page(list(queryset[:self.page_size + 1]))
+
+    def seek(self, queryset, request):
+        """
+        Apply the cursor to ``queryset`` and return it ordered and ready to
+        be sliced to ``page_size + 1`` rows. ``set_page()`` takes the rows.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        position, pk, reverse = self.decode_cursor(request)
+        self.position, self.reverse = position, reverse
+
+        if position is not None:
+            if reverse:
+                seek = Q(**{f'{self.position_field}__gt': position}) | \
+                    Q(**{self.position_field: position, 'pk__gt': pk})
+            else:
+                seek = Q(**{f'{self.position_field}__lt': position}) | \
+                    Q(**{self.position_field: position, 'pk__lt': pk})
+            queryset = queryset.filter(seek)
+
+        if reverse:
+            return queryset.order_by(self.position_field, 'pk')
+        return queryset.order_by(f'-{self.position_field}', '-pk')
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+        self.page = results
+
+        if self.reverse:
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Keyset pagination cursor. Pass an empty value to start from the newest row.',
+            'schema': {'type': 'string'},
+        }]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.GET.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            position = parse_datetime(tokens['p'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, IndexError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if position is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position, pk, reverse
+
+    def encode_cursor(self, obj, reverse):
+        encoded = self.encode_position(obj, reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @classmethod
+    def encode_position(cls, obj, reverse=False):
+        tokens = {
+            'p': getattr(obj, cls.position_field).isoformat(),
+            'i': obj.pk,
+        }
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        return b64encode(querystring.encode('ascii')).decode('ascii')
+
+
+class KeysetPaginationMixin:
+    """
+    Switch a list view to keyset pagination when the request carries a
+    ``cursor`` query parameter, keeping page-number pagination otherwise.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            cursor_param = self.keyset_pagination_class.cursor_query_param
+            if cursor_param in self.request.query_params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
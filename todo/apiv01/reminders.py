@@ -0,0 +1,60 @@
+"""
+Reminders for tasks coming due, run by the job worker (apiv01.jobs).
+
+``tasks.scan_due`` runs every few minutes (``JOBS_PERIODIC``) and queues a
+``tasks.remind`` job for each open task due within
+``TASK_REMINDER_LEAD``, reading the partial ``due_date`` index of open
+tasks rather than the tasks table. The ``unique_key`` of a reminder is the
+task and its due date, so a task is reminded once however often it is
+scanned, and once more if it is rescheduled.
+
+``tasks.remind`` checks the task again and pushes a ``task.reminder``
+event to its owner's streams. With the local events backend only streams
+served by the worker's own process would see it; run the worker with the
+redis backend for the event to reach the API processes.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import events
+from .jobs import enqueue_many, job, new_job
+from .models import COMPLETED, Task
+from .serializers import TaskSerializer
+
+
+logger = logging.getLogger(__name__)
+
+
+@job('tasks.scan_due')
+def scan_due_tasks(batch_size=1000):
+    now = timezone.now()
+    lead = getattr(settings, 'TASK_REMINDER_LEAD', timedelta(hours=24))
+    due = (Task.objects.filter(due_date__gte=now, due_date__lt=now + lead)
+           .exclude(status=COMPLETED)
+           .order_by('due_date')
+           .values_list('pk', 'due_date'))
+    batch, queued = [], 0
+    for pk, due_date in due.iterator(chunk_size=batch_size):
+        batch.append(new_job(
+            'tasks.remind',
+            {'task_id': pk, 'due_date': due_date.isoformat()},
+            unique_key=f'tasks.remind:{pk}:{due_date.isoformat()}',
+        ))
+        if len(batch) == batch_size:
+            queued += enqueue_many(batch, batch_size)
+            batch = []
+    queued += enqueue_many(batch, batch_size)
+    if queued:
+        logger.info("Queued %s due-date reminders", queued)
+
+
+@job('tasks.remind')
+def remind(task_id, due_date):
+    task = Task.objects.filter(pk=task_id).exclude(status=COMPLETED).first()
+    # Deleted, completed or rescheduled since the scan.
+    if task is None or task.due_date is None or task.due_date.isoformat() != due_date:
+        return
+    events.publish(task.user_id, 'task.reminder', lambda: TaskSerializer(task).data)
@@ -0,0 +1,70 @@
+"""
+Renderers: a faster JSON one and an optional binary one.
+
+``FastJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer`` for
+the data those responses hold (dicts, lists, strings, integers, booleans
+and ``None``) with less work per call. With the optional ``orjson``
+package it encodes in one native call. Without it, one compact stdlib
+encoder is built once and reused, rather than per response.
+
+orjson writes floats differently (``1e16`` rather than ``1e+16``), so the
+renderer is only used where no floats occur. Search results carry a float
+rank and stay on ``JSONRenderer``.
+
+``MessagePackRenderer`` answers ``Accept: application/msgpack`` with the
+same data in MessagePack. It needs the optional ``msgpack`` package, and
+settings.py only lists it when that package is installed.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    encoder = JSONRenderer.encoder_class(
+        ensure_ascii=JSONRenderer.ensure_ascii,
+        allow_nan=not JSONRenderer.strict,
+        separators=(',', ':') if JSONRenderer.compact else (', ', ': '),
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None \
+                or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if orjson is not None:
+            try:
+                ret = orjson.dumps(data)
+            except TypeError:
+                # Values orjson does not know, such as lazy strings or
+                # integers past 64 bits: DRF's encoder handles them.
+                return super().render(data, accepted_media_type, renderer_context)
+            # Escaped like JSONRenderer, so the output stays a JavaScript subset.
+            return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        ret = self.encoder.encode(data)
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    # Values MessagePack has no type for (datetimes, decimals, lazy strings)
+    # become what they would be in the JSON response.
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.default)
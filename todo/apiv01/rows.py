@@ -0,0 +1,174 @@
+"""
+Read path for list and detail responses that skips the serializer.
+
+``RowEncoder`` compiles the fields of a read serializer, once, into the
+columns to fetch with ``values_list()`` and an encoder per column, and
+turns each row into the dict the serializer's ``to_representation()``
+returns for the same object. Columns whose representation is the
+database value (ids, strings, integers, booleans, string choices) are
+copied as they are, datetimes are formatted like DRF's ``DateTimeField``,
+and any other field falls back to its own ``to_representation()``. A
+list page costs no model instances and no per-field serializer calls.
+
+``RowRepresentationMixin`` puts a generic list or retrieve view on this
+path and renders with ``FastJSONRenderer``. Set
+``API_ROW_REPRESENTATION = False`` to serve through the serializers.
+"""
+from functools import partial
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import current_sample
+from .renderers import FastJSONRenderer
+from .serializers import TaskSerializer, CommentSerializer
+
+
+def rows_enabled():
+    return getattr(settings, 'API_ROW_REPRESENTATION', True)
+
+
+def format_datetime(value, tz):
+    # rest_framework.fields.DateTimeField.to_representation for ISO 8601 output.
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+# Fields whose representation of a database value is the value itself.
+PLAIN_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+class RowEncoder:
+    """Encode ``values_list()`` rows as ``serializer_class`` represents instances."""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._compiled = None
+
+    def compile(self):
+        if self._compiled is None:
+            model = self.serializer_class.Meta.model
+            keys, columns, encoders = [], [], []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                encoder = self.encoder(field)
+                if encoder is not None:
+                    encoders.append((name, len(columns), encoder))
+                keys.append(name)
+                columns.append(self.column(model, field))
+            self._compiled = tuple(keys), tuple(columns), tuple(encoders)
+        return self._compiled
+
+    def column(self, model, field):
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(
+                f"{self.serializer_class.__name__}.{field.field_name} is not a column of "
+                f"{model.__name__} and cannot be read from rows.")
+        if model_field.primary_key:
+            # Named rows then carry ``pk``, which the keyset paginator reads.
+            return 'pk'
+        if model_field.is_relation:
+            if not isinstance(field, serializers.PrimaryKeyRelatedField):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{field.field_name} must be a primary key "
+                    f"field to be read from rows.")
+            return model_field.attname
+        return model_field.name
+
+    def encoder(self, field):
+        """``None`` when the column value is the representation."""
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return field.pk_field.to_representation if field.pk_field is not None else None
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if settings.USE_TZ and not hasattr(field, 'timezone') \
+                    and isinstance(output_format, str) and output_format.lower() == ISO_8601:
+                return format_datetime
+            return field.to_representation
+        if isinstance(field, serializers.ChoiceField):
+            identity = all(key == value for key, value in field.choice_strings_to_values.items())
+            return None if identity else field.to_representation
+        if isinstance(field, PLAIN_FIELDS):
+            return None
+        return field.to_representation
+
+    def values(self, queryset):
+        _, columns, _ = self.compile()
+        return queryset.values_list(*columns, named=True)
+
+    def encode(self, rows):
+        keys, _, encoders = self.compile()
+        tz = timezone.get_current_timezone()
+        encoders = [
+            (key, index, partial(encoder, tz=tz) if encoder is format_datetime else encoder)
+            for key, index, encoder in encoders
+        ]
+        data = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            for key, index, encoder in encoders:
+                value = row[index]
+                if value is not None:
+                    item[key] = encoder(value)
+            data.append(item)
+        return data
+
+
+task_rows = RowEncoder(TaskSerializer)
+comment_rows = RowEncoder(CommentSerializer)
+
+
+class RowRepresentationMixin:
+    """
+    Serve ``list()`` and ``retrieve()`` of a generic view from rows encoded
+    by ``row_encoder`` rather than through its serializer, with the same
+    JSON. The encoding time counts as serializer time in the metrics.
+    """
+    row_encoder = None
+
+    def use_rows(self):
+        return rows_enabled()
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.use_rows():
+            return renderers
+        return [FastJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
+
+    def encode_rows(self, rows):
+        started = perf_counter()
+        data = self.row_encoder.encode(rows)
+        sample = current_sample.get()
+        if sample is not None:
+            sample.serializer_time += perf_counter() - started
+        return data
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_rows():
+            return super().list(request, *args, **kwargs)
+        rows = self.row_encoder.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.encode_rows(rows))
+        return self.get_paginated_response(self.encode_rows(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_rows():
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = self.row_encoder.values(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(self.encode_rows([row])[0])
@@ -0,0 +1,208 @@
+"""
+The OpenAPI schema, generated once and served from memory.
+
+drf-spectacular's ``SpectacularAPIView`` introspects every view on each
+request. ``SchemaView`` keeps the generated schema per API version and
+language instead. Each format is rendered once, along with its ETag and
+its compressed bodies (see apiv01.compression). A request only negotiates
+the format and coding and gets the bytes, or a 304.
+
+``manage.py build_schema`` writes the schema to ``API_SCHEMA_FILE`` at
+build time. The first request then reads that file rather than
+generating the schema. The cache and the file are both tagged with a
+fingerprint of the URLconf. When a route or its view changes, the file is
+ignored and the cached schema is regenerated. Edits inside a serializer
+do not change the fingerprint, so rebuild the file on every deploy. With
+``DEBUG`` on, the file is not read at all.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import drf_spectacular
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.utils.encoders import JSONEncoder
+from drf_spectacular.views import SpectacularAPIView
+
+from .compression import available_encodings, choose_encoding, compress
+
+
+logger = logging.getLogger(__name__)
+
+
+def urlconf_fingerprint(resolver=None):
+    """Digest of every route of ``resolver`` (default: ``ROOT_URLCONF``) and the view it maps to."""
+    digest = hashlib.sha256(drf_spectacular.__version__.encode())
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, prefix + str(pattern.pattern))
+                continue
+            callback = pattern.callback
+            view = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None) or callback
+            digest.update(
+                f'{prefix}{pattern.pattern}\0{pattern.name}\0{view.__module__}.{view.__qualname__}\n'.encode())
+
+    walk((resolver or get_resolver()).url_patterns, '')
+    return digest.hexdigest()
+
+
+def generate_schema(generator_class=None, version=None, public=True):
+    generator_class = generator_class or SpectacularAPIView.generator_class
+    return generator_class(api_version=version).get_schema(request=None, public=public)
+
+
+def write_schema_file(path, schema, fingerprint):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'language': translation.get_language(), 'schema': schema},
+                  f, cls=JSONEncoder)
+
+
+def read_schema_file(path, fingerprint):
+    """The schema stored at ``path``, or ``None`` when missing or built for other routes."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning("Could not read the OpenAPI schema from %s, generating it", path, exc_info=True)
+        return None
+    if stored.get('fingerprint') != fingerprint:
+        logger.warning("The OpenAPI schema in %s is out of date with the URLconf, generating it", path)
+        return None
+    if stored.get('language') != translation.get_language():
+        return None
+    return stored['schema']
+
+
+class Rendition:
+    """One format of the schema: its body, ETag and compressed bodies."""
+    __slots__ = ('content_type', 'body', 'digest', 'encoded')
+
+    def __init__(self, body, content_type):
+        self.content_type = content_type
+        self.body = body
+        self.digest = hashlib.sha256(content_type.encode() + b'\0' + body).hexdigest()[:32]
+        self.encoded = {coding: compress(body, coding) for coding in available_encodings()}
+
+    def etag(self, coding):
+        # The compressed bodies are different representations, each with its own tag.
+        return quote_etag(f'{self.digest}-{coding}' if coding else self.digest)
+
+
+class SchemaCache:
+    """
+    Thread-safe store of the generated schemas and their renditions.
+    Generation runs under the lock, so concurrent first requests wait for
+    one generation rather than each doing their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resolver = None
+        self._fingerprint = None
+        self._schemas = {}
+        self._renditions = {}
+
+    def clear(self):
+        with self._lock:
+            self._resolver = None
+            self._fingerprint = None
+            self._schemas.clear()
+            self._renditions.clear()
+
+    def _check_urlconf(self):
+        # The resolver is cached by Django until the URLconf is reloaded,
+        # so its identity tells cheaply whether the routes can have changed.
+        resolver = get_resolver()
+        if resolver is not self._resolver:
+            fingerprint = urlconf_fingerprint(resolver)
+            if fingerprint != self._fingerprint:
+                self._schemas.clear()
+                self._renditions.clear()
+            self._resolver, self._fingerprint = resolver, fingerprint
+        return self._fingerprint
+
+    def get(self, renderer_class, version, generate):
+        """The ``Rendition`` by ``renderer_class`` of the schema ``generate()`` returns."""
+        key = (version, translation.get_language())
+        with self._lock:
+            fingerprint = self._check_urlconf()
+            rendition = self._renditions.get((*key, renderer_class))
+            if rendition is not None:
+                return rendition
+            schema = self._schemas.get(key)
+            if schema is None:
+                path = getattr(settings, 'API_SCHEMA_FILE', None)
+                if path and version is None and not settings.DEBUG:
+                    schema = read_schema_file(path, fingerprint)
+                if schema is None:
+                    schema = generate()
+                self._schemas[key] = schema
+            renderer = renderer_class()
+            # Rendered for the plain media type: parameters such as
+            # ``indent`` in the Accept header are not honoured.
+            body = renderer.render(schema, renderer.media_type, {})
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            rendition = self._renditions[(*key, renderer_class)] = Rendition(body, content_type)
+            return rendition
+
+
+schema_cache = SchemaCache()
+
+
+@receiver(setting_changed)
+def clear_schema_cache(setting, **kwargs):
+    if setting in ('SPECTACULAR_SETTINGS', 'REST_FRAMEWORK', 'API_SCHEMA_FILE', 'DEBUG', 'LANGUAGE_CODE'):
+        schema_cache.clear()
+
+
+class SchemaView(SpectacularAPIView):
+    """
+    ``SpectacularAPIView`` answered from ``schema_cache``. Schemas that
+    depend on the requesting user (``SERVE_PUBLIC`` off) or on a custom
+    URLconf, pattern list or settings of the view are generated per request
+    as before.
+    """
+
+    def cacheable(self):
+        return self.serve_public and self.urlconf is None and self.patterns is None and not self.custom_settings
+
+    def _get_schema_response(self, request):
+        if not self.cacheable():
+            return super()._get_schema_response(request)
+        version = self.api_version or request.version or self._get_version_parameter(request)
+        rendition = schema_cache.get(
+            type(request.accepted_renderer), version,
+            lambda: generate_schema(self.generator_class, version, self.serve_public))
+        coding = choose_encoding(request, rendition.encoded)
+        etag = rendition.etag(coding)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(rendition.encoded[coding] if coding else rendition.body,
+                                    content_type=rendition.content_type)
+            if coding:
+                response.headers['Content-Encoding'] = coding
+            response.headers['Content-Disposition'] = f'inline; filename="{self._get_filename(request, version)}"'
+        response.headers['ETag'] = etag
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # After the view's own headers, which set Vary outright.
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,156 @@
+"""
+Full-text search over task titles, descriptions and comment text.
+
+The index is kept by database triggers, created in migration 0009, so
+every write path is covered: the API, ``bulk_create`` imports and raw
+SQL alike.
+
+* SQLite: the FTS5 table ``apiv01_task_fts``, one row per task (``rowid``
+  is the task id) with ``owner``, ``title``, ``description`` and
+  ``comments`` columns. ``owner`` holds a ``u<user id>`` token, so the
+  per-user restriction is part of the MATCH and the search only reads the
+  postings of the user's own tasks.
+* PostgreSQL: the table ``apiv01_task_search`` with a weighted
+  ``tsvector`` per task and a GIN index. The owner token is a weight-D
+  lexeme, and the text lexemes are weighted A (title), B (description)
+  and C (comments).
+* Other backends fall back to unranked ``icontains`` matching.
+
+Ranking reads only the index; ``highlight_tasks()`` then marks up the
+text of the page being returned, in one more query.
+
+Both indexes use the unstemmed ``unicode61``/``simple`` tokenization and
+match every term of two or more characters as a prefix, so results
+update as the user types. Ranks are "higher is better": FTS5 ``bm25()``
+with title > description > comments column weights, or ``ts_rank_cd()``.
+Highlights mark matches with ``<mark>`` in HTML-escaped text.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+
+
+SEARCH_MAX_TERMS = 8
+
+# Highlight delimiters chosen by the database; they cannot occur in escaped text.
+START, STOP = '\x02', '\x03'
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:SEARCH_MAX_TERMS]
+
+
+def format_highlight(text):
+    """HTML-escape a highlighted fragment and turn the delimiters into ``<mark>``; ``None`` without a match."""
+    if not text or START not in text:
+        return None
+    return escape(text).replace(START, '<mark>').replace(STOP, '</mark>')
+
+
+def sqlite_match(terms, owner):
+    match = ' AND '.join(f'"{term}"*' if len(term) > 1 else f'"{term}"' for term in terms)
+    match = f'{{title description comments}} : ({match})'
+    if owner is not None:
+        match = f'owner : u{int(owner)} AND {match}'
+    return match
+
+
+def sqlite_search(queryset, terms, owner):
+    # The virtual table can only be joined and MATCHed by name, hence extra().
+    # The unary + keeps SQLite from walking the user's tasks and running the
+    # MATCH once per task (its pick for COUNT(*) without table statistics):
+    # the index is always the outer loop.
+    return queryset.extra(
+        select={'search_rank': '-bm25(apiv01_task_fts, 0, 10.0, 5.0, 1.0)'},
+        tables=['apiv01_task_fts'],
+        where=['+apiv01_task_fts.rowid = apiv01_task.id', 'apiv01_task_fts MATCH %s'],
+        params=[sqlite_match(terms, owner)],
+    )
+
+
+def sqlite_highlights(pks, terms, owner):
+    placeholders = ', '.join(['%s'] * len(pks))
+    return (
+        "SELECT rowid, highlight(apiv01_task_fts, 1, char(2), char(3)), "
+        "snippet(apiv01_task_fts, 2, char(2), char(3), '…', 16), "
+        "snippet(apiv01_task_fts, 3, char(2), char(3), '…', 16) "
+        f"FROM apiv01_task_fts WHERE apiv01_task_fts MATCH %s AND rowid IN ({placeholders})",
+        [sqlite_match(terms, owner), *pks],
+    )
+
+
+def postgresql_tsquery(terms):
+    return ' & '.join(f"'{term}':*ABC" if len(term) > 1 else f"'{term}':ABC" for term in terms)
+
+
+def postgresql_search(queryset, terms, owner):
+    tsquery = postgresql_tsquery(terms)
+    return queryset.extra(
+        select={'search_rank': "ts_rank_cd(apiv01_task_search.document, to_tsquery('simple', %s))"},
+        select_params=[tsquery],
+        tables=['apiv01_task_search'],
+        where=['apiv01_task_search.task_id = apiv01_task.id',
+               "apiv01_task_search.document @@ to_tsquery('simple', %s)"],
+        params=[tsquery if owner is None else f"'u{int(owner)}':D & ({tsquery})"],
+    )
+
+
+def postgresql_highlights(pks, terms, owner):
+    options = f"StartSel={START}, StopSel={STOP}"
+    fragment = f"{options}, MaxWords=16, MinWords=6, MaxFragments=1, FragmentDelimiter=…"
+    return (
+        "SELECT t.id, ts_headline('simple', t.title, q.query, %s), "
+        "ts_headline('simple', coalesce(t.description, ''), q.query, %s), "
+        "ts_headline('simple', s.comments, q.query, %s) "
+        "FROM apiv01_task t JOIN apiv01_task_search s ON s.task_id = t.id, "
+        "to_tsquery('simple', %s) AS q(query) WHERE t.id = ANY(%s)",
+        [f'{options}, HighlightAll=true', fragment, fragment, postgresql_tsquery(terms), list(pks)],
+    )
+
+
+def fallback_search(queryset, terms, owner):
+    for term in terms:
+        matches = Q(title__icontains=term) | Q(description__icontains=term) | Q(comment__text__icontains=term)
+        queryset = queryset.filter(pk__in=queryset.model.objects.filter(matches).values('pk'))
+    return queryset
+
+
+SEARCH_BACKENDS = {
+    'sqlite': (sqlite_search, sqlite_highlights),
+    'postgresql': (postgresql_search, postgresql_highlights),
+}
+
+
+def search_tasks(queryset, query, owner=None):
+    """
+    Restrict ``queryset`` to tasks matching every term of ``query``, best
+    match first. ``owner`` narrows the index lookup to one user's tasks; the
+    queryset should be filtered to the same user.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    if connection.vendor not in SEARCH_BACKENDS:
+        return fallback_search(queryset, terms, owner)
+    search, _ = SEARCH_BACKENDS[connection.vendor]
+    return search(queryset, terms, owner).order_by('-search_rank', '-created_at', '-pk')
+
+
+def highlight_tasks(tasks, query, owner=None):
+    """
+    Set ``search_title``, ``search_description`` and ``search_comments`` on
+    ``tasks``, a page of ``search_tasks()`` results, with one query. Run on
+    the page only, since highlighting re-reads the text of each row.
+    """
+    terms = search_terms(query)
+    if not tasks or not terms or connection.vendor not in SEARCH_BACKENDS:
+        return tasks
+    _, highlights = SEARCH_BACKENDS[connection.vendor]
+    with connection.cursor() as cursor:
+        cursor.execute(*highlights([task.pk for task in tasks], terms, owner))
+        rows = {pk: fragments for pk, *fragments in cursor.fetchall()}
+    for task in tasks:
+        task.search_title, task.search_description, task.search_comments = rows.get(task.pk, (None,) * 3)
+    return tasks
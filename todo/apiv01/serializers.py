@@ -1,14 +1,17 @@
 from datetime import datetime
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
 
 from .models import Task, Comment
+from .search import format_highlight
+from .tokens import FilteredRefreshToken
 
 
+TASK_BULK_MAX_ITEMS = 5000
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True,
@@ -29,11 +32,9 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password2')
-        
-        user = User.objects.create(
-            username=validated_data['username'],
-        )
 
+        # Hash before the INSERT so that registration is a single write.
+        user = User(username=validated_data['username'])
         user.set_password(validated_data['password'])
         user.save()
 
@@ -41,6 +42,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class LoginSerializer(TokenObtainPairSerializer):
+    token_class = FilteredRefreshToken
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
@@ -55,6 +57,10 @@ class LoginSerializer(TokenObtainPairSerializer):
         return data
 
 
+class RefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
+
+
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
 
@@ -64,17 +70,88 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            RefreshToken(self.token).blacklist()
+            FilteredRefreshToken(self.token).blacklist()
         except Exception as e:
             raise serializers.ValidationError("Token is not found!")
         
 
+class TaskBulkSerializer(serializers.ListSerializer):
+    """
+    List mode of TaskSerializer used by the bulk endpoints.
+
+    Invalid items do not fail the batch: their errors are collected in
+    ``item_errors`` keyed by position and the remaining items are written
+    with a single ``bulk_create``/``bulk_update``.
+    """
+    batch_size = 500
+
+    def to_internal_value(self, data):
+        self.item_errors = {}
+        self._position = 0
+        self._targets = []
+        self._instances = {}
+        if self.instance is not None and isinstance(data, list):
+            ids = [item.get('id') for item in data if isinstance(item, dict)]
+            ids = [pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)]
+            self._instances = self.instance.in_bulk(ids)
+        validated = super().to_internal_value(data)
+        return [attrs for attrs in validated if attrs is not None]
+
+    def run_child_validation(self, data):
+        index = self._position
+        self._position += 1
+
+        if self.instance is not None:
+            pk = data.get('id') if isinstance(data, dict) else None
+            instance = self._instances.get(pk)
+            if instance is None:
+                self.item_errors[index] = {'id': ["Task not found."]}
+                return None
+            self.child.instance = instance
+            self.child.initial_data = data
+
+        try:
+            attrs = self.child.run_validation(data)
+        except serializers.ValidationError as exc:
+            self.item_errors[index] = exc.detail
+            return None
+
+        if self.instance is not None:
+            self._targets.append(self.child.instance)
+        return attrs
+
+    def create(self, validated_data):
+        tasks = [Task(**attrs) for attrs in validated_data]
+        return Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        fields = {'updated_at'}
+        for task, attrs in zip(self._targets, validated_data):
+            for attr, value in attrs.items():
+                setattr(task, attr, value)
+                fields.add(attr)
+            task.updated_at = now
+        Task.objects.bulk_update(self._targets, fields, batch_size=self.batch_size)
+        return self._targets
+
+
+class TaskBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=TASK_BULK_MAX_ITEMS,
+    )
+
+
 class TaskSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'status', 'due_date', 'created_at', 'updated_at', 'user']
-        read_only_fields = ['id', 'created_at', 'updated_at', 'user'] 
+        fields = ['id', 'title', 'description', 'status', 'due_date', 'created_at', 'updated_at', 'user',
+                  'comment_count', 'last_commented_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'user', 'comment_count', 'last_commented_at'] 
+        list_serializer_class = TaskBulkSerializer
 
     def validate_status(self, value):
         if value not in dict(Task.TASK_STATUS).keys():
@@ -83,11 +160,29 @@ class TaskSerializer(serializers.ModelSerializer):
     
     def validate(self, attrs):
         due_date = attrs.get('due_date')
-        if due_date < timezone.now():
+        if due_date is not None and due_date < timezone.now():
             raise serializers.ValidationError("This time cannot be an elapsed time")
         return attrs
     
     
+class TaskSearchResultSerializer(TaskSerializer):
+    """A task annotated by ``search_tasks()``, with its rank and highlighted matches."""
+    search = serializers.SerializerMethodField()
+
+    class Meta(TaskSerializer.Meta):
+        fields = TaskSerializer.Meta.fields + ['search']
+
+    def get_search(self, obj):
+        highlights = {
+            field: format_highlight(getattr(obj, f'search_{field}', None))
+            for field in ('title', 'description', 'comments')
+        }
+        return {
+            'rank': getattr(obj, 'search_rank', None),
+            'highlights': {field: text for field, text in highlights.items() if text is not None},
+        }
+
+
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
@@ -97,5 +192,5 @@ class CommentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         request = self.context.get('request', None)
         if request:
-            validated_data['user'] = request.user
+            validated_data['user_id'] = request.user.pk
         return super().create(validated_data)
\ No newline at end of file
@@ -0,0 +1,109 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import events
+from .authentication import user_state_cache
+from .cache import bump_generation
+from .metrics import instrument_connection
+from .models import Task, Comment
+from .serializers import TaskSerializer, CommentSerializer
+
+
+connection_created.connect(instrument_connection)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_state(sender, instance, **kwargs):
+    user_state_cache.invalidate(instance.pk)
+
+
+# Generations are bumped after commit so that a concurrent reader cannot
+# cache pre-commit rows under the new generation.
+
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_task_lists(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'tasks', instance.user_id))
+
+
+@receiver(post_delete, sender=Task)
+def invalidate_deleted_task_comments(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'comments', instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_lists(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'comments', instance.task_id))
+
+
+# Task.comment_count / last_commented_at are kept in step with single
+# atomic UPDATEs. updated_at moves too, since the task representation
+# changed and ETags and delta syncs key off it.
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if not created:
+        return
+    Task.objects.filter(pk=instance.task_id).update(
+        comment_count=F('comment_count') + 1,
+        last_commented_at=instance.created_at,
+        updated_at=timezone.now(),
+    )
+    transaction.on_commit(partial(bump_generation, 'tasks', instance.task.user_id))
+
+
+def cascaded_from_task(origin):
+    return isinstance(origin, Task) or getattr(origin, 'model', None) is Task
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Comments removed by their task's cascade need no bookkeeping.
+    if cascaded_from_task(origin):
+        return
+    latest = Comment.objects.filter(task=OuterRef('pk')).order_by('-created_at').values('created_at')
+    Task.objects.filter(pk=instance.task_id).update(
+        comment_count=F('comment_count') - 1,
+        last_commented_at=Subquery(latest[:1]),
+        updated_at=timezone.now(),
+    )
+    user_id = Task.objects.filter(pk=instance.task_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        transaction.on_commit(partial(bump_generation, 'tasks', user_id))
+
+
+# Server-sent events, published after commit like the generation bumps.
+# Payloads are built only when a stream can receive them.
+
+@receiver(post_save, sender=Task)
+def push_saved_task(sender, instance, created, **kwargs):
+    event = 'task.created' if created else 'task.updated'
+    transaction.on_commit(partial(events.publish, instance.user_id, event, lambda: TaskSerializer(instance).data))
+
+
+@receiver(post_delete, sender=Task)
+def push_deleted_task(sender, instance, **kwargs):
+    data = {'id': instance.pk}
+    transaction.on_commit(partial(events.publish, instance.user_id, 'task.deleted', lambda: data))
+
+
+@receiver(post_save, sender=Comment)
+def push_saved_comment(sender, instance, created, **kwargs):
+    event = 'comment.created' if created else 'comment.updated'
+    transaction.on_commit(
+        partial(events.publish, instance.task.user_id, event, lambda: CommentSerializer(instance).data))
+
+
+@receiver(post_delete, sender=Comment)
+def push_deleted_comment(sender, instance, origin=None, **kwargs):
+    # A task's cascade is covered by its task.deleted event.
+    if cascaded_from_task(origin):
+        return
+    data = {'id': instance.pk, 'task': instance.task_id}
+    transaction.on_commit(partial(events.publish, instance.task.user_id, 'comment.deleted', lambda: data))
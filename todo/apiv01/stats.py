@@ -0,0 +1,87 @@
+"""
+Task statistics for dashboards, in a few grouped queries.
+
+* Counts per status are read from ``TaskCounter``, one row per status that
+  triggers keep current, so they cost the same for ten tasks or ten
+  million. With ``API_TASK_COUNTERS = False`` they are counted with one
+  ``GROUP BY status`` over the user's tasks instead.
+* Overdue and due-this-week counts depend on the time of the request, so
+  they cannot be kept as counters. One aggregate over the open tasks due
+  before the end of the week counts both, through the partial
+  ``(user, due_date)`` index of open tasks.
+* The completion trend counts completed tasks per day of ``updated_at``
+  over the last ``days`` days, through the ``(user, updated_at)`` index.
+  A task counts on the day it was last updated, which is the day it was
+  completed unless it was edited afterwards.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import COMPLETED, Task, TaskCounter
+
+
+STATS_DAYS = 14
+STATS_MAX_DAYS = 90
+
+
+def counters_enabled():
+    return getattr(settings, 'API_TASK_COUNTERS', True)
+
+
+def status_counts(user_id):
+    counts = dict.fromkeys((value for value, _ in Task.TASK_STATUS), 0)
+    if counters_enabled():
+        rows = TaskCounter.objects.filter(user_id=user_id).values_list('status', 'count')
+    else:
+        rows = (Task.objects.filter(user_id=user_id).order_by()
+                .values('status').annotate(count=Count('pk')).values_list('status', 'count'))
+    for status, count in rows:
+        if status in counts:
+            counts[status] = count
+    return counts
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def due_counts(user_id, now):
+    """``(overdue, due_this_week)`` among the open tasks, the week ending on Sunday night."""
+    today = timezone.localdate(now)
+    week_end = start_of_day(today + timedelta(days=7 - today.weekday()))
+    counts = (Task.objects.filter(user_id=user_id, due_date__lt=week_end)
+              .exclude(status=COMPLETED)
+              .aggregate(overdue=Count('pk', filter=Q(due_date__lt=now)),
+                         due_this_week=Count('pk', filter=Q(due_date__gte=now))))
+    return counts['overdue'], counts['due_this_week']
+
+
+def completion_trend(user_id, now, days):
+    """Completed tasks per local day for the last ``days`` days, oldest first, days without any included."""
+    today = timezone.localdate(now)
+    first_day = today - timedelta(days=days - 1)
+    rows = (Task.objects.filter(user_id=user_id, updated_at__gte=start_of_day(first_day), status=COMPLETED)
+            .annotate(day=TruncDate('updated_at', tzinfo=timezone.get_current_timezone()))
+            .order_by().values('day').annotate(count=Count('pk')).values_list('day', 'count'))
+    completed = dict(rows)
+    return [
+        {'date': day.isoformat(), 'completed': completed.get(day, 0)}
+        for day in (first_day + timedelta(days=n) for n in range(days))
+    ]
+
+
+def task_stats(user_id, days=STATS_DAYS, now=None):
+    now = now or timezone.now()
+    counts = status_counts(user_id)
+    overdue, due_this_week = due_counts(user_id, now)
+    return {
+        'total': sum(counts.values()),
+        'by_status': counts,
+        'overdue': overdue,
+        'due_this_week': due_this_week,
+        'completed_by_day': completion_trend(user_id, now, days),
+    }
@@ -1,3 +1,1825 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import benchmark, checks, compression, events, export, importer, renderers
+from .authentication import StreamJWTAuthentication, StreamJWTScheme, UserStateCache, user_state_cache
+from .cache import cache_stats, get_cache
+from .filters import TaskFilter
+from .jobs import Worker, enqueue, job
+from .hashers import HashingBusy, hashing_gate
+from .metrics import RequestSample, registry
+from .middleware import CompressionMiddleware
+from .models import Job, Task, TaskCounter, Comment
+from .rows import RowEncoder, comment_rows, task_rows
+from .schema import generate_schema, schema_cache
+from .serializers import TASK_BULK_MAX_ITEMS, CommentSerializer, TaskSearchResultSerializer, TaskSerializer
+from .stats import task_stats
+from .throttling import LocalTokenBuckets, local_buckets
+from .tokens import BlacklistIndex, BloomFilter, FilteredRefreshToken, blacklist_index
+
+
+
+class BaseAPITestCase(APITestCase):
+    """Start every test with empty response, user-state, throttle and blacklist caches."""
+
+    def setUp(self):
+        get_cache().clear()
+        cache_stats.reset()
+        user_state_cache.clear()
+        local_buckets.clear()
+        blacklist_index.reset()
+
+
+class KeysetPaginationTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.tasks = [
+            Task.objects.create(title=f"Task {i}", user=self.user) for i in range(12)
+        ]
+        # Put several rows on the same timestamp so the id tie-breaker is exercised.
+        same_time = timezone.now()
+        Task.objects.filter(pk__in=[t.pk for t in self.tasks[4:8]]).update(created_at=same_time)
+
+    def walk(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_task_list_walks_every_row_once(self):
+        ids, pages = self.walk(reverse('task-list') + '?cursor=')
+        expected = list(
+            Task.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse('task-list') + '?cursor=')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']],
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.data['count'], 12)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('task-list') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_comment_list(self):
+        task = self.tasks[0]
+        for i in range(7):
+            Comment.objects.create(text=f"Comment {i}", task=task, user=self.user)
+        ids, pages = self.walk(reverse('comment-list', args=[task.pk]) + '?cursor=')
+        expected = list(
+            Comment.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 2)
+
+
+class TaskFilterQueryPlanTests(BaseAPITestCase):
+    """
+    Every TaskFilter combination must be answered from an index on the
+    tasks table, never from a full table scan.
+    """
+    combinations = [
+        {},
+        {'status': 'pending'},
+        {'status__in': 'pending,in_progress'},
+        {'due_date': '2030-01-01T00:00:00Z'},
+        {'due_date__gte': '2030-01-01T00:00:00Z'},
+        {'due_date__lte': '2030-01-01T00:00:00Z'},
+        {'due_date__gte': '2030-01-01T00:00:00Z', 'due_date__lte': '2030-02-01T00:00:00Z'},
+        {'overdue': 'true'},
+        {'overdue': 'false'},
+        {'status': 'pending', 'due_date__gte': '2030-01-01T00:00:00Z'},
+        {'status__in': 'pending,complated', 'overdue': 'true'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='planner', password='secret-pass-123')
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        for owner in (self.user, other):
+            for i in range(30):
+                Task.objects.create(
+                    title=f"Task {i}",
+                    user=owner,
+                    status=Task.TASK_STATUS[i % 3][0],
+                    due_date=timezone.now() + timezone.timedelta(days=i - 15),
+                )
+
+    def test_user_scoped_list(self):
+        other_task = Task.objects.exclude(user=self.user).first()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.data['count'], 30)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertNotIn(other_task.pk, ids)
+
+    def test_filters_use_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plan assertions are written against SQLite's EXPLAIN QUERY PLAN.")
+
+        table = Task._meta.db_table
+        base = Task.objects.filter(user=self.user).order_by('-created_at')
+        for data in self.combinations:
+            with self.subTest(filters=data):
+                filterset = TaskFilter(data, queryset=base)
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                plan = filterset.qs.explain()
+                self.assertIn(f'SEARCH {table} USING', plan)
+                self.assertNotRegex(plan, rf'SCAN {table}\b(?! USING)')
+
+
+class TaskBulkTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='syncer', password='secret-pass-123')
+        self.other = User.objects.create_user(username='stranger', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_reports_item_errors(self):
+        payload = [{"title": f"Task {i}"} for i in range(1000)]
+        payload[3] = {"title": "Bad", "status": "unknown"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('task-bulk-create'), payload, format='json')
+        # A handful of batched INSERTs, not one per task.
+        self.assertLess(len(queries), 20)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['data']), 999)
+        self.assertEqual([e['index'] for e in response.data['errors']], [3])
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 999)
+
+    def test_bulk_create_limit(self):
+        payload = [{"title": "Task"}] * (TASK_BULK_MAX_ITEMS + 1)
+        response = self.client.post(reverse('task-bulk-create'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_update_only_touches_owned_tasks(self):
+        mine = [Task.objects.create(title=f"Mine {i}", user=self.user) for i in range(3)]
+        theirs = Task.objects.create(title="Theirs", user=self.other)
+        payload = [{"id": task.pk, "status": "complated"} for task in mine]
+        payload.append({"id": theirs.pk, "status": "complated"})
+        response = self.client.patch(reverse('task-bulk-update'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 3)
+        self.assertEqual(response.data['errors'], [{"index": 3, "errors": {"id": ["Task not found."]}}])
+        self.assertEqual(Task.objects.filter(user=self.user, status='complated').count(), 3)
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.status, 'pending')
+
+    def test_bulk_delete(self):
+        mine = [Task.objects.create(title=f"Mine {i}", user=self.user) for i in range(3)]
+        theirs = Task.objects.create(title="Theirs", user=self.other)
+        ids = [task.pk for task in mine] + [theirs.pk]
+        response = self.client.post(reverse('task-bulk-delete'), {"ids": ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], sorted(task.pk for task in mine))
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertFalse(Task.objects.filter(user=self.user).exists())
+        self.assertTrue(Task.objects.filter(pk=theirs.pk).exists())
+
+    def test_bulk_delete_is_set_based(self):
+        tasks = [Task.objects.create(title=f"Task {i}", user=self.user) for i in range(20)]
+        for task in tasks[:5]:
+            Comment.objects.create(text="Gone with the task", task=task, user=self.user)
+        comments_url = reverse('comment-list', args=[tasks[0].pk])
+        self.assertEqual(len(self.client.get(comments_url).data['results']), 1)
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                reverse('task-bulk-delete'), {"ids": [task.pk for task in tasks]}, format='json')
+        self.assertEqual(len(response.data['deleted']), 20)
+        # One bump per cache scope and one stream hint, not one of each per task.
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 2)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.client.get(comments_url).data['results'], [])
+
+
+class ConditionalGetTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='poller', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(title="Polled", user=self.user)
+        for i in range(3):
+            Comment.objects.create(text=f"Comment {i}", task=self.task, user=self.user)
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+        return etag
+
+    def test_task_detail(self):
+        url = reverse('task-detail', args=[self.task.pk])
+        etag = self.assert_revalidates(url)
+
+        last_modified = self.client.get(url)['Last-Modified']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        Task.objects.filter(pk=self.task.pk).update(
+            title="Changed", updated_at=timezone.now() + timezone.timedelta(seconds=1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], "Changed")
+
+    def test_task_list_changes_on_delete(self):
+        other = Task.objects.create(title="Other", user=self.user)
+        url = reverse('task-list') + '?status=pending'
+        etag = self.assert_revalidates(url)
+        other.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_query(self):
+        first = self.client.get(reverse('task-list'))['ETag']
+        second = self.client.get(reverse('task-list') + '?status=pending')['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_comment_list(self):
+        url = reverse('comment-list', args=[self.task.pk])
+        etag = self.assert_revalidates(url)
+        Comment.objects.create(text="New", task=self.task, user=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_foreign_task_is_not_revalidated(self):
+        other = User.objects.create_user(username='nosy', password='secret-pass-123')
+        self.client.force_authenticate(other)
+        response = self.client.get(
+            reverse('task-detail', args=[self.task.pk]), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+class CachedJWTAuthenticationTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='tokened', password='secret-pass-123')
+        self.task = Task.objects.create(title="Mine", user=self.user)
+        response = self.client.post(
+            reverse('login'), {'username': 'tokened', 'password': 'secret-pass-123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_user_row_is_not_loaded_per_request(self):
+        url = reverse('task-detail', args=[self.task.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Conditional state + object fetch; no User query once the state is cached.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user'], self.user.pk)
+
+    def test_writes_use_token_user_id(self):
+        response = self.client.post(reverse('create-task'), {'title': 'From token'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get(pk=response.data['id']).user, self.user)
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('task-detail', args=[self.task.pk]))
+        self.assertEqual(response.status_code, 401)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = UserStateCache(maxsize=2, ttl=60)
+        cache.set(1, (True, False))
+        cache.set(2, (True, False))
+        cache.get(1)
+        cache.set(3, (True, False))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), (True, False))
+
+        expired = UserStateCache(ttl=-1)
+        expired.set(1, (True, False))
+        self.assertIsNone(expired.get(1))
+
+
+class QueryBudgetTests(BaseAPITestCase):
+    """
+    Each endpoint runs a fixed number of queries, however many tasks and
+    comments the user has. ``force_authenticate`` keeps authentication
+    queries out of the count.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='budget', password='secret-pass-123')
+        self.other = User.objects.create_user(username='intruder', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(title="Budgeted", user=self.user)
+        self.grow(2)
+
+    def grow(self, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(n):
+                task = Task.objects.create(title=f"Task {i}", user=self.user)
+                Comment.objects.create(text=f"Comment {i}", task=task, user=self.user)
+                Comment.objects.create(text=f"Comment {i}", task=self.task, user=self.user)
+
+    def assert_budget(self, budget, request):
+        for _ in range(2):
+            with self.assertNumQueries(budget):
+                response = request()
+            self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+            self.grow(20)
+
+    def test_task_list(self):
+        self.assert_budget(3, lambda: self.client.get(reverse('task-list')))
+        self.assert_budget(2, lambda: self.client.get(reverse('task-list') + '?cursor='))
+
+    def test_task_detail(self):
+        url = reverse('task-detail', args=[self.task.pk])
+        self.assert_budget(2, lambda: self.client.get(url))
+
+    def test_task_update(self):
+        url = reverse('task-update', args=[self.task.pk])
+        self.assert_budget(2, lambda: self.client.patch(url, {'title': 'Renamed'}))
+
+    def test_task_delete(self):
+        targets = list(Task.objects.filter(user=self.user).exclude(pk=self.task.pk))
+        self.assert_budget(
+            4, lambda: self.client.delete(reverse('task-delete', args=[targets.pop().pk])))
+
+    def test_comment_list(self):
+        url = reverse('comment-list', args=[self.task.pk])
+        self.assert_budget(3, lambda: self.client.get(url))
+
+    def test_comment_create(self):
+        url = reverse('comment-create', args=[self.task.pk])
+        self.assert_budget(3, lambda: self.client.post(url, {'text': 'Hello'}))
+
+    def test_foreign_task_is_hidden_in_one_query(self):
+        foreign = Task.objects.create(title="Foreign", user=self.other)
+        with self.assertNumQueries(1):
+            response = self.client.patch(reverse('task-update', args=[foreign.pk]), {'title': 'x'})
+        self.assertEqual(response.status_code, 404)
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('comment-create', args=[foreign.pk]), {'text': 'Hijack'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(task=foreign).exists())
+
+
+class ResponseCacheTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='dashboard', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task = Task.objects.create(title="Cached", user=self.user)
+
+    def test_task_list_hit_and_invalidation(self):
+        url = reverse('task-list')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        # Only the conditional-GET aggregate runs on a hit.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('task-update', args=[self.task.pk]), {'title': 'Renamed'})
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+        self.assertEqual(cache_stats.as_dict()['hits'], 1)
+
+    def test_filters_are_cached_separately(self):
+        self.client.get(reverse('task-list'))
+        response = self.client.get(reverse('task-list') + '?status=complated')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_bulk_writes_invalidate(self):
+        url = reverse('task-list')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('task-bulk-create'), [{'title': 'Bulk'}], format='json')
+        self.assertEqual(self.client.get(url).data['count'], 2)
+
+    def test_comment_list_invalidation(self):
+        url = reverse('comment-list', args=[self.task.pk])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('comment-create', args=[self.task.pk]), {'text': 'Hi'})
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_ratio', response.data)
+
+
+class CommentStatsTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='talker', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(title="Discussed", user=self.user)
+
+    def test_counts_follow_create_and_delete(self):
+        url = reverse('comment-create', args=[self.task.pk])
+        for text in ('first', 'second'):
+            self.client.post(url, {'text': text})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.comment_count, 2)
+        newest = Comment.objects.latest('created_at')
+        self.assertEqual(self.task.last_commented_at, newest.created_at)
+
+        newest.delete()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.comment_count, 1)
+        self.assertEqual(
+            self.task.last_commented_at, Comment.objects.get(task=self.task).created_at)
+
+        response = self.client.get(reverse('task-detail', args=[self.task.pk]))
+        self.assertEqual(response.data['comment_count'], 1)
+
+    def test_task_cascade_skips_bookkeeping(self):
+        for i in range(5):
+            Comment.objects.create(text=f"Comment {i}", task=self.task, user=self.user)
+        # Task fetch, comment collection, two DELETEs; no per-comment UPDATE.
+        with self.assertNumQueries(4):
+            self.client.delete(reverse('task-delete', args=[self.task.pk]))
+
+    def test_rebuild_command(self):
+        for i in range(3):
+            Comment.objects.create(text=f"Comment {i}", task=self.task, user=self.user)
+        Task.objects.update(comment_count=0, last_commented_at=None)
+        url = reverse('task-detail', args=[self.task.pk])
+        etag = self.client.get(url)['ETag']
+        out = StringIO()
+        call_command('rebuild_comment_stats', batch_size=1, stdout=out)
+        self.assertIn("Repaired comment stats of 1 tasks", out.getvalue())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.comment_count, 3)
+        self.assertIsNotNone(self.task.last_commented_at)
+        # The repaired task is no longer served as unchanged.
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['comment_count'], 3)
+
+        # Tasks whose stats are right are left alone.
+        updated_at = self.task.updated_at
+        self.assertEqual(Task.objects.refresh_comment_stats(), 0)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.updated_at, updated_at)
+
+
+class DatabaseProfileTests(BaseAPITestCase):
+
+    def test_sqlite_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite profile only.")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class BenchmarkHarnessTests(BaseAPITestCase):
+
+    def test_every_route_runs(self):
+        user = benchmark.seed(users=1, tasks=12, comments=1)[0]
+        self.assertEqual(Task.objects.filter(user=user, comment_count=1).count(), 12)
+        results = benchmark.run(user, iterations=1)
+        self.assertEqual(
+            set(results), {scenario.name for scenario in benchmark.default_scenarios()})
+        for row in results.values():
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+    def test_compare_flags_regressions(self):
+        row = {'p95_ms': 10.0, 'queries': 2}
+        baseline = {'results': {'task_list': row}}
+        self.assertEqual(benchmark.compare(baseline, {'results': {'task_list': row}}), [])
+        slower = {'results': {'task_list': {'p95_ms': 13.0, 'queries': 3}}}
+        self.assertEqual(len(benchmark.compare(baseline, slower, threshold=0.2)), 2)
+
+    def test_concurrent_asgi_clients(self):
+        # Unauthenticated requests are rejected before touching the database,
+        # which the handler's per-request threads could not see inside a test.
+        build = lambda client, i: ('get', reverse('async-task-list'), [], None)
+        result = benchmark.run_concurrent(ASGIHandler(), build, clients=10, requests_per_client=2)
+        self.assertEqual(result['requests'], 20)
+        self.assertEqual(result['failures'], 20)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+class MetricsTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.user = User.objects.create_user(username='observed', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(title="Observed", user=self.user)
+
+    def test_records_per_route_histograms(self):
+        self.client.get(reverse('task-detail', args=[self.task.pk]))
+        snapshot = registry.snapshot('api/task/detail/<int:pk>/', 'GET')
+        self.assertEqual(snapshot['request_duration_seconds'][0], 1)
+        self.assertEqual(snapshot['db_queries'][1], 2)
+        self.assertGreater(snapshot['db_duration_seconds'][1], 0)
+        self.assertGreater(snapshot['serializer_duration_seconds'][1], 0)
+        self.assertGreater(snapshot['response_size_bytes'][1], 0)
+
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse('task-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user(username='ops', password='secret-pass-123', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'apiv01_requests_total{route="api/tasks/",method="GET",status="200"} 1', body)
+        self.assertIn(
+            'apiv01_request_duration_seconds_bucket{route="api/tasks/",method="GET",le="+Inf"} 1', body)
+        self.assertIn('apiv01_response_cache_misses_total 1', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_prometheus_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_sampling(self):
+        self.client.get(reverse('task-list'))
+        self.assertIsNone(registry.snapshot('api/tasks/', 'GET'))
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_request_log_includes_sql(self):
+        with self.assertLogs('apiv01.slow_requests', level='WARNING') as logs:
+            self.client.get(reverse('task-detail', args=[self.task.pk]))
+        self.assertIn('SELECT', logs.output[0])
+        self.assertIn('apiv01_task', logs.output[0])
+
+    def test_sample_keeps_slowest_statements(self):
+        sample = RequestSample(keep_sql=True)
+        for n in [3, 25, 1, 17, 8, 30, 12, 2, 21, 5, 14, 27, 9]:
+            sample.execute_wrapper(lambda *args: time.sleep(n / 1000), f'q{n}', None, False, None)
+        kept = sorted(sql for _, sql in sample.statements)
+        self.assertEqual(kept, sorted(f'q{n}' for n in [25, 17, 8, 30, 12, 21, 5, 14, 27, 9]))
+
+
+class ExportTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='exporter', password='secret-pass-123')
+        other = User.objects.create_user(username='bystander', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.tasks = [Task.objects.create(title=f"Task {n}", user=self.user) for n in range(5)]
+        Comment.objects.create(text="First, \"quoted\"", task=self.tasks[0], user=self.user)
+        Comment.objects.create(text="Second", task=self.tasks[0], user=self.user)
+        Task.objects.create(title="Not mine", user=other)
+
+    def test_ndjson_matches_api_representation(self):
+        response = self.client.get(reverse('task-export'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([r['id'] for r in records], [t.pk for t in self.tasks])
+
+        first = records[0]
+        comments = first.pop('comments')
+        self.assertEqual([c['text'] for c in comments], ['First, "quoted"', 'Second'])
+        detail = self.client.get(reverse('task-detail', args=[self.tasks[0].pk])).json()
+        self.assertEqual(first, detail)
+        listed = self.client.get(reverse('comment-list', args=[self.tasks[0].pk])).json()['results']
+        self.assertEqual(comments, sorted(listed, key=lambda c: c['id']))
+
+    def test_csv(self):
+        response = self.client.get(reverse('task-export'), {'format': 'csv'}, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([r['record'] for r in rows], ['task', 'comment', 'comment'] + ['task'] * 4)
+        self.assertEqual(rows[1]['text'], 'First, "quoted"')
+        self.assertEqual(rows[1]['task'], str(self.tasks[0].pk))
+
+        response = self.client.get(reverse('task-export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_csv_has_header(self):
+        Task.objects.filter(user=self.user).delete()
+        response = self.client.get(reverse('task-export'), {'format': 'csv'}, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(next(csv.reader(StringIO(body))), list(export.CSV_HEADER))
+        self.assertEqual(len(body.splitlines()), 1)
+
+    def test_queries_per_chunk(self):
+        tasks = Task.objects.filter(user=self.user)
+        # One task query, then one comment query per chunk of two tasks.
+        with self.assertNumQueries(4):
+            lines = ''.join(export.export(tasks, chunk_size=2)).splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_command_writes_file_per_user(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_tasks', '--output-dir', directory, '--format', 'csv', stdout=StringIO())
+            self.assertEqual(sorted(os.listdir(directory)), ['bystander.csv', 'exporter.csv'])
+            with open(os.path.join(directory, 'exporter.csv')) as fh:
+                self.assertEqual(len(list(csv.DictReader(fh))), 7)
+
+        out = StringIO()
+        call_command('export_tasks', '--user', 'bystander', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['title'], 'Not mine')
+
+
+class ImportTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='importer', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def post(self, body, content_type='application/x-ndjson', **params):
+        url = reverse('task-import')
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.generic('POST', url, body, content_type=content_type)
+
+    def test_round_trip_from_export(self):
+        source = User.objects.create_user(username='source', password='secret-pass-123')
+        task = Task.objects.create(title="Carried over", status='in_progress', user=source)
+        Comment.objects.create(text="Along with this", task=task, user=source)
+        Task.objects.create(title="Second", user=source)
+        body = ''.join(export.export(Task.objects.filter(user=source)))
+
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['tasks'], response.data['comments']), (2, 1))
+        imported = Task.objects.filter(user=self.user).order_by('pk')
+        self.assertEqual([t.title for t in imported], ["Carried over", "Second"])
+        self.assertEqual(imported[0].status, 'in_progress')
+        self.assertEqual(imported[0].comment_count, 1)
+        self.assertEqual(imported[0].comment_set.get().user, self.user)
+
+        csv_body = ''.join(export.export(Task.objects.filter(user=source), 'csv'))
+        response = self.post(csv_body, content_type='text/csv')
+        self.assertEqual((response.data['tasks'], response.data['comments']), (2, 1))
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        body = '\n'.join([
+            json.dumps({'title': 'Good', 'due_date': '2001-01-01T00:00:00Z'}),
+            json.dumps({'title': 'Bad status', 'status': 'done'}),
+            '{not json',
+            json.dumps({'title': '', 'due_date': 'tomorrow'}),
+            json.dumps({'title': 'Bad comment', 'comments': [{'text': ''}]}),
+        ])
+        response = self.post(body)
+        self.assertEqual(response.data['tasks'], 1)
+        self.assertEqual(response.data['invalid'], 4)
+        errors = {error['record']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(set(errors), {1, 2, 3, 4})
+        self.assertIn('status', errors[1])
+        self.assertIn('non_field_errors', errors[2])
+        self.assertEqual(set(errors[3]), {'title', 'due_date'})
+        self.assertIn('comments', errors[4])
+        self.assertEqual(self.post('', format='xml').status_code, 400)
+
+    def test_owners_are_validated_per_record(self):
+        records = [{'title': 'Mine', 'user': self.user.pk}, {'title': 'Nobody', 'user': 10 ** 9},
+                   {'title': 'Anonymous'}]
+        # One user lookup for the whole batch, then the insert in a savepoint.
+        with self.assertNumQueries(4):
+            result = importer.TaskImporter().run(records)
+        self.assertEqual(result['tasks'], 1)
+        self.assertEqual([error['record'] for error in result['errors']], [1, 2])
+
+    def test_fractional_user_ids_are_rejected(self):
+        pk = self.user.pk
+        records = [{'title': 'Int', 'user': pk}, {'title': 'Whole float', 'user': float(pk)},
+                   {'title': 'String', 'user': str(pk)}, {'title': 'Fraction', 'user': pk + 0.7},
+                   {'title': 'Fraction string', 'user': f'{pk}.7'}, {'title': 'List', 'user': [pk]}]
+        result = importer.TaskImporter().run(records)
+        self.assertEqual(result['tasks'], 3)
+        self.assertEqual([error['record'] for error in result['errors']], [3, 4, 5])
+        self.assertEqual(result['errors'][0]['errors'], {'user': ["A valid user id is required."]})
+
+    def test_resume_after_interruption(self):
+        records = [{'title': f'Task {n}'} for n in range(5)]
+
+        def interrupt(result):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            importer.TaskImporter(self.user.pk, 2, 'nightly', interrupt).run(records)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+
+        result = importer.TaskImporter(self.user.pk, 2, 'nightly').run(records, resume=True)
+        self.assertEqual((result['skipped'], result['tasks']), (2, 3))
+        self.assertEqual(
+            sorted(Task.objects.filter(user=self.user).values_list('title', flat=True)),
+            [f'Task {n}' for n in range(5)])
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('title,status,due_date\nFrom file,complated,\nAnother,,2030-01-01T10:00:00\n')
+        try:
+            out = StringIO()
+            call_command('import_tasks', fh.name, '--user', 'importer', stdout=out)
+            self.assertIn('Imported 2 tasks', out.getvalue())
+            call_command('import_tasks', fh.name, '--user', 'importer', '--resume', stdout=out)
+        finally:
+            os.remove(fh.name)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Task.objects.get(title='From file').status, 'complated')
+
+
+def throttle_rates(**rates):
+    return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {
+        **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates}}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ThrottlingTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='limited', password='secret-pass-123')
+
+    def login(self, username, password='wrong-password', **extra):
+        return self.client.post(reverse('login'), {'username': username, 'password': password}, **extra)
+
+    def test_login_per_username(self):
+        for _ in range(5):
+            self.assertEqual(self.login('limited').status_code, 401)
+        response = self.login('LIMITED', password='secret-pass-123')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('someone-else').status_code, 401)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(login_ip='3/min', login_username=None))
+    def test_login_per_ip(self):
+        for n in range(3):
+            self.assertEqual(self.login(f'user{n}').status_code, 401)
+        self.assertEqual(self.login('user3').status_code, 429)
+        self.assertEqual(self.login('user3', REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(register_ip='1/hour'))
+    def test_register(self):
+        data = {'username': 'fresh', 'password': 'Secret-pass-123', 'password2': 'Secret-pass-123'}
+        self.assertEqual(self.client.post(reverse('register'), data).status_code, 201)
+        self.assertEqual(self.client.post(reverse('register'), data).status_code, 429)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(writes='2/min'))
+    def test_writes_per_user(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.assertEqual(
+                self.client.post(reverse('create-task'), {'title': 'Limited'}).status_code, 201)
+        self.assertEqual(self.client.post(reverse('create-task'), {'title': 'Over'}).status_code, 429)
+        self.assertEqual(self.client.get(reverse('task-list')).status_code, 200)
+
+        auth = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        response = self.client.post(
+            reverse('async-create-task'), {'title': 'Over'}, format='json', HTTP_AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        other = User.objects.create_user(username='unlimited', password='secret-pass-123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(reverse('create-task'), {'title': 'Mine'}).status_code, 201)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(writes='2/min'), THROTTLE_STORE='cache')
+    def test_shared_cache_store(self):
+        self.client.force_authenticate(self.user)
+        statuses = [self.client.post(reverse('create-task'), {'title': 'Shared'}).status_code
+                    for _ in range(3)]
+        self.assertEqual(statuses, [201, 201, 429])
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(6):
+            self.assertEqual(self.login('limited').status_code, 401)
+
+    def test_token_bucket_refill_and_eviction(self):
+        buckets = LocalTokenBuckets(maxsize=2)
+        self.assertEqual(buckets.consume('a', 1, 0.05), 0)
+        self.assertGreater(buckets.consume('a', 1, 0.05), 0)
+        time.sleep(0.06)
+        self.assertEqual(buckets.consume('a', 1, 0.05), 0)
+
+        buckets.consume('b', 1, 60)
+        buckets.consume('c', 1, 60)
+        # 'a' was least recently used and is evicted, so it starts full again.
+        self.assertEqual(buckets.consume('a', 1, 0.05), 0)
+
+
+FAST_HASHING = dict(
+    PASSWORD_PBKDF2_ITERATIONS=1000,
+    PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10,
+    PASSWORD_SCRYPT_BLOCK_SIZE=8,
+    PASSWORD_SCRYPT_PARALLELISM=1,
+)
+
+
+@override_settings(**FAST_HASHING)
+class PasswordHashingTests(BaseAPITestCase):
+
+    def login(self):
+        return self.client.post(
+            reverse('login'), {'username': 'hashed', 'password': 'secret-pass-123'})
+
+    def test_rehash_on_login_when_hasher_changes(self):
+        user = User.objects.create_user(username='hashed', password='secret-pass-123')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+        with override_settings(PASSWORD_HASHERS=[
+                'apiv01.hashers.ScryptPasswordHasher', 'apiv01.hashers.PBKDF2PasswordHasher']):
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('scrypt$'))
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_rehash_on_login_when_work_factor_changes(self):
+        user = User.objects.create_user(username='hashed', password='secret-pass-123')
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_HASHING_CONCURRENCY=1, PASSWORD_HASHING_TIMEOUT=0.01)
+    def test_busy_gate_sheds_logins(self):
+        User.objects.create_user(username='hashed', password='secret-pass-123')
+        with hashing_gate.slot():
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.login().status_code, 200)
+
+        with hashing_gate.slot():
+            data = {'username': 'newcomer', 'password': 'Secret-pass-123', 'password2': 'Secret-pass-123'}
+            self.assertEqual(self.client.post(reverse('register'), data).status_code, 503)
+        self.assertFalse(User.objects.filter(username='newcomer').exists())
+
+        # Outside the API, e.g. the admin login, a plain error.
+        with hashing_gate.slot():
+            with self.assertRaises(HashingBusy):
+                User.objects.get(username='hashed').check_password('secret-pass-123')
+
+    def test_register_is_a_single_insert(self):
+        data = {'username': 'newcomer', 'password': 'Secret-pass-123', 'password2': 'Secret-pass-123'}
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.post(reverse('register'), data).status_code, 201)
+        writes = [q['sql'] for q in captured if not q['sql'].startswith('SELECT')]
+        self.assertEqual(len([sql for sql in writes if 'auth_user' in sql]), 1)
+        self.assertTrue(User.objects.get(username='newcomer').check_password('Secret-pass-123'))
+
+
+class AsyncViewTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='awaiting', password='secret-pass-123')
+        self.other = User.objects.create_user(username='elsewhere', password='secret-pass-123')
+        self.task = Task.objects.create(title="Mine", user=self.user)
+        self.foreign = Task.objects.create(title="Theirs", user=self.other)
+        self.auth = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def test_list_matches_sync_view(self):
+        for n in range(3):
+            Task.objects.create(title=f"Extra {n}", status='in_progress', user=self.user)
+        for query in ('', '?status=in_progress', '?cursor=', '?q=extra'):
+            sync = self.client.get(reverse('task-list') + query)
+            native = self.client.get(reverse('async-task-list') + query)
+            self.assertEqual(native.status_code, 200)
+            self.assertEqual(native.json()['results'], sync.json()['results'])
+            self.assertEqual(native.json().get('count'), sync.json().get('count'))
+
+    def test_detail_update_delete(self):
+        detail = self.client.get(reverse('async-task-detail', args=[self.task.pk]))
+        self.assertEqual(detail.json(), self.client.get(reverse('task-detail', args=[self.task.pk])).json())
+
+        response = self.client.patch(
+            reverse('async-task-update', args=[self.task.pk]), {'status': 'complated'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'complated')
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'complated')
+
+        response = self.client.delete(reverse('async-task-delete', args=[self.task.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_create_validates(self):
+        response = self.client.post(reverse('async-create-task'), {'title': 'Async'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get(pk=response.json()['id']).user, self.user)
+
+        response = self.client.post(reverse('async-create-task'), {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json())
+
+    def test_foreign_task_is_not_found(self):
+        for name, method in (('async-task-detail', 'get'), ('async-task-update', 'patch'),
+                             ('async-task-delete', 'delete')):
+            response = getattr(self.client, method)(reverse(name, args=[self.foreign.pk]))
+            self.assertEqual(response.status_code, 404)
+        response = self.client.post(
+            reverse('async-comment-create', args=[self.foreign.pk]), {'text': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Task.objects.filter(pk=self.foreign.pk).exists())
+
+    def test_requires_token(self):
+        self.client.credentials()
+        response = self.client.get(reverse('async-task-list'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        self.assertEqual(self.client.post(reverse('async-task-list')).status_code, 405)
+
+    def test_comments(self):
+        response = self.client.post(
+            reverse('async-comment-create', args=[self.task.pk]), {'text': 'Async hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(reverse('async-comment-list', args=[self.task.pk]))
+        self.assertEqual([c['text'] for c in response.json()['results']], ['Async hi'])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.comment_count, 1)
+
+    async def test_native_async_client(self):
+        response = await self.async_client.get(
+            reverse('async-task-detail', args=[self.task.pk]), headers={'Authorization': self.auth})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Mine')
+
+
+# The Bloom filter needs every process to see the same cache generations.
+blacklist_filter = override_settings(JWT_BLACKLIST_FILTER=True, CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'todo_tests_shared_cache'),
+}})
+
+
+class TokenBlacklistTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='refresher', password='secret-pass-123')
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)})
+
+    def blacklist_queries(self, captured):
+        return [q for q in captured if 'token_blacklist_blacklistedtoken' in q['sql']]
+
+    @blacklist_filter
+    def test_refresh_skips_blacklist_lookup(self):
+        get_cache().clear()
+        token = FilteredRefreshToken.for_user(self.user)
+        blacklist_index.sync()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        self.assertEqual(self.blacklist_queries(captured), [])
+
+    def test_logout_then_refresh_is_rejected(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(reverse('logout'), {'refresh': str(token)}).status_code, 200)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    @blacklist_filter
+    def test_blacklist_reaches_other_processes(self):
+        get_cache().clear()
+        token = FilteredRefreshToken.for_user(self.user)
+        other = BlacklistIndex()
+        self.assertFalse(other.might_contain(token['jti']))
+        FilteredRefreshToken(str(token)).blacklist()
+        # The bumped generation makes the other index catch up on its next check.
+        self.assertTrue(other.might_contain(token['jti']))
+
+    def test_local_cache_queries_the_blacklist(self):
+        # The default locmem cache leaves the filter off: nothing to build or
+        # keep in step, and every refresh looks the token up.
+        self.assertFalse(settings.JWT_BLACKLIST_FILTER)
+        token = FilteredRefreshToken.for_user(self.user)
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(len(self.blacklist_queries(captured)), 1)
+        self.assertIsNone(blacklist_index.filter)
+        # Blacklisted by another process.
+        RefreshToken(str(token)).blacklist()
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(checks.check_blacklist_filter(), [])
+
+    @override_settings(JWT_BLACKLIST_FILTER=True)
+    def test_check_warns_about_filter_with_local_cache(self):
+        self.assertEqual([warning.id for warning in checks.check_blacklist_filter()], ['apiv01.W002'])
+
+    def test_expired_token_is_rejected_without_queries(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        token.set_exp(lifetime=timedelta(seconds=-1))
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(len(captured), 0)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.001)
+        items = [f'jti-{n}' for n in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'other-{n}' in bloom for n in range(10000))
+        self.assertLess(false_positives, 100)
+
+    def test_prune_tokens_deletes_expired_in_batches(self):
+        expired = [FilteredRefreshToken.for_user(self.user) for _ in range(3)]
+        live = FilteredRefreshToken.for_user(self.user)
+        expired[0].blacklist()
+        live.blacklist()
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]) \
+            .update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = StringIO()
+        call_command('prune_tokens', batch_size=2, stdout=out)
+        self.assertIn('Deleted 3 expired tokens.', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class SearchTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='searcher', password='secret-pass-123')
+        other = User.objects.create_user(username='bystander', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.milk = Task.objects.create(title="Buy milk <today>", description="From the corner shop", user=self.user)
+        self.shop = Task.objects.create(title="Call plumber", description="Ask about milk prices", user=self.user)
+        self.bread = Task.objects.create(title="Bake bread", status='complated', user=self.user)
+        Comment.objects.create(text="Sourdough with oat milk", task=self.bread, user=self.user)
+        Task.objects.create(title="Buy milk", user=other)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse('task-list'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_matches_titles_descriptions_and_comments_ranked(self):
+        results = self.search('milk')
+        self.assertEqual([r['id'] for r in results], [self.milk.pk, self.shop.pk, self.bread.pk])
+        ranks = [r['search']['rank'] for r in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual(results[0]['search']['highlights'], {'title': 'Buy <mark>milk</mark> &lt;today&gt;'})
+        self.assertEqual(results[2]['search']['highlights'], {'comments': 'Sourdough with oat <mark>milk</mark>'})
+
+    def test_terms_are_prefixes_and_all_required(self):
+        self.assertEqual([r['id'] for r in self.search('plumb')], [self.shop.pk])
+        self.assertEqual([r['id'] for r in self.search('milk corner')], [self.milk.pk])
+        self.assertEqual(self.search('milk -- ??'), self.search('milk'))
+        self.assertEqual(self.search('"OR NOT'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_combines_with_filters_and_keyset_pagination(self):
+        self.assertEqual([r['id'] for r in self.search('milk', status='complated')], [self.bread.pk])
+        self.assertEqual([r['id'] for r in self.search('milk', cursor='')],
+                         [self.bread.pk, self.shop.pk, self.milk.pk])
+
+    def test_index_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('task-update', args=[self.shop.pk]), {'description': 'Ask about the sink'})
+        self.assertEqual([r['id'] for r in self.search('milk')], [self.milk.pk, self.bread.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.filter(task=self.bread).delete()
+        self.assertEqual([r['id'] for r in self.search('milk')], [self.milk.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milk.delete()
+        self.assertEqual(self.search('milk'), [])
+
+        importer.TaskImporter(self.user.pk).run(
+            [{'title': 'Imported', 'comments': [{'text': 'skimmed milk'}, {'text': 'whole milk'}]}])
+        results = self.search('skimmed whole')
+        self.assertEqual([r['title'] for r in results], ['Imported'])
+
+    def test_plain_list_is_unchanged(self):
+        results = self.client.get(reverse('task-list')).json()['results']
+        self.assertNotIn('search', results[0])
+
+
+class DeltaSyncTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='syncer', password='secret-pass-123')
+        self.other = User.objects.create_user(username='bystander', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.tasks = [Task.objects.create(title=f"Task {n}", user=self.user) for n in range(3)]
+        Task.objects.create(title="Not mine", user=self.other)
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(reverse('task-changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_delta_sync(self):
+        full = self.sync()
+        self.assertEqual([t['id'] for t in full['changed']], [t.pk for t in self.tasks])
+        self.assertEqual(full['changed'][0], self.client.get(reverse('task-detail', args=[self.tasks[0].pk])).json())
+        self.assertEqual(full['deleted'], [])
+        self.assertFalse(full['has_more'])
+        self.assertEqual(self.sync(full['next']), {'changed': [], 'deleted': [], 'next': full['next'],
+                                                   'has_more': False})
+
+        self.client.patch(reverse('task-update', args=[self.tasks[1].pk]), {'status': 'in_progress'})
+        self.client.patch(reverse('task-update', args=[self.tasks[1].pk]), {'title': 'Renamed'})
+        self.client.delete(reverse('task-delete', args=[self.tasks[0].pk]))
+        created = self.client.post(reverse('create-task'), {'title': 'New'}).json()
+        Task.objects.create(title="Also not mine", user=self.other)
+
+        delta = self.sync(full['next'])
+        self.assertEqual([(t['id'], t['title'], t['status']) for t in delta['changed']],
+                         [(self.tasks[1].pk, 'Renamed', 'in_progress'), (created['id'], 'New', 'pending')])
+        self.assertEqual(delta['deleted'], [self.tasks[0].pk])
+
+        # A fresh client never sees tombstones.
+        self.assertEqual(self.sync()['deleted'], [])
+
+    def test_writes_outside_the_api_are_tracked(self):
+        since = self.sync()['next']
+        Comment.objects.create(text="Counts as a change", task=self.tasks[2], user=self.user)
+        self.client.post(reverse('task-bulk-delete'), {'ids': [self.tasks[0].pk]}, format='json')
+        importer.TaskImporter(self.user.pk).run([{'title': 'Imported'}])
+
+        delta = self.sync(since)
+        self.assertEqual([t['title'] for t in delta['changed']], ['Task 2', 'Imported'])
+        self.assertEqual(delta['changed'][0]['comment_count'], 1)
+        self.assertEqual(delta['deleted'], [self.tasks[0].pk])
+
+    def test_pages_until_caught_up(self):
+        since, seen = None, []
+        for _ in range(3):
+            page = self.sync(since, limit=2)
+            seen += [t['id'] for t in page['changed']]
+            since = page['next']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, [t.pk for t in self.tasks])
+
+        with CaptureQueriesContext(connection) as captured:
+            self.sync(since)
+        self.assertLessEqual(len(captured), 2)
+
+    def test_rejects_bad_tokens_and_limits(self):
+        self.assertEqual(self.client.get(reverse('task-changes'), {'since': 'bogus'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('task-changes'), {'limit': 0}).status_code, 400)
+
+
+class EventStreamTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        events.broker.reset()
+        self.user = User.objects.create_user(username='listener', password='secret-pass-123')
+        self.other = User.objects.create_user(username='bystander', password='secret-pass-123')
+        self.auth = f"Bearer {AccessToken.for_user(self.user)}"
+        self.app = events.EventStreamRouter(ASGIHandler())
+
+    async def connect(self, auth=None, query=''):
+        headers = [('Authorization', auth)] if auth else []
+        return await benchmark.EventStreamClient(self.app, reverse('task-events') + query, headers).open()
+
+    async def read_events(self, stream, count):
+        received = []
+        while len(received) < count:
+            for frame in (await stream.read()).split(b'\n\n'):
+                if frame.startswith(b'event: '):
+                    event, data = frame.split(b'\n')
+                    received.append((event[7:].decode(), json.loads(data[6:])))
+        return received
+
+    def test_needs_the_asgi_router(self):
+        self.assertEqual(self.client.get(reverse('task-events')).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        self.assertEqual(self.client.get(reverse('task-events')).status_code, 501)
+
+    async def test_rejects_bad_requests(self):
+        for stream in (await self.connect(), await self.connect('Bearer not-a-token')):
+            self.assertEqual(stream.status, 401)
+            await stream.task
+        status, _ = await benchmark.asgi_request(
+            self.app, 'post', reverse('task-events'), [('Authorization', self.auth)])
+        self.assertEqual(status, 405)
+        self.assertEqual(events.broker.count(), 0)
+
+    def write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title="Pushed", user=self.user)
+            Task.objects.create(title="Not mine", user=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(text="Hello", task=task, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'complated'
+            task.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(self.user)
+            self.client.post(reverse('task-bulk-create'), [{'title': 'Bulk'}], format='json')
+        pk = task.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+        return pk
+
+    async def test_pushes_own_changes(self):
+        stream = await self.connect(self.auth)
+        self.assertEqual(stream.status, 200)
+        self.assertEqual(await stream.read(), events.READY)
+        self.assertEqual(events.broker.count(), 1)
+
+        pk = await sync_to_async(self.write)()
+        received = await self.read_events(stream, 5)
+        self.assertEqual([event for event, _ in received],
+                         ['task.created', 'comment.created', 'task.updated', 'tasks.changed', 'task.deleted'])
+        self.assertEqual(received[0][1]['title'], 'Pushed')
+        self.assertEqual(received[1][1]['text'], 'Hello')
+        self.assertEqual(received[2][1]['status'], 'complated')
+        self.assertEqual(received[4][1], {'id': pk})
+        self.assertTrue(stream.chunks.empty())
+
+        await stream.close()
+        self.assertEqual(events.broker.count(), 0)
+
+    async def test_query_token_and_heartbeat(self):
+        with override_settings(EVENTS_HEARTBEAT=0.01):
+            stream = await self.connect(query=f'?access_token={AccessToken.for_user(self.user)}')
+        self.assertEqual(await stream.read(), events.READY)
+        self.assertEqual(await stream.read(), events.HEARTBEAT)
+        await stream.close()
+
+    async def test_stream_ends_when_the_token_expires(self):
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=timedelta(seconds=1))
+        stream = await self.connect(f"Bearer {token}")
+        self.assertEqual(await stream.read(), events.READY)
+        self.assertEqual(await stream.read(timeout=3), events.EXPIRED)
+        await asyncio.wait_for(stream.task, 1)
+        self.assertEqual(events.broker.count(), 0)
+
+    async def test_stream_ends_when_the_user_is_deactivated(self):
+        with override_settings(EVENTS_HEARTBEAT=0.01):
+            stream = await self.connect(self.auth)
+            self.assertEqual(await stream.read(), events.READY)
+            self.assertEqual(await stream.read(), events.HEARTBEAT)
+            self.user.is_active = False
+            await sync_to_async(self.user.save)()
+            await asyncio.wait_for(stream.task, 1)
+        self.assertEqual(events.broker.count(), 0)
+
+    async def test_slow_client_is_told_to_resync(self):
+        stream = await self.connect(self.auth)
+        await stream.read()
+        for _ in range(events.broker.max_frames + 1):
+            events.broker.deliver(self.user.pk, events.format_event('task.deleted', {'id': 1}))
+        self.assertEqual(await stream.read(), events.RESYNC)
+        await stream.task
+        self.assertEqual(events.broker.count(), 0)
+
+    async def test_holds_10k_idle_connections(self):
+        users = await sync_to_async(lambda: [
+            User.objects.create(username=f'idle_{n}') for n in range(100)])()
+        auth = [f"Bearer {AccessToken.for_user(user)}" for user in users]
+        queries = CaptureQueriesContext(connection)
+        await sync_to_async(queries.__enter__)()
+        streams = await asyncio.gather(*(self.connect(auth[n % len(users)]) for n in range(10_000)))
+        await sync_to_async(queries.__exit__)(None, None, None)
+        # One user-state lookup per user, however many of its clients connect at once.
+        self.assertEqual(await sync_to_async(len)(queries), len(users))
+        for stream in streams:
+            self.assertEqual(await stream.read(), events.READY)
+        self.assertEqual(events.broker.count(), 10_000)
+
+        events.publish(users[0].pk, 'task.deleted', lambda: {'id': 1})
+        for n, stream in enumerate(streams):
+            if n % len(users) == 0:
+                self.assertEqual(await self.read_events(stream, 1), [('task.deleted', {'id': 1})])
+            else:
+                self.assertTrue(stream.chunks.empty())
+
+        await asyncio.gather(*(stream.close() for stream in streams))
+        self.assertEqual(events.broker.count(), 0)
+
+
+class RowRepresentationTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='rower', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        self.tasks = [
+            Task.objects.create(title="Plain", user=self.user),
+            Task.objects.create(title="Ünïcode \u2028 \"quoted\" </script>", description="Line\nbreak\ttab",
+                                status='in_progress', due_date=now + timedelta(days=3), user=self.user),
+            Task.objects.create(title="Done", description="", status='complated', user=self.user),
+        ]
+        for n in range(4):
+            Task.objects.create(title=f"Filler {n}", due_date=now - timedelta(days=n), user=self.user)
+        for n in range(7):
+            Comment.objects.create(text=f"Comment {n} \u2029", task=self.tasks[1], user=self.user)
+
+    def test_encoders_match_serializers(self):
+        for encoder, serializer, queryset in (
+                (task_rows, TaskSerializer, Task.objects.order_by('pk')),
+                (comment_rows, CommentSerializer, Comment.objects.order_by('pk'))):
+            expected = JSONRenderer().render(serializer(queryset, many=True).data)
+            rows = encoder.encode(encoder.values(queryset))
+            self.assertEqual(renderers.FastJSONRenderer().render(rows), expected)
+            fast = renderers.orjson
+            renderers.orjson = None
+            try:
+                self.assertEqual(renderers.FastJSONRenderer().render(rows), expected)
+            finally:
+                renderers.orjson = fast
+
+    def test_rejects_fields_without_a_column(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RowEncoder(TaskSearchResultSerializer).compile()
+
+    def test_responses_match_serializer_path(self):
+        paths = [
+            reverse('task-list'),
+            reverse('task-list') + '?page=2',
+            reverse('task-list') + '?status=in_progress',
+            reverse('task-list') + '?cursor=',
+            reverse('task-detail', args=[self.tasks[1].pk]),
+            reverse('comment-list', args=[self.tasks[1].pk]),
+            reverse('comment-list', args=[self.tasks[1].pk]) + '?page=2',
+            reverse('async-task-list'),
+            reverse('async-task-detail', args=[self.tasks[1].pk]),
+            reverse('async-comment-list', args=[self.tasks[1].pk]) + '?cursor=',
+        ]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        for path in paths:
+            get_cache().clear()
+            fast = self.client.get(path)
+            get_cache().clear()
+            with override_settings(API_ROW_REPRESENTATION=False):
+                slow = self.client.get(path)
+            self.assertEqual(fast.status_code, 200, path)
+            self.assertEqual(fast.content, slow.content, path)
+        self.assertEqual(self.client.get(reverse('task-detail', args=[0])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('async-task-detail', args=[0])).status_code, 404)
+
+    def test_due_date_can_be_cleared(self):
+        response = self.client.patch(
+            reverse('task-update', args=[self.tasks[1].pk]), {'due_date': None}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['due_date'])
+        response = self.client.post(reverse('create-task'), {'title': 'Undated', 'due_date': None}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class SchemaTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        schema_cache.clear()
+        self.generated = 0
+
+    def generate(self):
+        self.generated += 1
+        return generate_schema()
+
+    def test_serves_cached_renditions(self):
+        accept = 'application/vnd.oai.openapi+json'
+        expected = OpenApiJsonRenderer().render(generate_schema(), accept)
+        response = self.client.get(reverse('schema'), HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+        compressed = self.client.get(reverse('schema'), HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING='gzip;q=1, br;q=0')
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), expected)
+        self.assertNotEqual(compressed.headers['ETag'], response.headers['ETag'])
+
+        not_modified = self.client.get(
+            reverse('schema'), HTTP_ACCEPT=accept, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        yaml = self.client.get(reverse('schema'))
+        self.assertEqual(yaml.content, OpenApiYamlRenderer().render(generate_schema()))
+        self.assertNotEqual(yaml.headers['ETag'], response.headers['ETag'])
+
+    def test_jwt_security_scheme(self):
+        schema = generate_schema()
+        self.assertEqual(schema['components']['securitySchemes'],
+                         {'jwtAuth': {'type': 'http', 'scheme': 'bearer', 'bearerFormat': 'JWT'}})
+        self.assertEqual(schema['paths']['/api/tasks/']['get']['security'], [{'jwtAuth': []}])
+
+        stream = StreamJWTScheme(StreamJWTAuthentication)
+        self.assertEqual(stream.get_security_requirement(None), [{'jwtAuth': []}, {'jwtQueryAuth': []}])
+        self.assertEqual(stream.get_security_definition(None)[1],
+                         {'type': 'apiKey', 'in': 'query', 'name': 'access_token'})
+
+    def test_loads_built_schema_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.json')
+            call_command('build_schema', output=path, stdout=StringIO())
+            with override_settings(API_SCHEMA_FILE=path, DEBUG=False):
+                rendition = schema_cache.get(OpenApiYamlRenderer, None, self.generate)
+                self.assertEqual(self.generated, 0)
+                self.assertEqual(rendition.body, OpenApiYamlRenderer().render(generate_schema()))
+
+                with open(path) as f:
+                    stored = json.load(f)
+                stored['fingerprint'] = 'outdated'
+                with open(path, 'w') as f:
+                    json.dump(stored, f)
+                schema_cache.clear()
+                with self.assertLogs('apiv01.schema', 'WARNING'):
+                    schema_cache.get(OpenApiYamlRenderer, None, self.generate)
+                self.assertEqual(self.generated, 1)
+
+    def test_regenerates_when_urlconf_changes(self):
+        schema_cache.get(OpenApiYamlRenderer, None, self.generate)
+        with override_settings(ROOT_URLCONF=settings.ROOT_URLCONF):
+            # Reloaded, but the same routes.
+            schema_cache.get(OpenApiYamlRenderer, None, self.generate)
+            self.assertEqual(self.generated, 1)
+        with override_settings(ROOT_URLCONF='apiv01.urls'):
+            rendition = schema_cache.get(OpenApiYamlRenderer, None, self.generate)
+            self.assertEqual(self.generated, 2)
+            self.assertNotIn(b'/api/tasks/', rendition.body)
+
+
+class CompressionTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='squeezer', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        for n in range(6):
+            task = Task.objects.create(title=f"Task {n}", description="Long description. " * 40, user=self.user)
+            Comment.objects.create(text="A comment on the task. " * 20, task=task, user=self.user)
+        self.short = Task.objects.create(title="Short", user=self.user)
+
+    def test_compresses_large_responses(self):
+        url = reverse('task-list')
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response.headers['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content) / 4)
+
+        refused = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', refused.headers)
+
+    def test_skips_small_responses(self):
+        response = self.client.get(reverse('task-detail', args=[self.short.pk]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_revalidates_compressed_responses(self):
+        url = reverse('task-list')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.headers['ETag'].startswith('W/"'))
+        cached = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_compresses_streams_per_chunk(self):
+        plain = b''.join(self.client.get(reverse('task-export')).streaming_content)
+        response = self.client.get(reverse('task-export'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        chunks = list(response.streaming_content)
+        # Every chunk is flushed, so the first already decodes to output.
+        self.assertTrue(zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0]))
+        self.assertEqual(gzip.decompress(b''.join(chunks)), plain)
+
+    async def test_compresses_async_streams(self):
+        async def content():
+            for n in range(3):
+                yield f'event {n}\n'.encode() * 100
+
+        middleware = CompressionMiddleware(lambda request: None)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = middleware.process(request, StreamingHttpResponse(content()))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(body), b''.join(f'event {n}\n'.encode() * 100 for n in range(3)))
+
+        events = middleware.process(request, HttpResponse(b': heartbeat\n\n' * 200, content_type='text/event-stream'))
+        self.assertNotIn('Content-Encoding', events.headers)
+
+    def test_codings_round_trip(self):
+        decompress = {
+            'gzip': gzip.decompress,
+            'br': lambda data: compression.brotli.decompress(data),
+            'zstd': lambda data: compression.zstandard.ZstdDecompressor().decompressobj().decompress(data),
+        }
+        chunks = [f'{n} '.encode() * 300 for n in range(5)]
+        for coding in compression.available_encodings():
+            compressor = compression.StreamCompressor(coding, compression.FAST_LEVELS[coding])
+            streamed = b''.join(compressor.compress(chunk) for chunk in chunks) + compressor.finish()
+            self.assertEqual(decompress[coding](streamed), b''.join(chunks), coding)
+            self.assertEqual(decompress[coding](compression.compress(b''.join(chunks), coding)), b''.join(chunks))
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_messagepack(self):
+        url = reverse('task-list')
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.headers['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.msgpack.unpackb(response.content), self.client.get(url).json())
+
+
+class TaskStatsTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='counter', password='secret-pass-123')
+        self.other = User.objects.create_user(username='bystander', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def assert_counters_match(self):
+        counted = {
+            (user_id, status): count
+            for user_id, status, count in Task.objects.order_by().values('user_id', 'status')
+            .annotate(count=Count('pk')).values_list('user_id', 'status', 'count')
+        }
+        stored = {
+            (user_id, status): count
+            for user_id, status, count in TaskCounter.objects.filter(count__gt=0)
+            .values_list('user_id', 'status', 'count')
+        }
+        self.assertEqual(stored, counted)
+
+    def test_counters_follow_every_write(self):
+        task = Task.objects.create(title="Single", user=self.user)
+        Task.objects.bulk_create([Task(title=f"Bulk {n}", user=self.user) for n in range(5)])
+        self.assert_counters_match()
+        task.status = 'in_progress'
+        task.save()
+        task.save()
+        Task.objects.filter(title__startswith="Bulk").exclude(title="Bulk 0").update(status='complated')
+        Task.objects.filter(title="Bulk 1").update(user=self.other)
+        self.assert_counters_match()
+        Task.objects.filter(title="Bulk 2").delete()
+        self.client.post(reverse('task-bulk-delete'), {'ids': [task.pk]}, format='json')
+        self.assert_counters_match()
+        self.assertFalse(TaskCounter.objects.filter(count__lt=0).exists())
+
+        self.other.delete()
+        self.assertFalse(TaskCounter.objects.filter(user_id=self.other.pk).exists())
+        self.assert_counters_match()
+
+    def test_due_and_completion_counts(self):
+        now = timezone.make_aware(timezone.datetime(2026, 10, 14, 12, 0))  # a Wednesday
+        Task.objects.create(title="Overdue", due_date=now - timedelta(days=1), user=self.user)
+        Task.objects.create(title="Sunday", due_date=now + timedelta(days=4, hours=11), user=self.user,
+                            status='in_progress')
+        Task.objects.create(title="Next week", due_date=now + timedelta(days=5, hours=1), user=self.user)
+        Task.objects.create(title="Undated", user=self.user)
+        Task.objects.create(title="Not mine", due_date=now - timedelta(days=1), user=self.other)
+        for title, ago in (("Today", 0), ("Earlier", 2), ("Earlier too", 2), ("Long ago", 20)):
+            Task.objects.create(title=title, due_date=now - timedelta(days=3), user=self.user, status='complated')
+            Task.objects.filter(title=title).update(updated_at=now - timedelta(days=ago))
+
+        with self.assertNumQueries(3):
+            stats = task_stats(self.user.pk, days=7, now=now)
+        self.assertEqual(stats['total'], 8)
+        self.assertEqual(stats['by_status'], {'pending': 3, 'in_progress': 1, 'complated': 4})
+        self.assertEqual((stats['overdue'], stats['due_this_week']), (1, 1))
+        self.assertEqual([day['date'] for day in stats['completed_by_day']][::3],
+                         ['2026-10-08', '2026-10-11', '2026-10-14'])
+        self.assertEqual([day['completed'] for day in stats['completed_by_day']], [0, 0, 0, 0, 2, 0, 1])
+
+        with override_settings(API_TASK_COUNTERS=False):
+            self.assertEqual(task_stats(self.user.pk, days=7, now=now), stats)
+
+    def test_endpoint(self):
+        Task.objects.create(title="Open", user=self.user)
+        Task.objects.create(title="Done", user=self.user, status='complated')
+        response = self.client.get(reverse('task-stats'), {'days': 3})
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        self.assertEqual(stats['by_status'], {'pending': 1, 'in_progress': 0, 'complated': 1})
+        self.assertEqual([day['completed'] for day in stats['completed_by_day']], [0, 0, 1])
+        self.assertEqual(self.client.get(reverse('task-stats'), {'days': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('task-stats'), {'days': 'all'}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(reverse('task-stats')).status_code, 401)
+
+
+JOB_CALLS = []
+
+
+@job('tests.record')
+def record_job(value):
+    JOB_CALLS.append(value)
+
+
+@job('tests.fail')
+def failing_job():
+    raise RuntimeError("Job failed on purpose")
+
+
+@skipUnless(connection.vendor in checks.TRIGGERS_SQL, "Triggers are only created on SQLite and PostgreSQL")
+class TriggerTests(BaseAPITestCase):
+
+    def test_migrations_create_triggers(self):
+        expected = checks.expected_triggers(connection)
+        self.assertEqual(len(expected), sum(len(vendors[connection.vendor]) for vendors in checks.TRIGGERS.values()))
+        self.assertLessEqual(set(expected), checks.database_triggers(connection))
+        self.assertEqual(checks.check_triggers(databases=['default']), [])
+
+    def test_check_warns_about_missing_trigger(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('DROP TRIGGER apiv01_taskcounter_insert')
+            else:
+                cursor.execute('DROP TRIGGER apiv01_taskcounter_count ON apiv01_task')
+        warnings = checks.check_triggers(databases=['default'])
+        self.assertEqual([warning.id for warning in warnings], ['apiv01.W001'])
+        self.assertIn('apiv01_taskcounter_', warnings[0].msg)
+
+
+class JobQueueTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        JOB_CALLS.clear()
+        self.user = User.objects.create_user(username='reminded', password='secret-pass-123')
+
+    def run_worker(self, **kwargs):
+        return Worker(pool='solo', poll_interval=0, periodic={}, **kwargs).run(burst=True)
+
+    def test_jobs_run_once_in_order(self):
+        enqueue('tests.record', {'value': 'later'}, run_at=timezone.now() - timedelta(seconds=1))
+        enqueue('tests.record', {'value': 'first'}, run_at=timezone.now() - timedelta(seconds=2))
+        enqueue('tests.record', {'value': 'tomorrow'}, run_at=timezone.now() + timedelta(days=1))
+        self.assertIsNotNone(enqueue('tests.record', {'value': 'unique'}, unique_key='once'))
+        self.assertIsNone(enqueue('tests.record', {'value': 'duplicate'}, unique_key='once'))
+        with self.assertRaises(LookupError):
+            enqueue('tests.unknown')
+
+        self.assertEqual(self.run_worker(), 3)
+        self.assertEqual(JOB_CALLS, ['first', 'later', 'unique'])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 3)
+        # A done job keeps its key taken.
+        self.assertIsNone(enqueue('tests.record', {'value': 'duplicate'}, unique_key='once'))
+        self.assertEqual(self.run_worker(), 0)
+
+    def test_failing_job_is_retried_then_failed(self):
+        failed = enqueue('tests.fail', max_attempts=2)
+        with self.assertLogs('apiv01.jobs', 'WARNING'):
+            self.run_worker()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (Job.QUEUED, 1))
+        self.assertGreater(failed.run_at, timezone.now())
+        self.assertIn("Job failed on purpose", failed.last_error)
+
+        Job.objects.filter(pk=failed.pk).update(run_at=timezone.now())
+        with self.assertLogs('apiv01.jobs', 'ERROR'):
+            self.run_worker()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(failed.finished_at)
+
+    def test_expired_lease_is_requeued(self):
+        enqueue('tests.record', {'value': 'crashed'}, max_attempts=2)
+        enqueue('tests.record', {'value': 'crashed again'}, max_attempts=1)
+        crashed = Worker(pool='solo', lease=60)
+        self.assertEqual(len(crashed.claim(10)), 2)
+        Job.objects.update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        with self.assertLogs('apiv01.jobs', 'WARNING'):
+            self.assertEqual(self.run_worker(), 1)
+        self.assertEqual(JOB_CALLS, ['crashed'])
+        self.assertEqual(Job.objects.get(payload__value='crashed again').status, Job.FAILED)
+
+    def test_periodic_jobs_are_queued_once_per_period(self):
+        for worker in [Worker(pool='solo', periodic={'jobs.sleep': 3600}) for _ in range(2)]:
+            worker.schedule()
+            worker.schedule()
+        self.assertEqual(Job.objects.filter(name='jobs.sleep').count(), 1)
+
+    def test_reminders(self):
+        now = timezone.now()
+        soon = Task.objects.create(title="Soon", due_date=now + timedelta(hours=2), user=self.user)
+        Task.objects.create(title="Soon but done", due_date=now + timedelta(hours=2), user=self.user,
+                            status='complated')
+        Task.objects.create(title="Next week", due_date=now + timedelta(days=7), user=self.user)
+        Task.objects.create(title="Overdue", due_date=now - timedelta(hours=2), user=self.user)
+        Task.objects.create(title="Undated", user=self.user)
+
+        for _ in range(2):
+            enqueue('tasks.scan_due')
+            self.run_worker()
+        reminders = Job.objects.filter(name='tasks.remind')
+        self.assertEqual(list(reminders.values_list('payload__task_id', flat=True)), [soon.pk])
+
+        stale = {'task_id': soon.pk, 'due_date': soon.due_date.isoformat()}
+        soon.due_date = now + timedelta(hours=3)
+        soon.save()
+        loop = asyncio.new_event_loop()
+        try:
+            subscription = events.broker.subscribe(self.user.pk, loop)
+            enqueue('tasks.remind', stale)
+            enqueue('tasks.scan_due')
+            self.run_worker()
+            frames = loop.run_until_complete(subscription.get(1))
+        finally:
+            events.broker.reset()
+            loop.close()
+        self.assertEqual(reminders.filter(status=Job.DONE).count(), 3)
+        # Rescheduling queued a reminder for the new due date; the stale one sent nothing.
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0].startswith(b'event: task.reminder'))
+
+    def test_run_worker_command(self):
+        for n in range(3):
+            enqueue('tests.record', {'value': n})
+        out = StringIO()
+        call_command('run_worker', '--pool', 'solo', '--burst', '--no-periodic', '--max-jobs', '2', stdout=out)
+        self.assertEqual(JOB_CALLS, [0, 1])
+        self.assertIn("stopped after 2 jobs", out.getvalue())
+
+    @override_settings(JOBS_PERIODIC={'tasks.scan_due': 300})
+    def test_run_worker_warns_reminders_need_shared_events(self):
+        err = StringIO()
+        call_command('run_worker', '--pool', 'solo', '--burst', stdout=StringIO(), stderr=err)
+        self.assertIn("TODO_EVENTS_BACKEND=redis", err.getvalue())
+        err = StringIO()
+        call_command('run_worker', '--pool', 'solo', '--burst', '--no-periodic', stdout=StringIO(), stderr=err)
+        self.assertEqual(err.getvalue(), '')
 
-# Create your tests here.
@@ -0,0 +1,210 @@
+"""
+Request throttles for the auth endpoints and for task/comment writes.
+
+Rates come from ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`` in DRF's
+``"<count>/<period>"`` form, keyed by the throttle's ``scope``; ``None``
+disables a scope and ``THROTTLE_ENABLED = False`` disables them all.
+
+Two stores are available through ``THROTTLE_STORE``:
+
+* ``local``: an in-process token bucket per key. It takes about a
+  microsecond per check with no I/O, but every worker process enforces
+  the limit on its own.
+* ``cache``: a sliding-window counter kept in the ``THROTTLE_CACHE_ALIAS``
+  cache (Redis in production) and shared by every worker. It costs two
+  or three cache round trips per check.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``"5/min"`` -> ``(5, 60)``; ``None`` stays ``None``."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class LocalTokenBuckets:
+    """
+    Token buckets held in this process. A bucket starts full with
+    ``capacity`` tokens and refills at ``capacity / period`` tokens per
+    second. Least recently used buckets are dropped past ``maxsize``.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, capacity, period):
+        """Take a token for ``key``. Return 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        rate = capacity / period
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = capacity
+                if len(self._buckets) >= self.maxsize:
+                    del self._buckets[next(iter(self._buckets))]
+            else:
+                tokens, stamp = bucket
+                tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+        return (1 - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheSlidingWindow:
+    """
+    Sliding-window counters in a shared cache. The current window's
+    counter is incremented atomically, and the previous window's count is
+    weighted by how much of it still overlaps the sliding window. Rejected
+    requests count too, so a client that keeps hammering stays limited.
+    """
+
+    def consume(self, key, capacity, period):
+        cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+        now = time.time()
+        window = int(now // period)
+        digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+        current, previous = f'throttle:{digest}:{window}', f'throttle:{digest}:{window - 1}'
+
+        previous_count = cache.get(previous, 0)
+        if cache.add(current, 1, timeout=period * 2):
+            count = 1
+        else:
+            try:
+                count = cache.incr(current)
+            except ValueError:
+                # Expired between add() and incr().
+                cache.add(current, 1, timeout=period * 2)
+                count = 1
+        if count + previous_count * (1 - (now % period) / period) > capacity:
+            return period - now % period
+        return 0
+
+    def clear(self):
+        pass
+
+
+local_buckets = LocalTokenBuckets()
+cache_windows = CacheSlidingWindow()
+
+_config = None
+
+
+def get_config():
+    """
+    ``(enabled, store, rates)`` read from settings once rather than on every
+    request; reloaded when a test overrides one of the settings.
+    """
+    global _config
+    if _config is None:
+        name = getattr(settings, 'THROTTLE_STORE', 'local')
+        stores = {'local': local_buckets, 'cache': cache_windows}
+        if name not in stores:
+            raise ImproperlyConfigured(f"Unknown THROTTLE_STORE {name!r}; use 'local' or 'cache'.")
+        _config = (
+            getattr(settings, 'THROTTLE_ENABLED', True),
+            stores[name],
+            {scope: parse_rate(rate) for scope, rate in api_settings.DEFAULT_THROTTLE_RATES.items()},
+        )
+    return _config
+
+
+@receiver(setting_changed)
+def reload_config(setting, **kwargs):
+    global _config
+    if setting in ('THROTTLE_ENABLED', 'THROTTLE_STORE', 'REST_FRAMEWORK'):
+        _config = None
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Base class: limit requests sharing ``get_key()`` to the scope's rate.
+    Requests for which ``get_key()`` returns ``None`` are not throttled.
+    """
+    scope = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.delay = 0
+        enabled, store, rates = get_config()
+        if not enabled:
+            return True
+        try:
+            rate = rates[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No throttle rate set for scope {self.scope!r}.")
+        if rate is None:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        self.delay = store.consume(f'{self.scope}:{key}', *rate)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class ClientIPThrottle(BucketThrottle):
+    """Per client address (``REMOTE_ADDR``, or the proxy header when ``NUM_PROXIES`` is set)."""
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginIPThrottle(ClientIPThrottle):
+    scope = 'login_ip'
+
+
+class LoginUsernameThrottle(BucketThrottle):
+    """Per attempted username, so that one account cannot be guessed at from many addresses."""
+    scope = 'login_username'
+
+    def get_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return username.lower()
+
+
+class RegisterIPThrottle(ClientIPThrottle):
+    scope = 'register_ip'
+
+
+class RefreshIPThrottle(ClientIPThrottle):
+    scope = 'refresh_ip'
+
+
+class WriteThrottle(BucketThrottle):
+    """Per authenticated user, on unsafe methods only."""
+    scope = 'writes'
+
+    def get_key(self, request, view):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        return request.user.pk
@@ -0,0 +1,163 @@
+"""
+Refresh tokens whose blacklist check usually skips the database.
+
+``blacklist_index`` keeps a Bloom filter of the JTIs of blacklisted,
+unexpired tokens in each process. A JTI the filter does not contain is
+certainly not blacklisted, so only filter hits (real ones and about
+``JWT_BLACKLIST_FILTER_ERROR_RATE`` false positives) reach the
+``BlacklistedToken`` table.
+
+Blacklisting adds the JTI to the local filter straight away and bumps a
+generation in the shared cache. Other processes see the new generation
+on their next check and fetch the blacklist rows added since the newest
+one they have seen. With a per-process cache backend (locmem, dummy) the
+generation is not shared and another process's blacklisting could go
+unseen for ``JWT_BLACKLIST_SYNC_INTERVAL`` seconds, so the filter is only
+used with ``JWT_BLACKLIST_FILTER``, which defaults to on with a shared
+cache; without it every refresh queries ``BlacklistedToken``.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+from .cache import bump_generation, get_cache, get_generation
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings using double hashing."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        added = False
+        for position in self.positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        # Re-adding an item leaves ``count`` unchanged.
+        self.count += added
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class BlacklistIndex:
+    scope = 'jwt_blacklist'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.filter = None
+        self.watermark = None
+        self.generation = None
+        self.synced_at = 0.0
+        self.built_at = 0.0
+
+    def enabled(self):
+        return getattr(settings, 'JWT_BLACKLIST_FILTER', False)
+
+    def might_contain(self, jti):
+        """False only when ``jti`` is certainly not blacklisted."""
+        if not self.enabled():
+            return True
+        self.sync()
+        return jti in self.filter
+
+    def add(self, jti):
+        if not self.enabled():
+            return
+        self.sync()
+        with self._lock:
+            self.filter.add(jti)
+        bump_generation(self.scope, 'all')
+
+    def sync(self):
+        now = time.monotonic()
+        generation = get_generation(self.scope, 'all')
+        with self._lock:
+            if self.filter is None or self.filter.count >= self.filter.capacity or \
+                    now - self.built_at >= getattr(settings, 'JWT_BLACKLIST_REBUILD_INTERVAL', 3600):
+                self.rebuild(now)
+            elif generation != self.generation or \
+                    now - self.synced_at >= getattr(settings, 'JWT_BLACKLIST_SYNC_INTERVAL', 5):
+                self.catch_up()
+            else:
+                return
+            self.generation = generation
+            self.synced_at = now
+
+    def rebuild(self, now):
+        """Size a new filter for the live blacklist with room to grow, and fill it."""
+        live = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        capacity = max(live.count() * 2, getattr(settings, 'JWT_BLACKLIST_FILTER_CAPACITY', 100000))
+        self.filter = BloomFilter(capacity, getattr(settings, 'JWT_BLACKLIST_FILTER_ERROR_RATE', 0.001))
+        self.watermark = None
+        self.load(live)
+        self.built_at = now
+
+    def catch_up(self):
+        """
+        Load rows blacklisted since the newest one seen, minus an overlap: a
+        transaction that inserted a row earlier may commit after a later one.
+        """
+        blacklisted = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        if self.watermark is not None:
+            overlap = timedelta(seconds=getattr(settings, 'JWT_BLACKLIST_SYNC_OVERLAP', 60))
+            blacklisted = blacklisted.filter(blacklisted_at__gte=self.watermark - overlap)
+        self.load(blacklisted)
+
+    def load(self, blacklisted):
+        rows = blacklisted.values_list('blacklisted_at', 'token__jti').iterator(chunk_size=10000)
+        for blacklisted_at, jti in rows:
+            self.filter.add(jti)
+            if self.watermark is None or blacklisted_at > self.watermark:
+                self.watermark = blacklisted_at
+
+
+blacklist_index = BlacklistIndex()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    ``RefreshToken`` that checks expiry before the blacklist, and consults
+    ``blacklist_index`` before querying ``BlacklistedToken``.
+    """
+
+    def verify(self, *args, **kwargs):
+        # RefreshToken checks the blacklist first; an expired token should
+        # not cost a lookup at all.
+        Token.verify(self, *args, **kwargs)
+        self.check_blacklist()
+
+    def check_blacklist(self):
+        if not blacklist_index.might_contain(self.payload[jwt_settings.JTI_CLAIM]):
+            return
+        super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted, created = super().blacklist()
+        blacklist_index.add(self.payload[jwt_settings.JTI_CLAIM])
+        return blacklisted, created
@@ -1,8 +1,10 @@
 from django.urls import path
 
+from . import async_views
 from .views import LoginView, LogoutView, RegisterView, TaskCreateView,\
     TaskListView, TaskDetailView, TaskUpdateView, TaskDeleteView,\
-        CommentCreateView, CommentListView, CustomTokenRefreshView
+        CommentCreateView, CommentListView, CustomTokenRefreshView,\
+            TaskBulkCreateView, TaskBulkUpdateView, TaskBulkDeleteView, TaskExportView, TaskImportView, TaskChangesView, TaskStatsView, CacheStatsView, metrics
 
 urlpatterns = [
     #Auth
@@ -16,7 +18,29 @@ urlpatterns = [
     path('task/detail/<int:pk>/', TaskDetailView.as_view(), name="task-detail"),
     path('task/update/<int:pk>/', TaskUpdateView.as_view(), name="task-update"),
     path('task/delete/<int:pk>/', TaskDeleteView.as_view(), name="task-delete"),
+    path('task/bulk/create/', TaskBulkCreateView.as_view(), name="task-bulk-create"),
+    path('task/bulk/update/', TaskBulkUpdateView.as_view(), name="task-bulk-update"),
+    path('task/bulk/delete/', TaskBulkDeleteView.as_view(), name="task-bulk-delete"),
+    path('tasks/export/', TaskExportView.as_view(), name="task-export"),
+    path('tasks/import/', TaskImportView.as_view(), name="task-import"),
+    path('tasks/changes/', TaskChangesView.as_view(), name="task-changes"),
+    path('tasks/stats/', TaskStatsView.as_view(), name="task-stats"),
     #Comment
     path('tasks/<int:task_id>/comments/', CommentListView.as_view(), name='comment-list'),
     path('tasks/<int:task_id>/comments/create/', CommentCreateView.as_view(), name='comment-create'),
+    #Async (ASGI-native) task and comment endpoints
+    path('async/tasks/', async_views.task_list, name="async-task-list"),
+    path('async/task/create/', async_views.task_create, name="async-create-task"),
+    path('async/task/detail/<int:pk>/', async_views.task_detail, name="async-task-detail"),
+    path('async/task/update/<int:pk>/', async_views.task_update, name="async-task-update"),
+    path('async/task/delete/<int:pk>/', async_views.task_delete, name="async-task-delete"),
+    path('async/tasks/<int:task_id>/comments/', async_views.comment_list, name='async-comment-list'),
+    path('async/tasks/<int:task_id>/comments/create/', async_views.comment_create,
+         name='async-comment-create'),
+    #Server-sent events (ASGI only)
+    path('tasks/events/', async_views.task_events, name='task-events'),
+    #Cache
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    #Metrics
+    path('metrics/', metrics, name='metrics'),
 ]
@@ -1,15 +1,35 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from rest_framework import status, generics
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .serializers import LoginSerializer, LogoutSerializer, \
-    RegisterSerializer, TaskSerializer, CommentSerializer
+from .serializers import LoginSerializer, LogoutSerializer, RefreshSerializer, \
+    RegisterSerializer, TaskSerializer, TaskSearchResultSerializer, CommentSerializer, \
+    TaskBulkDeleteSerializer, TASK_BULK_MAX_ITEMS
 from .models import Task, Comment
 from .filters import TaskFilter
+from .pagination import KeysetPaginationMixin
+from .conditional import ConditionalGetMixin
+from .cache import CachedListMixin, bump_generation, bump_generations, cache_stats
+from .events import publish
+from .metrics import InstrumentedViewMixin, registry
+from .export import EXPORT_FORMATS, RawBodyContentNegotiation, export
+from .importer import IMPORT_FORMATS, TaskImporter
+from .rows import RowRepresentationMixin, comment_rows, task_rows
+from .search import highlight_tasks
+from .stats import STATS_DAYS, STATS_MAX_DAYS, task_stats
+from .sync import SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, changes_since, decode_token, encode_token
+from .throttling import LoginIPThrottle, LoginUsernameThrottle, RefreshIPThrottle, \
+    RegisterIPThrottle, WriteThrottle
 
 @extend_schema(
     summary="Register a new user",
@@ -29,6 +49,7 @@ from .filters import TaskFilter
 )
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [RegisterIPThrottle]
     
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -51,7 +72,8 @@ class RegisterView(APIView):
     description="Use this endpoint to refresh your JWT token when it expires."
 )
 class CustomTokenRefreshView(TokenRefreshView):
-    pass
+    serializer_class = RefreshSerializer
+    throttle_classes = [RefreshIPThrottle]
 
 
 @extend_schema(
@@ -97,9 +119,22 @@ class LogoutView(APIView):
 )
 class LoginView(TokenObtainPairView):
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
     serializer_class = LoginSerializer
     
 
+class OwnedTaskMixin:
+    """
+    Scope the queryset to the caller's tasks, so loading a task and
+    checking its ownership is a single query.
+    """
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Task.objects.none()
+        return Task.objects.filter(user_id=self.request.user.pk)
+
+
 @extend_schema(
     summary="Create a new task",
     request=TaskSerializer,
@@ -109,13 +144,14 @@ class LoginView(TokenObtainPairView):
     },
     description="Create a new task. Users can assign a title, description, due date, and status."
 )
-class TaskCreateView(generics.CreateAPIView):
+class TaskCreateView(InstrumentedViewMixin, generics.CreateAPIView):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteThrottle]
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.pk)
         
         return Response({"message":"Task created successfully!"})
     
@@ -126,34 +162,75 @@ class TaskCreateView(generics.CreateAPIView):
         200: 'OK',
         401: 'Unauthorized',
     },
-    description="Fetch a list of all tasks associated with the authenticated user, ordered by creation date."
+    description=(
+        "Fetch a list of all tasks associated with the authenticated user, ordered by creation date. "
+        "Pass `cursor` (empty for the first page) to switch to keyset pagination. "
+        "Pass `q` to search titles, descriptions and comments: results are ordered by relevance "
+        "(by creation date with `cursor`) and carry a `search` object with the rank and highlights."
+    )
 )
-class TaskListView(generics.ListAPIView):
+class TaskListView(ConditionalGetMixin, CachedListMixin, KeysetPaginationMixin, OwnedTaskMixin,
+                   RowRepresentationMixin, InstrumentedViewMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated,]
     serializer_class = TaskSerializer
-    queryset = Task.objects.all().order_by('-created_at')
+    row_encoder = task_rows
     filter_backends = [DjangoFilterBackend]
     filterset_class = TaskFilter
+    cache_scope = 'tasks'
+    
+    def get_cache_owner(self):
+        return self.request.user.pk
+    
+    def get_queryset(self):
+        return super().get_queryset().order_by('-created_at')
+    
+    def get_serializer_class(self):
+        if self.request is not None and self.request.query_params.get('q'):
+            return TaskSearchResultSerializer
+        return super().get_serializer_class()
+    
+    def use_rows(self):
+        # Search results carry annotations and highlights: they go through the serializer.
+        return super().use_rows() and not self.request.query_params.get('q')
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        query = self.request.query_params.get('q')
+        if query and page is not None:
+            highlight_tasks(page, query, self.request.user.pk)
+        return page
+    
+    def get_conditional_state(self):
+        # Deletes lower the count without moving max(updated_at), so lists only get an ETag.
+        state = Task.objects.filter(user_id=self.request.user.pk).aggregate(
+            count=Count('id'), last=Max('updated_at'))
+        return state['count'], state['last']
     
 
 @extend_schema(
     summary="Retrieve task details",
     responses={
         200: 'OK',
-        403: 'Permission denied',
         404: 'Task not found',
     },
     description="Fetch details of a specific task owned by the authenticated user."
 )   
-class TaskDetailView(generics.RetrieveAPIView):
+class TaskDetailView(ConditionalGetMixin, OwnedTaskMixin, RowRepresentationMixin, InstrumentedViewMixin,
+                     generics.RetrieveAPIView):
     serializer_class = TaskSerializer
+    row_encoder = task_rows
     permission_classes = [IsAuthenticated,]
     
-    def get_object(self):
-        task = super().get_object()
-        if task.user != self.request.user:
-            self.permission_denied(self.request)
-        return task
+    def get_conditional_state(self):
+        updated_at = Task.objects.filter(
+            pk=self.kwargs['pk'], user_id=self.request.user.pk,
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        return (updated_at,)
+    
+    def get_last_modified(self, state):
+        return state[0]
     
 
 @extend_schema(
@@ -162,21 +239,14 @@ class TaskDetailView(generics.RetrieveAPIView):
     responses={
         200: 'OK',
         400: 'Bad Request',
-        403: 'Permission denied',
         404: 'Task not found',
     },
     description="Update an existing task. The user must own the task to modify it."
 )
-class TaskUpdateView(generics.UpdateAPIView):
+class TaskUpdateView(OwnedTaskMixin, InstrumentedViewMixin, generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteThrottle]
     serializer_class = TaskSerializer
-    queryset = Task.objects.all()
-    
-    def get_object(self):
-        task = super().get_object()
-        if task.user != self.request.user:
-            self.permission_denied(self.request)
-        return task
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', True)
@@ -191,20 +261,13 @@ class TaskUpdateView(generics.UpdateAPIView):
     summary="Delete a task",
     responses={
         204: 'No Content',
-        403: 'Permission denied',
         404: 'Task not found',
     },
     description="Delete a task. The user must own the task to delete it."
 )    
-class TaskDeleteView(generics.DestroyAPIView):
-    queryset = Task.objects.all()
+class TaskDeleteView(OwnedTaskMixin, generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
-
-    def get_object(self):
-        task = super().get_object()
-        if task.user != self.request.user:
-            self.permission_denied(self.request)
-        return task
+    throttle_classes = [WriteThrottle]
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -212,40 +275,344 @@ class TaskDeleteView(generics.DestroyAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 
+class TaskBulkMixin:
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteThrottle]
+    max_items = TASK_BULK_MAX_ITEMS
+
+    def item_errors(self, serializer):
+        return [
+            {"index": index, "errors": errors}
+            for index, errors in sorted(serializer.item_errors.items())
+        ]
+
+
+@extend_schema(
+    summary="Create tasks in bulk",
+    request=TaskSerializer(many=True),
+    responses={
+        201: 'Valid tasks created, invalid ones reported per index',
+        400: 'Bad Request',
+    },
+    description=(
+        "Create up to 5000 tasks in one request. Valid items are inserted in a single "
+        "transaction; invalid ones are listed in `errors` with their index."
+    )
+)
+class TaskBulkCreateView(TaskBulkMixin, APIView):
+
+    def post(self, request):
+        serializer = TaskSerializer(data=request.data, many=True, max_length=self.max_items)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(user_id=request.user.pk)
+            transaction.on_commit(lambda: bump_generation('tasks', request.user.pk))
+            # bulk_create/bulk_update send no signals: streams get a hint to sync.
+            transaction.on_commit(lambda: publish(request.user.pk, 'tasks.changed', dict))
+        return Response({
+            "data": serializer.data,
+            "errors": self.item_errors(serializer),
+            }, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    summary="Update tasks in bulk",
+    request=TaskSerializer(many=True),
+    responses={
+        200: 'Valid tasks updated, invalid ones reported per index',
+        400: 'Bad Request',
+    },
+    description=(
+        "Partially update up to 5000 tasks in one request. Every item must carry the `id` "
+        "of a task owned by the user. Valid items are saved in a single transaction; "
+        "invalid or unknown ones are listed in `errors` with their index."
+    )
+)
+class TaskBulkUpdateView(TaskBulkMixin, APIView):
+
+    def patch(self, request):
+        serializer = TaskSerializer(
+            Task.objects.filter(user_id=request.user.pk),
+            data=request.data,
+            many=True,
+            partial=True,
+            max_length=self.max_items,
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+            transaction.on_commit(lambda: bump_generation('tasks', request.user.pk))
+            transaction.on_commit(lambda: publish(request.user.pk, 'tasks.changed', dict))
+        return Response({
+            "data": serializer.data,
+            "errors": self.item_errors(serializer),
+            }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Delete tasks in bulk",
+    request=TaskBulkDeleteSerializer,
+    responses={
+        200: 'Owned tasks deleted, unknown ids reported',
+        400: 'Bad Request',
+    },
+    description="Delete up to 5000 tasks owned by the user in a single transaction."
+)
+class TaskBulkDeleteView(TaskBulkMixin, APIView):
+
+    def post(self, request):
+        serializer = TaskBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        with transaction.atomic():
+            tasks = Task.objects.filter(user_id=request.user.pk, pk__in=ids)
+            deleted = set(tasks.values_list('pk', flat=True))
+            # Two set-based DELETEs, comments first, without collecting rows
+            # for the per-task signal handlers; the triggers still update the
+            # search index, change log and counters.
+            Comment.objects.filter(task_id__in=deleted)._raw_delete(tasks.db)
+            tasks._raw_delete(tasks.db)
+            transaction.on_commit(lambda: bump_generation('tasks', request.user.pk))
+            transaction.on_commit(lambda: bump_generations('comments', deleted))
+            transaction.on_commit(lambda: publish(request.user.pk, 'tasks.changed', dict))
+        return Response({
+            "deleted": sorted(deleted),
+            "errors": [
+                {"index": index, "errors": {"id": ["Task not found."]}}
+                for index, pk in enumerate(ids) if pk not in deleted
+            ],
+            }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Export all tasks with their comments",
+    parameters=[OpenApiParameter('format', str, enum=list(EXPORT_FORMATS), default='ndjson')],
+    responses={
+        200: 'NDJSON (one task per line, comments nested) or CSV stream',
+        400: 'Unknown format',
+    },
+    description=(
+        "Stream every task of the user with its comments as NDJSON or CSV. The response is "
+        "produced in chunks, so exports of any size need a single request."
+    )
+)
+class TaskExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = RawBodyContentNegotiation
+
+    def get(self, request):
+        export_format = request.query_params.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'format': [f'Choose one of: {", ".join(EXPORT_FORMATS)}.']})
+        content_type, _ = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            export(Task.objects.filter(user_id=request.user.pk), export_format),
+            content_type=f'{content_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="tasks.{export_format}"'
+        return response
+
+
+@extend_schema(
+    summary="Tasks changed since the last sync",
+    parameters=[
+        OpenApiParameter('since', str, description="`next` of the previous sync; omit for a full sync."),
+        OpenApiParameter('limit', int, default=SYNC_PAGE_SIZE,
+                         description=f"Changes per response, at most {SYNC_MAX_PAGE_SIZE}."),
+    ],
+    responses={
+        200: 'Created or updated tasks, ids of deleted tasks and the next sync token',
+        400: 'Bad Request',
+        404: 'Invalid sync token',
+    },
+    description=(
+        "Return the tasks created or updated and the ids of the tasks deleted since `since`, "
+        "each task once in its latest state. Store `next` and pass it as `since` on the next "
+        "sync; while `has_more` is true, call again straight away."
+    )
+)
+class TaskChangesView(InstrumentedViewMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = decode_token(request.query_params.get('since'))
+        try:
+            limit = int(request.query_params.get('limit', SYNC_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= SYNC_MAX_PAGE_SIZE:
+            raise ValidationError({'limit': [f'Must be between 1 and {SYNC_MAX_PAGE_SIZE}.']})
+
+        tasks, deleted, last_seq, has_more = changes_since(request.user.pk, since, limit)
+        return Response({
+            'changed': TaskSerializer(tasks, many=True).data,
+            'deleted': deleted,
+            'next': encode_token(last_seq),
+            'has_more': has_more,
+        })
+
+
+@extend_schema(
+    summary="Task statistics",
+    parameters=[
+        OpenApiParameter('days', int, default=STATS_DAYS,
+                         description=f"Days of completion trend, at most {STATS_MAX_DAYS}."),
+    ],
+    responses={
+        200: 'Counts per status, overdue and due-this-week counts, and completed tasks per day',
+        400: 'Bad Request',
+    },
+    description=(
+        "Return the number of tasks in each status, the open tasks that are overdue or due by "
+        "the end of this week, and the tasks completed on each of the last `days` days, by the "
+        "day they were last updated."
+    )
+)
+class TaskStatsView(InstrumentedViewMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', STATS_DAYS))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= STATS_MAX_DAYS:
+            raise ValidationError({'days': [f'Must be between 1 and {STATS_MAX_DAYS}.']})
+        return Response(task_stats(request.user.pk, days))
+
+
+@extend_schema(
+    summary="Import tasks with their comments",
+    request={'application/x-ndjson': bytes, 'text/csv': bytes},
+    parameters=[
+        OpenApiParameter('format', str, enum=list(IMPORT_FORMATS),
+                         description="Defaults to csv for a text/csv body, ndjson otherwise."),
+        OpenApiParameter('checkpoint', str, description="Name under which progress is recorded."),
+        OpenApiParameter('resume', bool, description="Skip the records the checkpoint has committed."),
+    ],
+    responses={
+        200: 'Import summary with per-record errors',
+        400: 'Unknown format',
+    },
+    description=(
+        "Stream NDJSON or CSV in the export format into the user's tasks. Records are validated "
+        "and inserted in batches, each in its own transaction; invalid records are skipped and "
+        "reported by position. With `checkpoint`, a later request with `resume=true` continues "
+        "after the last committed batch."
+    )
+)
+class TaskImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteThrottle]
+    content_negotiation_class = RawBodyContentNegotiation
+
+    def post(self, request):
+        import_format = request.query_params.get('format')
+        if import_format is None:
+            import_format = 'csv' if request.content_type.startswith('text/csv') else 'ndjson'
+        if import_format not in IMPORT_FORMATS:
+            raise ValidationError({'format': [f'Choose one of: {", ".join(IMPORT_FORMATS)}.']})
+
+        importer = TaskImporter(
+            owner_id=request.user.pk,
+            checkpoint=request.query_params.get('checkpoint') or None,
+        )
+        resume = request.query_params.get('resume', '').lower() in ('1', 'true')
+        records = IMPORT_FORMATS[import_format](request.stream or ())
+        return Response(importer.run(records, resume=resume), status=status.HTTP_200_OK)
+
+
 @extend_schema(
     summary="Create a new comment for a task",
     request=CommentSerializer,
     responses={
         201: 'Comment created successfully!',
         400: 'Bad Request',
-        403: 'Permission denied',
         404: 'Task not found',
     },
-    description="Create a new comment for a specific task. The user must be authenticated."
+    description="Create a new comment for a specific task. The user must own the task."
 )    
-class CommentCreateView(generics.CreateAPIView):
+class CommentCreateView(InstrumentedViewMixin, generics.CreateAPIView):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]  
+    throttle_classes = [WriteThrottle]
 
     def perform_create(self, serializer):
-        task_id = self.kwargs.get('task_id')  
-        serializer.save(task_id=task_id, user=self.request.user) 
+        task = Task.objects.filter(
+            pk=self.kwargs.get('task_id'), user_id=self.request.user.pk).only('pk', 'user_id').first()
+        if task is None:
+            raise NotFound("Task not found.")
+        serializer.save(task=task, user_id=self.request.user.pk)
     
 
 @extend_schema(
     summary="Get comments for a task",
     responses={
         200: 'OK',
-        403: 'Permission denied',
-        404: 'Task not found',
     },
-    description="Fetch all comments for a specific task."
+    description=(
+        "Fetch all comments for a specific task owned by the authenticated user. "
+        "Pass `cursor` (empty for the first page) to switch to keyset pagination."
+    )
 )    
-class CommentListView(generics.ListAPIView):
+class CommentListView(ConditionalGetMixin, CachedListMixin, KeysetPaginationMixin, RowRepresentationMixin,
+                      InstrumentedViewMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
+    row_encoder = comment_rows
     permission_classes = [IsAuthenticated] 
+    cache_scope = 'comments'
+    
+    def get_cache_owner(self):
+        return self.kwargs.get('task_id')
     
     def get_queryset(self):
-        task_id = self.kwargs.get('task_id')
-        return Comment.objects.filter(task_id=task_id).order_by('-created_at')
\ No newline at end of file
+        return self.get_owned_comments().order_by('-created_at')
+    
+    def get_owned_comments(self):
+        return Comment.objects.filter(
+            task_id=self.kwargs.get('task_id'),
+            task__user_id=self.request.user.pk,
+        )
+    
+    def get_conditional_state(self):
+        state = self.get_owned_comments().aggregate(count=Count('id'), last=Max('created_at'))
+        return state['count'], state['last']
+
+
+@extend_schema(
+    summary="Response cache statistics",
+    responses={
+        200: 'OK',
+        403: 'Permission denied',
+    },
+    description="Hit/miss counters of the list response cache in this process. Staff only."
+)
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats.as_dict())
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. With ``METRICS_TOKEN`` set the scraper
+    must send it as a bearer token; without it, only staff sessions (e.g.
+    logged in through the admin) may read the metrics.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not constant_time_compare(supplied, token):
+            return HttpResponseForbidden()
+    elif not request.user.is_staff:
+        return HttpResponseForbidden()
+
+    stats = cache_stats.as_dict()
+    body = registry.render(extra=[
+        ('response_cache_hits_total', 'counter', 'List response cache hits.', stats['hits']),
+        ('response_cache_misses_total', 'counter', 'List response cache misses.', stats['misses']),
+    ])
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,6 +2,8 @@
 ASGI config for todo project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Server-sent event streams are answered in front of Django by
+``apiv01.events.EventStreamRouter``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +15,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from apiv01.events import EventStreamRouter  # noqa: E402 (needs the apps loaded)
+
+application = EventStreamRouter(django_application)
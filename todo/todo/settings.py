@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -59,9 +61,19 @@ REST_FRAMEWORK = {
     ],
     
     'DEFAULT_AUTHENTICATION_CLASSES':[
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        'apiv01.authentication.CachedJWTAuthentication'
     ],
+
+    # Also turns apiv01.hashers.HashingBusy into a 503 with Retry-After.
+    'EXCEPTION_HANDLER': 'apiv01.exceptions.exception_handler',
     
+    # MessagePack (apiv01.renderers) when the optional msgpack package is installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['apiv01.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+    ],
+
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
     
@@ -69,8 +81,24 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ],
+
+    # Scopes of apiv01.throttling; None disables one.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('TODO_THROTTLE_LOGIN_IP', '20/min'),
+        'login_username': os.environ.get('TODO_THROTTLE_LOGIN_USERNAME', '5/min'),
+        'register_ip': os.environ.get('TODO_THROTTLE_REGISTER_IP', '10/hour'),
+        'refresh_ip': os.environ.get('TODO_THROTTLE_REFRESH_IP', '60/min'),
+        'writes': os.environ.get('TODO_THROTTLE_WRITES', '600/min'),
+    },
 }
 
+# 'local' keeps token buckets in each process (no I/O); 'cache' shares
+# sliding-window counters between workers through THROTTLE_CACHE_ALIAS.
+THROTTLE_ENABLED = os.environ.get('TODO_THROTTLE_ENABLED', '1') == '1'
+THROTTLE_STORE = os.environ.get(
+    'TODO_THROTTLE_STORE', 'cache' if os.environ.get('TODO_CACHE_BACKEND') == 'redis' else 'local')
+THROTTLE_CACHE_ALIAS = 'default'
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=15),
@@ -111,8 +139,28 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# Active/staff flags looked up by CachedJWTAuthentication are cached per process.
+JWT_USER_STATE_CACHE_SIZE = 10000
+JWT_USER_STATE_CACHE_TTL = 60
+
+# Bloom filter of blacklisted refresh token JTIs, kept per process (apiv01.tokens).
+# Other processes' blacklistings arrive through a cache generation, or after
+# JWT_BLACKLIST_SYNC_INTERVAL seconds at the latest, so the filter needs a cache
+# every process shares: TODO_JWT_BLACKLIST_FILTER defaults to on with the file or
+# redis cache backend and off with locmem, where refreshes query the blacklist.
+JWT_BLACKLIST_FILTER = os.environ.get(
+    'TODO_JWT_BLACKLIST_FILTER',
+    '1' if os.environ.get('TODO_CACHE_BACKEND') in ('file', 'redis') else '0') == '1'
+JWT_BLACKLIST_SYNC_INTERVAL = 5
+JWT_BLACKLIST_SYNC_OVERLAP = 60
+JWT_BLACKLIST_REBUILD_INTERVAL = 3600
+JWT_BLACKLIST_FILTER_CAPACITY = int(os.environ.get('TODO_JWT_BLACKLIST_FILTER_CAPACITY', 100000))
+JWT_BLACKLIST_FILTER_ERROR_RATE = 0.001
+
 
 MIDDLEWARE = [
+    'apiv01.middleware.MetricsMiddleware',
+    'apiv01.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,6 +172,22 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'todo.urls'
 
+# Response compression (apiv01.middleware.CompressionMiddleware), in order of
+# preference among the codings the client accepts: zstd needs the zstandard package,
+# br the brotli package; gzip is always there.
+API_COMPRESSION_ENABLED = os.environ.get('TODO_COMPRESSION', '1') != '0'
+API_COMPRESSION_ENCODINGS = ('zstd', 'br', 'gzip')
+API_COMPRESSION_MIN_SIZE = int(os.environ.get('TODO_COMPRESSION_MIN_SIZE', 1024))
+API_COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+# Request metrics, exposed at /api/metrics/ in the Prometheus text format to
+# scrapers sending TODO_METRICS_TOKEN as a bearer token or, without one, to
+# staff sessions only.
+METRICS_ENABLED = True
+METRICS_SAMPLE_RATE = float(os.environ.get('TODO_METRICS_SAMPLE_RATE', 1.0))
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_TOKEN = os.environ.get('TODO_METRICS_TOKEN')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -145,14 +209,162 @@ WSGI_APPLICATION = 'todo.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# TODO_DB_ENGINE selects sqlite (default) or postgres; the TODO_DB_* variables
+# below tune each profile.
+
+DB_ENGINE = os.environ.get('TODO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('TODO_DB_NAME', 'todo'),
+            'USER': os.environ.get('TODO_DB_USER', 'todo'),
+            'PASSWORD': os.environ.get('TODO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('TODO_DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('TODO_DB_PORT', '5432'),
+            # Keep connections open between requests and ping them before reuse.
+            'CONN_MAX_AGE': int(os.environ.get('TODO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            # QuerySet.iterator() streams through server-side cursors; turn this
+            # on behind transaction-pooling PgBouncer.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('TODO_DB_DISABLE_SERVER_SIDE_CURSORS') == '1',
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('TODO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('TODO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # WAL lets readers run alongside the single writer; IMMEDIATE
+                # takes the write lock up front so transactions wait on
+                # busy_timeout instead of failing with "database is locked".
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA busy_timeout={int(os.environ.get('TODO_DB_BUSY_TIMEOUT', 5000))};"
+                    f"PRAGMA mmap_size={int(os.environ.get('TODO_DB_MMAP_SIZE', 134217728))};"
+                ),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# TODO_CACHE_BACKEND selects locmem (default), file or redis (TODO_CACHE_LOCATION).
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('TODO_CACHE_LOCATION', BASE_DIR / 'var' / 'cache'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('TODO_CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('TODO_CACHE_BACKEND', 'locmem')],
 }
 
+API_RESPONSE_CACHE_ALIAS = 'default'
+API_RESPONSE_CACHE_TIMEOUT = 300
+
+# Task and comment list/detail responses are built from values_list() rows
+# (apiv01.rows) rather than by the serializers; the JSON is the same.
+API_ROW_REPRESENTATION = os.environ.get('TODO_ROW_REPRESENTATION', '1') != '0'
+
+# /api/tasks/stats/ reads per-status counts from the trigger-maintained
+# TaskCounter rows (apiv01.stats); with False it counts the tasks instead.
+API_TASK_COUNTERS = os.environ.get('TODO_TASK_COUNTERS', '1') != '0'
+
+# Server-sent events at /api/tasks/events/ (apiv01.events). TODO_EVENTS_BACKEND
+# local (default) reaches the streams of the publishing process only; redis
+# fans out through Redis pub/sub (needs the redis package) at TODO_EVENTS_REDIS_URL.
+EVENTS_BACKEND_CHOICES = {
+    'local': 'apiv01.events.LocalBackend',
+    'redis': 'apiv01.events.RedisBackend',
+}
+EVENTS_BACKEND = EVENTS_BACKEND_CHOICES[os.environ.get('TODO_EVENTS_BACKEND', 'local')]
+EVENTS_REDIS_URL = os.environ.get('TODO_EVENTS_REDIS_URL', 'redis://127.0.0.1:6379')
+# A stream ends when its access token expires and is checked against the
+# user-state cache every heartbeat. Browsers' EventSource sends the token as
+# ?access_token=, which proxy and server access logs record: keep those logs
+# private, or strip the parameter from them.
+EVENTS_HEARTBEAT = 15
+# Frames queued for a stream before it is told to resync instead.
+EVENTS_MAX_PENDING = 100
+
+
+# Background jobs (apiv01.jobs), run by `manage.py run_worker`. TODO_JOBS_POOL
+# is thread (I/O-bound jobs), process (CPU-bound jobs) or solo; a worker runs
+# at most TODO_JOBS_CONCURRENCY jobs at once.
+JOBS_POOL = os.environ.get('TODO_JOBS_POOL', 'thread')
+JOBS_CONCURRENCY = int(os.environ.get('TODO_JOBS_CONCURRENCY', 4))
+JOBS_POLL_INTERVAL = float(os.environ.get('TODO_JOBS_POLL_INTERVAL', 1))
+# Seconds a claimed job may run before another worker takes it over.
+JOBS_LEASE = int(os.environ.get('TODO_JOBS_LEASE', 300))
+# A failing job is retried after 10 s, 20 s, 40 s, ... up to an hour apart.
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_MAX_BACKOFF = 3600
+# Done jobs are kept this long, to deduplicate by unique_key.
+JOBS_RETENTION = timedelta(days=7)
+# Jobs every worker queues on a schedule: name -> seconds between runs.
+JOBS_PERIODIC = {
+    'tasks.scan_due': 300,
+    'jobs.prune': 3600,
+}
+# Open tasks are reminded of once when they come due within this long. The
+# reminder is a task.reminder event published by the worker, so it reaches the
+# API's streams only with TODO_EVENTS_BACKEND=redis; run_worker warns otherwise.
+TASK_REMINDER_LEAD = timedelta(hours=int(os.environ.get('TODO_TASK_REMINDER_LEAD_HOURS', 24)))
+
+# Password hashing. TODO_PASSWORD_HASHER picks the hasher for new and
+# rehashed passwords: pbkdf2 (default), scrypt or argon2 (needs argon2-cffi).
+# The others stay listed so existing hashes verify and are upgraded on login.
+
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'apiv01.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'apiv01.hashers.ScryptPasswordHasher',
+    'argon2': 'apiv01.hashers.Argon2PasswordHasher',
+}
+_password_hasher = os.environ.get('TODO_PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[_password_hasher]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != _password_hasher
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('TODO_PBKDF2_ITERATIONS', 870000))
+# scrypt: N=2**14, r=8 is 16 MiB per hash. p=1 keeps a hash on one core,
+# which gives the most logins per second per core.
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('TODO_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('TODO_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('TODO_SCRYPT_PARALLELISM', 1))
+# argon2id: memory cost is in KiB.
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('TODO_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('TODO_ARGON2_MEMORY_COST', 65536))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('TODO_ARGON2_PARALLELISM', 1))
+
+# Hashes computed at once per process, and how long a login may wait for a
+# slot before it gets a 503.
+PASSWORD_HASHING_CONCURRENCY = int(os.environ.get(
+    'TODO_PASSWORD_HASHING_CONCURRENCY', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASHING_TIMEOUT = float(os.environ.get('TODO_PASSWORD_HASHING_TIMEOUT', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -201,4 +413,9 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_PUBLIC': True,
     'SECURITY': [],  
-}
\ No newline at end of file
+}
+
+# Schema written by `manage.py build_schema` and served from memory at /schema/
+# (apiv01.schema); generated on first request when missing or out of date.
+# Like the file cache, it lives under var/, which git ignores.
+API_SCHEMA_FILE = os.environ.get('TODO_SCHEMA_FILE', BASE_DIR / 'var' / 'openapi-schema.json')
\ No newline at end of file